@@ -0,0 +1,80 @@
+"""
+原文索引基准：构建耗时、索引体积、打开耗时，以及 BM25 查询延迟与逐片段子串扫描的对比。
+
+用法: python benchmarks/bench_chunk_index.py --rounds 200
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from chunk_index import ChunkIndex, build_index, tokenize
+
+QUERIES = ["巢湖在哪里", "焦湖的由来", "有哪些诗词提到了西湖", "丹阳湖", "方湖在哪个县", "石臼湖 溧水", "圣姥庙", "洞庭湖赠张丞相"]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def linear_scan(chunks, query, k=5):
+    """对照组：不建索引，逐片段统计查询 n-gram 的出现次数"""
+    terms = set(tokenize(query))
+    scored = [(sum(text.count(term) for term in terms), i) for i, text in enumerate(chunks)]
+    return sorted(scored, reverse=True)[:k]
+
+
+def timed(fn, rounds):
+    samples = []
+    for i in range(rounds):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    print(f"{label:<12} p50={statistics.median(samples) * 1000:7.3f}ms "
+          f"p95={percentile(samples, 0.95) * 1000:7.3f}ms p99={percentile(samples, 0.99) * 1000:7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="原文索引基准")
+    parser.add_argument("--inputs", nargs="+", default=sorted(glob.glob(os.path.join(ROOT_DIR, "split_outputs_jsonl", "*.jsonl"))))
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        meta = build_index(args.inputs, tmp)
+        build_seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        print(f"构建: {meta['doc_count']} 个片段, {meta['term_count']} 个检索词, "
+              f"{build_seconds:.2f}s, 索引 {size / 1024 / 1024:.2f}MB")
+
+        start = time.perf_counter()
+        index = ChunkIndex(tmp)
+        print(f"打开索引: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        chunks = []
+        for path in args.inputs:
+            with open(path, "r", encoding="utf-8") as f:
+                chunks.extend(json.loads(line)["page_content"] for line in f if line.strip())
+
+        report("BM25 索引", timed(lambda q: index.search(q, k=args.k), args.rounds))
+        report("线性扫描", timed(lambda q: linear_scan(chunks, q, k=args.k), max(1, args.rounds // 10)))
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
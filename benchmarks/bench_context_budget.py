@@ -0,0 +1,142 @@
+"""
+融合上下文预算基准：各分支结果原样拼进提示词（原实现）vs 按 token 预算组装，
+对比提示词大小、组装耗时，以及替身 LLM 按提示词长度计预填充时间时的首个答案块延迟（TTFT）。
+
+替身的预填充速率（--prefill-chars-per-second）决定 TTFT 随提示词长度增长的斜率，
+默认值只用于展示趋势，线上数值请以 /api/metrics 的 agent_first_token_seconds 为准。
+
+用法: python benchmarks/bench_context_budget.py --budgets 500,1000,1500 --prefill-chars-per-second 4000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.prompts import PromptTemplate
+
+from fakes import install_fakes
+
+QUERY = "巢湖在哪里，方志中是怎么记载的？"
+
+# 修改前每次调用都重新构建的模板（含缩进）
+OLD_TEMPLATE = """
+        请基于以下信息，为用户问题提供一个全面、准确的答案：
+
+        用户问题: {query}
+
+        搜索引擎结果:
+        {search_result}
+
+        知识图谱结果:
+        {graph_result}
+
+        方志原文片段:
+        {passage_result}
+
+        请综合分析上述信息，提供一个简洁明确的答案。如果各来源的信息有冲突，请指出并说明。
+        如果某个来源没有相关信息，请只使用其他来源的信息；引用原文片段时请注明出处。
+        """
+
+
+SEARCH_SNIPPETS = [
+    "巢湖位于安徽省中部，地跨合肥、芜湖两市，是中国五大淡水湖之一，水域面积约七百七十平方千米。",
+    "巢湖古称焦湖、居巢湖，因湖形如鸟巢而得名，湖中姥山岛为湖中最大岛屿。",
+    "环巢湖大道全长一百七十余公里，沿途有中庙、姥山岛、三河古镇等景点，最佳游览季节为春秋两季。",
+    "合肥市发布巢湖综合治理规划，持续推进水环境整治、蓝藻防控与湿地生态修复工作。",
+    "巢湖流域属长江下游左岸水系，主要入湖河流有杭埠河、南淝河、白石天河等，经裕溪河注入长江。",
+    "据考古发现，巢湖地区在新石器时代已有人类活动，凌家滩遗址出土了大量玉器。",
+    "巢湖银鱼、白米虾与螃蟹并称巢湖三珍，是当地著名的特产。",
+    "巢湖市为安徽省辖县级市，由合肥市代管，位于巢湖东岸。",
+    "巢湖水位受长江水位影响明显，夏季汛期水位上涨，冬季枯水期水位较低。",
+    "历史上关于巢湖成因有陷巢州的传说，当地流传着焦姥救人的故事。",
+]
+
+
+def make_state(scale: int) -> dict:
+    """构造接近线上规模的分支结果：搜索结果含转载重复，原文片段含重复切片"""
+    search = [SEARCH_SNIPPETS[i % len(SEARCH_SNIPPETS)] for i in range(scale * 3)]  # 超过 10 条后为转载重复
+    lakes = ["巢湖", "焦湖", "白湖", "竹丝湖", "黄陂湖", "菜子湖", "白荡湖", "陈瑶湖", "破罡湖", "武昌湖"]
+    graph = "；".join(f"《{name}》记载{lake}：在县{side}{i + 2}十里，周围{i + 1}百里" for i, (name, lake, side) in enumerate(
+        zip(["合肥志", "庐州府志", "无为州志", "巢县志", "舒城县志"] * 2, lakes, "东南西北东南西北东南"))) + "。"
+    passages = []
+    for i in range(5):
+        passages.append(f"[{2 * i + 1}] {lakes[i]}：在县东南{i + 3}十里，亦名{lakes[i + 1]}，港汊三百六十。（合肥志 第{i}卷）")
+        passages.append(f"[{2 * i + 2}] {lakes[i]}：在县东南{i + 3}十里，亦名{lakes[i + 1]}，港汊三百六十。（合肥志 第{i}卷）")
+    return {"query": QUERY, "search_result": " ".join(search), "graph_result": graph,
+            "passage_result": "\n".join(passages), "workflow_steps": []}
+
+
+def per_call_us(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def ttft(graph_agent, state: dict, runs: int, old_prompt: str = "") -> float:
+    """流式融合的首个答案块延迟；给出 old_prompt 时按原实现直接把它发给模型"""
+    from adapter import get_llm
+    from langchain.schema import HumanMessage
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        if old_prompt:
+            stream = get_llm().astream([HumanMessage(content=PromptTemplate.from_template(OLD_TEMPLATE).format(
+                query=QUERY, search_result=state["search_result"], graph_result=state["graph_result"],
+                passage_result=state["passage_result"]))])
+        else:
+            stream = graph_agent.stream_synthesis(dict(state, workflow_steps=[]))
+        async for event in stream:
+            content = event.content if old_prompt else event["content"] if event["type"] == "answer_chunk" else ""
+            if content:
+                samples.append(time.perf_counter() - start)
+                break
+        await stream.aclose()
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="融合上下文预算基准")
+    parser.add_argument("--budgets", default="500,1000,1500")
+    parser.add_argument("--scale", type=int, default=12, help="搜索结果条数（×3）与图谱结果规模")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--prefill-chars-per-second", type=float, default=4000.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    graph_agent = install_fakes(llm_latency=args.llm_latency)
+    from adapter import get_llm
+    from context_builder import ContextBuilder, estimate_tokens
+    get_llm().prefill_chars_per_second = args.prefill_chars_per_second
+
+    state = make_state(args.scale)
+    old_prompt = PromptTemplate.from_template(OLD_TEMPLATE).format(
+        query=QUERY, search_result=state["search_result"], graph_result=state["graph_result"],
+        passage_result=state["passage_result"])
+    old_us = per_call_us(lambda: PromptTemplate.from_template(OLD_TEMPLATE).format(
+        query=QUERY, search_result=state["search_result"], graph_result=state["graph_result"],
+        passage_result=state["passage_result"]), 2000)
+
+    original_budget = graph_agent.context_builder
+    old_ttft = asyncio.run(ttft(graph_agent, state, args.runs, old_prompt))
+    print(f"原实现（整段拼接，每次构建模板）: 提示词 {len(old_prompt):6d} 字 / ~{estimate_tokens(old_prompt):5d} tokens  "
+          f"组装 {old_us:7.1f}µs  TTFT {old_ttft * 1000:7.1f}ms")
+
+    for budget in (int(b) for b in args.budgets.split(",")):
+        graph_agent.context_builder = ContextBuilder(budget=budget)
+        prompt = graph_agent.build_synthesis_prompt(state)
+        _, stats = graph_agent.context_builder.build(QUERY, {k: state[k] for k in
+                                                             ("search_result", "graph_result", "passage_result")})
+        us = per_call_us(lambda: graph_agent.build_synthesis_prompt(state), 500)
+        budget_ttft = asyncio.run(ttft(graph_agent, state, args.runs))
+        print(f"预算 {budget:5d} tokens: 提示词 {len(prompt):6d} 字 / ~{estimate_tokens(prompt):5d} tokens  "
+              f"组装 {us:7.1f}µs  TTFT {budget_ttft * 1000:7.1f}ms  "
+              f"（片段 {stats['snippets']}，去重 {stats['duplicates']}，截断 {stats['truncated']}）")
+    graph_agent.context_builder = original_budget
+
+    print(f"\n模板: 每次 from_template + format {per_call_us(lambda: PromptTemplate.from_template(OLD_TEMPLATE).format(query=QUERY, search_result='', graph_result='', passage_result=''), 5000):.1f}µs，"
+          f"缓存后 format {per_call_us(lambda: graph_agent.SYNTHESIS_PROMPT.format(query=QUERY, search_result='', graph_result='', passage_result=''), 5000):.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+繁简转换吞吐基准（MB/s）：notebook 的逐行循环 vs 按块转换（单进程 / 进程池），以及输入未变时按校验和跳过的重跑。
+
+测试语料由 split_outputs_jsonl/ 中的简体文本经 OpenCC s2t 转成繁体后重复到指定大小。
+
+用法: python benchmarks/bench_conversion.py --mb 4 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+
+from opencc import OpenCC
+
+from conversion import DEFAULT_BLOCK_BYTES, convert_file
+
+
+def make_corpus(path: str, size_mb: float):
+    source = os.path.join(ROOT_DIR, "split_outputs_jsonl", "processed_chunks.jsonl")
+    with open(source, "r", encoding="utf-8") as f:
+        text = "\n".join(json.loads(line)["page_content"] for line in f if line.strip()) + "\n"
+    traditional = OpenCC("s2t").convert(text).encode("utf-8")
+    with open(path, "wb") as f:
+        for _ in range(max(1, int(size_mb * 1024 * 1024 / len(traditional)))):
+            f.write(traditional)
+
+
+def notebook_loop(src: str, dst: str):
+    """Traditional2Simplified.ipynb 的做法：逐行转换，全部放进列表后再写出"""
+    cc = OpenCC("t2s")
+    data = []
+    with open(src, "r", encoding="utf-8") as file:
+        for line in file:
+            line = cc.convert(line.strip())
+            if line:
+                data.append(line)
+    with open(dst, "w", encoding="utf-8") as file:
+        for line in data:
+            file.write(line + "\n")
+
+
+def report(label: str, size: int, seconds: float):
+    print(f"  {label:<24} {seconds:7.2f}s  {size / seconds / 1024 / 1024:8.2f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="繁简转换吞吐基准")
+    parser.add_argument("--mb", type=float, default=4.0, help="测试语料大小")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--block-mb", type=float, default=DEFAULT_BLOCK_BYTES / 1024 / 1024 / 4)
+    args = parser.parse_args()
+    block_bytes = int(args.block_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "data.txt")
+        make_corpus(src, args.mb)
+        size = os.path.getsize(src)
+        print(f"语料 {size / 1024 / 1024:.1f}MB，块大小 {args.block_mb}MB，CPU {os.cpu_count()} 核")
+
+        start = time.perf_counter()
+        notebook_loop(src, os.path.join(tmp, "notebook.txt"))
+        report("notebook 逐行循环", size, time.perf_counter() - start)
+
+        for workers in sorted({1, args.workers}):
+            dst = os.path.join(tmp, f"blocks_{workers}.txt")
+            stats = convert_file(src, dst, workers=workers, block_bytes=block_bytes)
+            report(f"按块转换（{workers} 进程）", size, stats["seconds"])
+            with open(dst, "rb") as a, open(os.path.join(tmp, "notebook.txt"), "rb") as b:
+                assert a.read() == b.read(), "按块转换的结果与逐行转换不一致"
+
+        stats = convert_file(src, dst, workers=args.workers, block_bytes=block_bytes)
+        report(f"重跑（复用 {stats['reused']}/{stats['blocks']} 块）", size, stats["seconds"])
+
+        with open(src, "ab") as f:
+            f.write(OpenCC("s2t").convert("追加的新内容。\n").encode("utf-8"))
+        stats = convert_file(src, dst, workers=args.workers, block_bytes=block_bytes)
+        report(f"追加后重跑（复用 {stats['reused']}/{stats['blocks']} 块）", size, stats["seconds"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Neo4j 写入基准：notebook 的单条巨型 UNWIND（无约束） vs BulkLoader（唯一约束 + 分批 + 并行 + 重试）。
+
+默认写入 benchmarks/fakes.py 中的嵌入式替身 InMemoryNeo4j（无约束时 MERGE 逐个扫描，有约束时走索引）；
+传入 --neo4j-url 时改为写入真实的 Neo4j（如本地测试容器，写入前会清空数据库）：
+    docker run -d -p 7687:7687 -e NEO4J_AUTH=neo4j/password neo4j:5
+    python benchmarks/bench_graph_loader.py --neo4j-url bolt://localhost:7687 --neo4j-password password
+
+用法: python benchmarks/bench_graph_loader.py --lakes 2000 --records 20000 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import InMemoryNeo4j
+from graph_loader import GAZETTEER_WRITE_QUERY, POEM_WRITE_QUERY, BulkLoader
+
+
+def make_rows(lakes: int, records: int, seed: int = 0):
+    """生成方志 / 诗词记录，湖名服从长尾分布（少数大湖被大量提及），并带少量重复记录"""
+    rng = random.Random(seed)
+    names = [f"湖{i}" for i in range(lakes)]
+    weights = [1.0 / (i + 1) for i in range(lakes)]
+    gazetteer_rows, poem_rows = [], []
+    for i in range(records):
+        lake = rng.choices(names, weights)[0]
+        if i % 2:
+            poem = f"诗{rng.randrange(records // 3)}"
+            poem_rows.append({"lake_name": lake, "poem_name": poem, "poem_full_text": f"{poem}全文"})
+        else:
+            source = f"志{rng.randrange(records // 4)}"
+            gazetteer_rows.append({"lake_name": lake, "location": "", "gazetteer_source": source,
+                                   "content": f"{source}内容"})
+    return gazetteer_rows, poem_rows
+
+
+def make_graph(args, error_rate: float = 0.0):
+    if not args.neo4j_url:
+        return InMemoryNeo4j(latency=args.latency, error_rate=error_rate)
+    from langchain_community.graphs import Neo4jGraph
+    graph = Neo4jGraph(url=args.neo4j_url, username=args.neo4j_user, password=args.neo4j_password,
+                       refresh_schema=False)
+    graph.query("MATCH (n) DETACH DELETE n")
+    for name in ("lake_name", "gazetteer_source", "poem_name"):
+        graph.query(f"DROP CONSTRAINT {name} IF EXISTS")
+    return graph
+
+
+def counts(graph):
+    if isinstance(graph, InMemoryNeo4j):
+        return graph.counts()
+    rows = graph.query("MATCH (n) WITH count(n) AS nodes MATCH ()-[r]->() RETURN nodes, count(r) AS relationships")
+    return rows[0] if rows else {}
+
+
+def report(label: str, rows: int, seconds: float, extra: str = ""):
+    print(f"  {label:<28} {seconds:7.2f}s  {rows / seconds:9.0f} 条/s  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Neo4j 写入基准")
+    parser.add_argument("--lakes", type=int, default=2000)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.005, help="替身每次 query 的往返延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="重试测试中每次写入失败的概率")
+    parser.add_argument("--neo4j-url", default="")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password", default="password")
+    args = parser.parse_args()
+
+    gazetteer_rows, poem_rows = make_rows(args.lakes, args.records)
+    total = len(gazetteer_rows) + len(poem_rows)
+    print(f"{total} 条记录（{args.lakes} 个湖泊），目标: {args.neo4j_url or 'InMemoryNeo4j'}")
+
+    graph = make_graph(args)
+    start = time.perf_counter()
+    graph.query(GAZETTEER_WRITE_QUERY, {"data": gazetteer_rows})
+    graph.query(POEM_WRITE_QUERY, {"data": poem_rows})
+    report("notebook 单条 UNWIND，无约束", total, time.perf_counter() - start, str(counts(graph)))
+    expected = counts(graph)
+
+    for workers in sorted({1, args.workers}):
+        graph = make_graph(args)
+        loader = BulkLoader(graph, batch_size=args.batch_size, workers=workers)
+        start = time.perf_counter()
+        loader.ensure_schema()
+        loader.load_extractions(gazetteer_rows, poem_rows)
+        seconds = time.perf_counter() - start
+        assert counts(graph) == expected, "分批写入的结果与单条写入不一致"
+        report(f"BulkLoader 约束 + 分批（{workers} 会话）", total, seconds, f"{loader.stats()['batches']} 批")
+
+    start = time.perf_counter()
+    loader.load_extractions(gazetteer_rows, poem_rows)
+    assert counts(graph) == expected, "重复写入产生了重复的节点或关系"
+    report("重复写入（幂等）", total, time.perf_counter() - start, str(counts(graph)))
+
+    if not args.neo4j_url:
+        graph = make_graph(args, error_rate=args.error_rate)
+        loader = BulkLoader(graph, batch_size=args.batch_size, workers=args.workers, retry_backoff=0.01)
+        start = time.perf_counter()
+        loader.ensure_schema()
+        loader.load_extractions(gazetteer_rows, poem_rows)
+        assert counts(graph) == expected, "重试后的结果与单条写入不一致"
+        report(f"临时错误率 {args.error_rate:.0%}", total, time.perf_counter() - start,
+               f"重试 {loader.stats()['retries']} 次")
+
+
+if __name__ == "__main__":
+    main()
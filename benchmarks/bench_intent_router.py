@@ -0,0 +1,68 @@
+"""
+意图路由快速路径 vs GraphCypherQAChain（LLM 生成 Cypher + LLM 组织答案）的延迟对比。
+
+LLM 延迟默认按线上经验设为 0.8s/次，可通过参数调整；Neo4j 查询延迟同样可配置。
+
+用法: python benchmarks/bench_intent_router.py --llm-latency 0.8 --graph-latency 0.01
+"""
+import argparse
+import statistics
+import time
+
+from fakes import install_fakes
+
+QUESTIONS = [
+    "合肥志上记载有哪些湖？",
+    "有哪些诗词提到了巢湖？",
+    "巢湖在哪里",
+    "哪些方志记载了丹阳湖",
+    "饮湖上初晴后雨提到了哪个湖",
+    "有哪些诗词提到了湖泊？",
+    "哪些方志记载了湖泊信息？",
+    "安东县所在的省份",  # 非图谱意图，走回退
+]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="意图路由延迟基准")
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--graph-latency", type=float, default=0.01)
+    parser.add_argument("--route-iterations", type=int, default=10000)
+    args = parser.parse_args()
+
+    graph_agent = install_fakes(llm_latency=args.llm_latency, tokens_per_second=0,
+                                graph_latency=args.graph_latency)
+    router = graph_agent.intent_router
+    router.load()
+
+    fast, slow = [], []
+    print(f"{'问题':<24}{'意图':<24}{'快速路径':>10}{'LLM 路径':>10}")
+    for question in QUESTIONS:
+        graph_agent.cypher_cache.invalidate()
+        fast_ms, fast_result = timed(router.answer, question)
+        slow_ms, _ = timed(graph_agent.invoke_graph_chain, question)
+        intent = fast_result["intent"] if fast_result else "(回退)"
+        print(f"{question:<24}{intent:<24}{fast_ms:>9.1f}ms{slow_ms:>9.1f}ms")
+        if fast_result:
+            fast.append(fast_ms)
+            slow.append(slow_ms)
+
+    print(f"\n命中快速路径: {len(fast)}/{len(QUESTIONS)}")
+    print(f"快速路径 p50={statistics.median(fast):.1f}ms, LLM 路径 p50={statistics.median(slow):.1f}ms, "
+          f"加速 {statistics.median(slow) / statistics.median(fast):.0f}x")
+
+    start = time.perf_counter()
+    for _ in range(args.route_iterations):
+        router.route("安东县所在的省份")
+    per_call = (time.perf_counter() - start) / args.route_iterations * 1e6
+    print(f"未命中问题的路由开销: {per_call:.1f}µs/次 (词典 {len(router.dictionary)} 个实体)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+端到端压测：在子进程中启动带本地替身（LLM / Neo4j / 搜索引擎）的 app，按不同并发度压测 /api/chat 与 /api/chat/stream。
+
+每个并发度报告吞吐、延迟 p50/p95/p99、流式接口的首个答案块延迟（TTFT）、429 / 失败数，
+以及服务进程的常驻内存（当前 RSS 与峰值）。全程不访问网络，替身的延迟与吐字速率可配置。
+
+发版前回归检查：先在基线版本上 --save 保存结果，再在新版本上用 --baseline 对比，
+吞吐下降或 p95 延迟 / p95 TTFT / 峰值内存上升超过 --tolerance 时以退出码 1 结束。
+
+用法:
+    python benchmarks/bench_load.py --concurrency 1,8,32 --requests 64 --save baseline.json
+    python benchmarks/bench_load.py --concurrency 1,8,32 --requests 64 --baseline baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUESTIONS = ["巢湖在哪里", "安东县所在的省份", "合肥志上记载有哪些湖？", "有哪些诗词提到了湖泊？"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(args):
+    """子进程入口：装好替身后启动 uvicorn"""
+    sys.path.insert(0, BENCH_DIR)
+    from fakes import install_fakes
+    install_fakes(llm_latency=args.llm_latency, tokens_per_second=args.tokens_per_second,
+                  graph_latency=args.graph_latency, search_latency=args.search_latency)
+    import uvicorn
+    import app as app_module
+    uvicorn.run(app_module.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    command = [sys.executable, "-W", "ignore", os.path.abspath(__file__), "--serve", "--port", str(port),
+               "--llm-latency", str(args.llm_latency), "--tokens-per-second", str(args.tokens_per_second),
+               "--graph-latency", str(args.graph_latency), "--search-latency", str(args.search_latency)]
+    env = {**os.environ, "LOG_LEVEL": "ERROR", "PYTHONWARNINGS": "ignore", "AGENT_MAX_QUEUE": str(args.max_queue)}
+    process = subprocess.Popen(command, cwd=BENCH_DIR, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("服务进程启动失败")
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """服务进程的当前 RSS（VmRSS）与峰值（VmHWM），单位 MB"""
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, amount = line.split(":")
+                values["rss" if key == "VmRSS" else "peak"] = int(amount.split()[0]) / 1024
+    return values
+
+
+def pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def chat_once(client: httpx.AsyncClient, query: str) -> Dict[str, Optional[float]]:
+    start = time.perf_counter()
+    response = await client.post("/api/chat", json={"query": query})
+    ok = response.status_code == 200 and response.json().get("success")
+    return {"status": response.status_code, "ok": ok, "total": time.perf_counter() - start, "ttft": None}
+
+
+async def stream_once(client: httpx.AsyncClient, query: str) -> Dict[str, Optional[float]]:
+    start = time.perf_counter()
+    first_chunk, ok = None, False
+    async with client.stream("POST", "/api/chat/stream", json={"query": query}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return {"status": response.status_code, "ok": False, "total": time.perf_counter() - start, "ttft": None}
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "answer_chunk" and first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            elif event["type"] == "complete":
+                ok = True
+    return {"status": 200, "ok": ok, "total": time.perf_counter() - start, "ttft": first_chunk}
+
+
+def make_query(i: int, distinct: int) -> str:
+    """distinct=0 时每个请求都是不同的问题（绕过答案缓存与请求合并），否则在 distinct 个问题间轮换"""
+    if distinct:
+        return f"{QUESTIONS[i % len(QUESTIONS)]}（{i % distinct}）"
+    return f"{QUESTIONS[i % len(QUESTIONS)]}（{time.time_ns()}-{i}）"
+
+
+async def run_level(base_url: str, mode: str, concurrency: int, requests: int, distinct: int, pid: int) -> Dict:
+    once = stream_once if mode == "stream" else chat_once
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+    results: List[Dict] = []
+
+    async def client_loop(client: httpx.AsyncClient):
+        while not queue.empty():
+            i = queue.get_nowait()
+            try:
+                results.append(await once(client, make_query(i, distinct)))
+            except httpx.HTTPError:
+                results.append({"status": 0, "ok": False, "total": 0.0, "ttft": None})
+
+    limits = httpx.Limits(max_connections=concurrency + 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        await once(client, make_query(-1, 0))  # 预热：编译工作流、建立连接
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    latencies = [r["total"] for r in results if r["ok"]]
+    ttfts = [r["ttft"] for r in results if r["ok"] and r["ttft"] is not None]
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "rejected": sum(1 for r in results if r["status"] == 429),
+        "failed": sum(1 for r in results if not r["ok"] and r["status"] != 429),
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": pct(latencies, 0.5), "p95": pct(latencies, 0.95), "p99": pct(latencies, 0.99),
+        "ttft_p50": pct(ttfts, 0.5), "ttft_p95": pct(ttfts, 0.95), "ttft_p99": pct(ttfts, 0.99),
+        **{f"mem_{k}_mb": v for k, v in memory_mb(pid).items()},
+    }
+
+
+def print_result(r: Dict):
+    line = (f"  {r['mode']:<6} 并发 {r['concurrency']:>3}  吞吐 {r['throughput']:7.2f} 请求/秒  "
+            f"延迟 p50={r['p50']:.2f}s p95={r['p95']:.2f}s p99={r['p99']:.2f}s")
+    if r["mode"] == "stream":
+        line += f"  TTFT p50={r['ttft_p50']:.2f}s p95={r['ttft_p95']:.2f}s p99={r['ttft_p99']:.2f}s"
+    line += f"  RSS {r['mem_rss_mb']:.0f}MB（峰值 {r['mem_peak_mb']:.0f}MB）"
+    if r["rejected"] or r["failed"]:
+        line += f"  429 {r['rejected']} 失败 {r['failed']}"
+    print(line)
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    """与基线逐项对比，返回超出容差的回归项"""
+    previous = {(r["mode"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get((r["mode"], r["concurrency"]))
+        if base is None:
+            continue
+        label = f"{r['mode']} 并发 {r['concurrency']}"
+        if base["throughput"] and r["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{label}: 吞吐 {base['throughput']:.2f} -> {r['throughput']:.2f} 请求/秒")
+        for key in ("p95", "ttft_p95", "mem_peak_mb"):
+            if base.get(key) and r[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{label}: {key} {base[key]:.2f} -> {r[key]:.2f}")
+        if r["failed"] > base["failed"]:
+            regressions.append(f"{label}: 失败请求 {base['failed']} -> {r['failed']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument("--concurrency", default="1,8,32", help="逗号分隔的并发度列表")
+    parser.add_argument("--requests", type=int, default=64, help="每个并发度发出的请求数")
+    parser.add_argument("--mode", choices=["chat", "stream", "both"], default="both")
+    parser.add_argument("--distinct", type=int, default=0, help="不同问题的数量，0 表示每个请求都不同（不命中缓存）")
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="替身 LLM 的流式吐字速率")
+    parser.add_argument("--graph-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--max-queue", type=int, default=256, help="服务端 AGENT_MAX_QUEUE，调小可观察 429 背压")
+    parser.add_argument("--save", help="把结果写入 JSON 文件（作为之后对比的基线）")
+    parser.add_argument("--baseline", help="与该 JSON 基线对比，超出容差时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对回归幅度")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    port = free_port()
+    server = start_server(args, port)
+    modes = ["chat", "stream"] if args.mode == "both" else [args.mode]
+    results = []
+    print(f"替身延迟: LLM {args.llm_latency}s（{args.tokens_per_second:.0f} 字/秒），"
+          f"Neo4j {args.graph_latency}s，搜索 {args.search_latency}s；每个并发度 {args.requests} 个请求")
+    try:
+        for mode in modes:
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                result = asyncio.run(run_level(f"http://127.0.0.1:{port}", mode, concurrency,
+                                               args.requests, args.distinct, server.pid))
+                print_result(result)
+                results.append(result)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k not in ("save", "baseline", "serve", "port")},
+                       "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.save}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        if regressions:
+            print(f"❌ 相对基线回归超过 {args.tolerance:.0%}:")
+            for item in regressions:
+                print(f"  {item}")
+            sys.exit(1)
+        print(f"✅ 与基线相比无超过 {args.tolerance:.0%} 的回归")
+
+
+if __name__ == "__main__":
+    main()
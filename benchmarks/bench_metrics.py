@@ -0,0 +1,97 @@
+"""
+分阶段指标基准：埋点与结构化日志本身的开销，以及用替身跑一批问题后 /api/metrics 给出的各阶段耗时分解。
+
+用法: python benchmarks/bench_metrics.py --requests 20 --search-latency 0.3
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from fakes import install_fakes
+
+
+def per_call(fn, n: int = 200000) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def overhead():
+    import metrics
+    import logger
+    from logger import get_logger
+
+    histogram = metrics.Histogram("bench_seconds", "基准", ["step"])
+    log = get_logger("bench")
+    sink = io.StringIO()
+    logger.set_stream(sink)
+
+    def timer():
+        with metrics.step_timer("bench"):
+            pass
+
+    def printed():
+        with redirect_stdout(sink):
+            print(f"🔍 步骤1: 搜索引擎查询 - {'巢湖在哪里'}")
+
+    print("单次调用开销:")
+    print(f"  Histogram.observe           {per_call(lambda: histogram.observe(0.1, step='search')):6.2f} µs")
+    print(f"  step_timer                  {per_call(timer):6.2f} µs")
+    print(f"  log.debug（级别关闭）       {per_call(lambda: log.debug('调试', query='巢湖在哪里')):6.2f} µs")
+    print(f"  log.info（含后台格式化）    {per_call(lambda: log.info('🔍 步骤1: 搜索引擎查询', query='巢湖在哪里'), 50000):6.2f} µs")
+    print(f"  print（原实现）             {per_call(printed, 50000):6.2f} µs")
+    time.sleep(1)  # 等后台线程写完队列中的日志
+    logger.set_stream(sys.stdout)
+    metrics.STEP_SECONDS._series.pop(("bench",), None)
+
+
+def stage_breakdown(args):
+    graph_agent = install_fakes(llm_latency=args.llm_latency, search_latency=args.search_latency,
+                                graph_latency=args.graph_latency)
+    import logger
+    import metrics
+    logger.set_level("WARNING")
+
+    questions = ["巢湖在哪里", "安东县所在的省份", "合肥志上记载有哪些湖？", "有哪些诗词提到了湖泊？"]
+    for i in range(args.requests):
+        graph_agent.run_agent(f"{questions[i % len(questions)]}（{i}）", use_cache=False)
+
+    async def stream_all():
+        for i in range(args.requests):
+            async for _ in graph_agent.run_agent_stream(f"{questions[i % len(questions)]}（流式 {i}）", use_cache=False):
+                pass
+    asyncio.run(stream_all())
+
+    def report(title, histogram, label):
+        print(title)
+        for key, series in sorted(histogram._series.items()):
+            count, total = series[-1], series[-2]
+            print(f"  {'/'.join(key):<34} {count:4d} 次  平均 {total / count * 1000:8.1f} ms")
+
+    print(f"\n{args.requests} 个同步请求 + {args.requests} 个流式请求（LLM {args.llm_latency}s，搜索 {args.search_latency}s）")
+    report("节点耗时:", metrics.NODE_SECONDS, "node")
+    report("子步骤耗时:", metrics.STEP_SECONDS, "step")
+    report("首个答案块:", metrics.FIRST_TOKEN_SECONDS, "scope")
+    print("LLM 调用:", {k[0]: int(v) for k, v in sorted(metrics.LLM_CALLS._values.items())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分阶段指标基准")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--graph-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    overhead()
+    stage_breakdown(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+查询分类基准：在标注问题集上统计规则分类的覆盖率与准确率、LLM 兜底的比例，
+以及开启 / 关闭条件路由时端到端的延迟、搜索引擎调用次数和 LLM 调用次数。
+
+LLM 兜底使用替身模型（固定回答 --llm-route），因此兜底部分的准确率只反映该固定回答；
+真实模型下的准确率需要在线上按 agent_route_total{method="llm"} 抽样复核。
+
+用法: python benchmarks/bench_query_routing.py --search-latency 0.3 --llm-latency 0.05
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+
+from fakes import install_fakes
+
+# (问题, 期望分类)
+LABELLED = [
+    ("安东县所在的省份", "search"),
+    ("合肥现在属于哪个省", "search"),
+    ("庐州府今属哪个市", "search"),
+    ("太湖的面积有多大", "search"),
+    ("巢湖今天的天气怎么样", "search"),
+    ("西湖门票多少钱", "search"),
+    ("鄱阳湖最新的水位新闻", "search"),
+    ("李白是谁", "search"),
+    ("苏轼是哪个朝代的人", "search"),
+    ("宣城县古称什么", "search"),
+    ("去洞庭湖怎么去", "search"),
+    ("合肥志上记载有哪些湖？", "graph"),
+    ("有哪些诗词提到了湖泊？", "graph"),
+    ("哪些方志记载了湖泊信息？", "graph"),
+    ("有哪些诗词提到了巢湖？", "graph"),
+    ("哪些方志记载了丹阳湖", "graph"),
+    ("饮湖上初晴后雨提到了哪个湖", "graph"),
+    ("太平府志里有哪些湖", "graph"),
+    ("望洞庭湖赠张丞相写的是哪个湖", "graph"),
+    ("丹阳湖在方志中是怎么记载的", "graph"),
+    ("西湖出现在哪些诗里", "graph"),
+    ("方志里有湖的记录吗", "graph"),
+    ("巢湖在哪里", "both"),
+    ("丹阳湖位于什么地方", "both"),
+    ("西湖在哪", "both"),
+    ("饮湖上初晴后雨的作者是谁", "both"),
+    ("巢湖的历史", "both"),
+    ("合肥志的作者是谁", "both"),
+    ("介绍一下巢湖", "both"),
+    ("随便聊聊", "both"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询分类基准")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--graph-latency", type=float, default=0.02)
+    parser.add_argument("--llm-route", default="both", help="替身 LLM 兜底时的回答")
+    parser.add_argument("--iterations", type=int, default=2000, help="测规则分类耗时的重复次数")
+    args = parser.parse_args()
+
+    graph_agent = install_fakes(llm_latency=args.llm_latency, search_latency=args.search_latency,
+                                graph_latency=args.graph_latency)
+    from adapter import get_llm
+    get_llm().route = args.llm_route
+    graph_agent.intent_router.load()
+    classifier = graph_agent.query_classifier
+
+    # 1. 分类准确率
+    confusion, methods, misses = Counter(), Counter(), []
+    llm_seconds = []
+    for question, expected in LABELLED:
+        start = time.perf_counter()
+        route, method = classifier.classify(question, graph_agent._classify_llm)
+        if method != "rule":
+            llm_seconds.append(time.perf_counter() - start)
+        methods[method] += 1
+        confusion[(expected, route)] += 1
+        if route != expected:
+            misses.append((question, expected, route, method))
+    correct = sum(v for (expected, route), v in confusion.items() if expected == route)
+    rule_total = methods["rule"]
+    rule_correct = sum(1 for q, e in LABELLED if classifier.rule(q) == e)
+    print(f"标注问题 {len(LABELLED)} 个：规则判定 {rule_total} 个（覆盖率 {rule_total / len(LABELLED):.0%}，"
+          f"其中正确 {rule_correct}），LLM / 默认兜底 {len(LABELLED) - rule_total} 个")
+    print(f"整体准确率 {correct / len(LABELLED):.1%}")
+    print("混淆矩阵（行: 期望，列: 实际）")
+    routes = ("search", "graph", "both")
+    print("  " + "".join(f"{r:>8}" for r in ("",) + routes))
+    for expected in routes:
+        print(f"  {expected:>8}" + "".join(f"{confusion[(expected, r)]:>8}" for r in routes))
+    for question, expected, route, method in misses:
+        print(f"  ✗ {question}  期望 {expected}，实际 {route}（{method}）")
+
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        classifier.rule(LABELLED[i % len(LABELLED)][0])
+    rule_us = (time.perf_counter() - start) / args.iterations * 1e6
+    llm_ms = statistics.mean(llm_seconds) * 1000 if llm_seconds else 0.0
+    print(f"分类耗时: 规则 {rule_us:.1f}µs/次，LLM 兜底 {llm_ms:.1f}ms/次")
+
+    # 2. 端到端：开启 / 关闭条件路由
+    search = graph_agent.get_search_tool()
+    llm = get_llm()
+    print(f"\n端到端（搜索 {args.search_latency}s，LLM {args.llm_latency}s，Neo4j {args.graph_latency}s）")
+    for enabled in (False, True):
+        graph_agent.QUERY_ROUTING_ENABLED = enabled
+        graph_agent.cypher_cache.invalidate()
+        search_before, llm_before = search.calls, llm.calls
+        latencies = []
+        for i, (question, _) in enumerate(LABELLED):
+            start = time.perf_counter()
+            graph_agent.run_agent(f"{question}（{enabled}-{i}）", use_cache=False)
+            latencies.append(time.perf_counter() - start)
+        label = "开启条件路由" if enabled else "关闭条件路由"
+        print(f"  {label}: 平均 {statistics.mean(latencies) * 1000:7.1f}ms  p50 {statistics.median(latencies) * 1000:7.1f}ms  "
+              f"搜索调用 {search.calls - search_before:3d}  LLM 调用 {llm.calls - llm_before:3d}")
+
+
+if __name__ == "__main__":
+    main()
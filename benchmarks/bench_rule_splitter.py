@@ -0,0 +1,96 @@
+"""
+规则分块 vs 纯 LLM 分块：一致率与吞吐报告。
+
+以 split_outputs_jsonl/ 中已有的 LLM 分块结果为参照：把各块按顺序拼回全文，
+再按 chunk.ipynb 的参数（1000 / 200）重叠预分块，用规则分块器处理置信度达到阈值的预分块，
+比较规则分块与 LLM 分块的边界（精确率 / 召回率）以及完全一致的块所占比例，
+并统计不同阈值下可跳过的 LLM 调用比例与规则分块器的吞吐。
+
+用法: python benchmarks/bench_rule_splitter.py --thresholds 0.7 0.8 0.85 0.9
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from llmsplitter import OverlapStitcher, locate_coarse_chunks
+from rulesplitter import RuleStructuralTextSplitter
+
+
+def load_reference(path: str):
+    """返回拼接后的全文与 LLM 分块在全文中的 [start, end) 列表"""
+    with open(path, "r", encoding="utf-8") as f:
+        chunks = [json.loads(line)["page_content"].strip() for line in f if line.strip()]
+    spans, offset = [], 0
+    for chunk in chunks:
+        spans.append((offset, offset + len(chunk)))
+        offset += len(chunk) + 1
+    return "\n".join(chunks), spans
+
+
+def evaluate(text, reference_spans, coarse, starts, split_results, threshold):
+    stitcher = OverlapStitcher()
+    rule_spans, regions = [], []
+    for i, (chunk, start) in enumerate(zip(coarse, starts)):
+        chunks, confidence = split_results[i]
+        if confidence < threshold:
+            continue
+        regions.append((start, start + len(chunk)))
+        next_start = starts[i + 1] if i + 1 < len(starts) else None
+        rule_spans.extend((s, e) for _, s, e in stitcher.stitch(chunk, start, next_start, chunks) if s is not None)
+
+    def in_regions(offset):
+        return any(lo <= offset < hi for lo, hi in regions)
+
+    reference_starts = {s for s, _ in reference_spans if in_regions(s)}
+    rule_starts = {s for s, _ in rule_spans}
+    hits = len(reference_starts & rule_starts)
+    exact = len(set(rule_spans) & set(reference_spans))
+    return {
+        "routed": len(regions) / len(coarse),
+        "precision": hits / len(rule_starts) if rule_starts else 0.0,
+        "recall": hits / len(reference_starts) if reference_starts else 0.0,
+        "exact": exact / len(rule_spans) if rule_spans else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规则分块一致率与吞吐报告")
+    parser.add_argument("--inputs", nargs="+", default=sorted(glob.glob(os.path.join(ROOT_DIR, "split_outputs_jsonl", "*.jsonl"))))
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[0.7, 0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--llm-seconds", type=float, default=8.0, help="估算节省时间用的单次 LLM 分块耗时")
+    args = parser.parse_args()
+
+    coarse_splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                                     keep_separator=True, is_separator_regex=False)
+    rules = RuleStructuralTextSplitter()
+    for path in args.inputs:
+        text, reference_spans = load_reference(path)
+        coarse = coarse_splitter.split_text(text)
+        starts = locate_coarse_chunks(text, coarse)
+
+        start = time.perf_counter()
+        split_results = [rules.split_with_confidence(chunk) for chunk in coarse]
+        seconds = time.perf_counter() - start
+        size = sum(len(chunk.encode("utf-8")) for chunk in coarse)
+
+        print(f"\n{os.path.basename(path)}: 参照 {len(reference_spans)} 块，预分块 {len(coarse)} 个")
+        print(f"  规则分块吞吐: {size / seconds / 1024 / 1024:.1f} MB/s（{seconds / len(coarse) * 1000:.3f} ms/预分块）")
+        for threshold in args.thresholds:
+            r = evaluate(text, reference_spans, coarse, starts, split_results, threshold)
+            saved = r["routed"] * len(coarse)
+            print(f"  阈值 {threshold:.2f}: 规则处理 {r['routed']:6.1%}（省去 {saved:.0f} 次 LLM 调用，约 {saved * args.llm_seconds:.0f}s）"
+                  f"  边界精确率 {r['precision']:6.1%}  召回率 {r['recall']:6.1%}  完全一致 {r['exact']:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
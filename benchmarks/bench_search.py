@@ -0,0 +1,104 @@
+"""
+搜索子系统基准：
+1. 缓存：冷查询 vs 命中缓存的延迟，以及“重启”（新建缓存对象、重新打开同一个 SQLite 文件）后的命中率
+2. 截止时间：后端卡住时，原实现一直等到后端返回，搜索服务在 deadline 秒后放弃
+3. 对冲：后端有长尾（一定比例的请求很慢）时，单后端 / 延迟对冲 / 同时竞速的 p50 / p95 / p99 与平均后端调用数
+
+HTTP 后端是本机的 JSON 搜索替身（fakes.serve_fake_search），延迟与长尾比例可配置。
+
+用法: python benchmarks/bench_search.py --latency 0.1 --slow-rate 0.1 --slow-latency 2 --hedge-delay 0.3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from fakes import FakeSearchTool, install_fakes, serve_fake_search
+
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索子系统基准")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--search-latency", type=float, default=0.3, help="搜索工具替身的延迟（缓存部分）")
+    parser.add_argument("--latency", type=float, default=0.1, help="HTTP 替身的正常延迟")
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--hedge-delay", type=float, default=0.3)
+    parser.add_argument("--deadline", type=float, default=1.0)
+    parser.add_argument("--requests", type=int, default=100, help="对冲部分每种配置的请求数")
+    args = parser.parse_args()
+
+    install_fakes()
+    from search_service import HttpSearchBackend, SearchCache, SearchError, SearchService, ToolSearchBackend
+
+    # 1. 缓存
+    tool = FakeSearchTool(latency=args.search_latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "search_cache.db")
+        service = SearchService([ToolSearchBackend(lambda: tool)], cache=SearchCache(path), deadline=10)
+        questions = [f"巢湖在哪里 {i}" for i in range(args.queries)]
+        cold, warm = [], []
+        for samples in (cold, warm):
+            for question in questions:
+                start = time.perf_counter()
+                service.search(question)
+                samples.append(time.perf_counter() - start)
+        restarted = SearchService([ToolSearchBackend(lambda: tool)], cache=SearchCache(path), deadline=10)
+        calls_before = tool.calls
+        start = time.perf_counter()
+        for question in questions:
+            restarted.search(f"  {question}？")  # 归一化后命中同一条缓存
+        restart_ms = (time.perf_counter() - start) / len(questions) * 1000
+        print(f"缓存（{args.queries} 个问题，搜索替身 {args.search_latency}s）")
+        print(f"  冷查询 p50 {statistics.median(cold) * 1000:8.2f}ms   命中缓存 p50 {statistics.median(warm) * 1000:8.3f}ms")
+        print(f"  重启后: 命中 {restarted.stats()['cache_hits']}/{len(questions)}，后端调用 {tool.calls - calls_before} 次，"
+              f"平均 {restart_ms:.3f}ms；缓存文件 {os.path.getsize(path) / 1024:.0f}KB")
+
+    # 2. 截止时间
+    stuck = FakeSearchTool(latency=args.deadline * 3)
+    start = time.perf_counter()
+    stuck.run("巢湖在哪里")
+    old_seconds = time.perf_counter() - start
+    service = SearchService([ToolSearchBackend(lambda: stuck)], deadline=args.deadline)
+    start = time.perf_counter()
+    try:
+        service.search("巢湖在哪里")
+        outcome = "返回结果"
+    except SearchError as e:
+        outcome = f"SearchError: {e}"
+    print(f"\n截止时间（后端耗时 {args.deadline * 3:.1f}s）")
+    print(f"  原实现等待 {old_seconds:.2f}s；搜索服务 {time.perf_counter() - start:.2f}s 后放弃（{outcome}）")
+
+    # 3. 对冲：两个相互独立、各有长尾的 HTTP 后端
+    servers = [serve_fake_search(latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency, seed=seed)
+               for seed in (1, 2)]
+    primary, secondary = (HttpSearchBackend(url, timeout=10) for url, _ in servers)
+    secondary.name = "http-2"
+    configs = [
+        ("单后端", SearchService([primary], deadline=10)),
+        (f"对冲（{args.hedge_delay}s 后加发）", SearchService([primary, secondary], deadline=10, hedge_delay=args.hedge_delay)),
+        ("同时竞速", SearchService([primary, secondary], deadline=10, hedge_delay=0)),
+    ]
+    print(f"\n对冲（HTTP 替身 {args.latency}s，{args.slow_rate:.0%} 的请求 {args.slow_latency}s，{args.requests} 次请求）")
+    for label, service in configs:
+        latencies = []
+        for i in range(args.requests):
+            start = time.perf_counter()
+            service.search(f"巢湖在哪里 {label} {i}")
+            latencies.append(time.perf_counter() - start)
+        stats = service.stats()
+        calls = args.requests + stats["hedged"]  # 两个后端时，每次加发多一次调用
+        print(f"  {label:<18} p50 {statistics.median(latencies) * 1000:7.1f}ms  p95 {percentile(latencies, 0.95) * 1000:7.1f}ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.1f}ms  后端调用 {calls / args.requests:.2f} 次/请求  胜出 {stats['wins']}")
+    for _, server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
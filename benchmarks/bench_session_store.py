@@ -0,0 +1,95 @@
+"""
+会话存储内存与吞吐基准：10 万个会话下对比原先的 dict[list[ChatMessage]]、MemorySessionStore 与 SQLiteSessionStore。
+
+用法: python benchmarks/bench_session_store.py --sessions 100000 --messages 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from pydantic import BaseModel
+
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class ChatMessage(BaseModel):
+    message: str
+    timestamp: str
+    type: str
+
+
+def make_message(i: int) -> dict:
+    return {"message": f"合肥志上记载有哪些湖？#{i}", "timestamp": datetime.now().isoformat(),
+            "type": "user" if i % 2 == 0 else "assistant"}
+
+
+def measure(label: str, fill, sessions: int, messages: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = fill(sessions, messages)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    appends = sessions * messages
+    print(f"{label:<36} 内存 {current / 1024 / 1024:8.1f}MB  "
+          f"追加 {appends / elapsed:10.0f} 条/秒  ({elapsed:.2f}s)")
+    return store
+
+
+def fill_dict(sessions, messages):
+    chat_sessions = {}
+    for s in range(sessions):
+        for m in range(messages):
+            chat_sessions.setdefault(f"session-{s}", []).append(ChatMessage(**make_message(m)))
+    return chat_sessions
+
+
+def fill_memory(max_sessions):
+    def fill(sessions, messages):
+        store = MemorySessionStore(max_sessions=max_sessions, max_messages=200)
+        for s in range(sessions):
+            for m in range(messages):
+                store.append(f"session-{s}", make_message(m))
+        return store
+    return fill
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话存储基准")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=4, help="每个会话的消息数")
+    parser.add_argument("--sqlite-sessions", type=int, default=20000, help="SQLite 后端写入的会话数")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} 个会话 × {args.messages} 条消息")
+    measure("原 dict[list[ChatMessage]]（无上限）", fill_dict, args.sessions, args.messages)
+    measure("MemorySessionStore（不设上限）", fill_memory(args.sessions), args.sessions, args.messages)
+    store = measure("MemorySessionStore（上限 10000 会话）", fill_memory(10000), args.sessions, args.messages)
+    print(f"  -> 保留会话 {store.stats()['sessions']}，淘汰 {store.stats()['evictions']}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.db")
+        sqlite_store = SQLiteSessionStore(path)
+        start = time.perf_counter()
+        for s in range(args.sqlite_sessions):
+            for m in range(args.messages):
+                sqlite_store.append(f"session-{s}", make_message(m))
+        elapsed = time.perf_counter() - start
+        print(f"{'SQLiteSessionStore':<36} 文件 {os.path.getsize(path) / 1024 / 1024:8.1f}MB  "
+              f"追加 {args.sqlite_sessions * args.messages / elapsed:10.0f} 条/秒  ({args.sqlite_sessions} 个会话)")
+
+        start = time.perf_counter()
+        reads = 2000
+        for s in range(reads):
+            sqlite_store.history(f"session-{s}", offset=0, limit=20)
+        print(f"  -> 分页读取 {(time.perf_counter() - start) / reads * 1e6:.0f}µs/次")
+
+
+if __name__ == "__main__":
+    main()
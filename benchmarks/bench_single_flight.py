@@ -0,0 +1,63 @@
+"""
+请求合并基准：N 个相同问题同时进入 run_agent_stream，对比关闭/开启 single-flight 时
+实际执行的流程次数（以搜索引擎调用次数计）、总耗时，并验证中途加入的订阅者能收到完整事件序列。
+
+用法: python benchmarks/bench_single_flight.py --clients 32 --search-latency 0.3
+"""
+import argparse
+import asyncio
+import time
+
+from fakes import install_fakes
+
+QUESTION = "巢湖在哪里？"
+
+
+async def consume(graph_agent, query: str, delay: float = 0.0) -> list:
+    await asyncio.sleep(delay)
+    return [event async for event in graph_agent.run_agent_stream(query, use_cache=False)]
+
+
+def event_signature(events: list) -> list:
+    """去掉每个订阅者独立生成的开始事件，只比较共享部分"""
+    return [(e["type"], e.get("step"), e.get("status"), e.get("content")) for e in events if e["type"] != "start"]
+
+
+async def run(graph_agent, clients: int, late_delay: float) -> dict:
+    search = graph_agent.get_search_tool()
+    calls_before = search.calls
+    start = time.perf_counter()
+    tasks = [consume(graph_agent, QUESTION) for _ in range(clients)]
+    tasks.append(consume(graph_agent, QUESTION + " ", delay=late_delay))  # 归一化后相同，中途加入
+    results = await asyncio.gather(*tasks)
+    return {
+        "wall": time.perf_counter() - start,
+        "executions": search.calls - calls_before,
+        "complete": sum(1 for events in results if events[-1]["type"] == "complete"),
+        "late_matches": event_signature(results[-1]) == event_signature(results[0]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="请求合并基准")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--late-delay", type=float, default=0.35, help="迟到订阅者的加入时间（秒）")
+    args = parser.parse_args()
+
+    graph_agent = install_fakes(llm_latency=args.llm_latency, search_latency=args.search_latency)
+    graph_agent.warmup_agent()
+
+    for enabled in (False, True):
+        graph_agent.SINGLE_FLIGHT_ENABLED = enabled
+        result = asyncio.run(run(graph_agent, args.clients, args.late_delay))
+        label = "开启 single-flight" if enabled else "关闭 single-flight"
+        print(f"{label}: {args.clients + 1} 个相同请求 -> 执行 {result['executions']} 次流程, "
+              f"总耗时 {result['wall']:.2f}s, 完整结束 {result['complete']} 个, "
+              f"迟到订阅者事件一致: {result['late_matches']}")
+    print(f"stream 合并统计: {graph_agent.inflight_streams.stats()}")
+
+
+if __name__ == "__main__":
+    main()
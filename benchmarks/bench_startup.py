@@ -0,0 +1,77 @@
+"""
+启动耗时基准：`import graph_agent` 的墙钟时间，以及从启动 uvicorn 到 /api/health 首次返回 200 的时间。
+
+两项都在不带任何凭据的干净环境变量下运行，确认导入和健康检查不依赖 LLM / Neo4j / 搜索引擎的连通性。
+
+用法: python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import graph_agent; print(time.perf_counter() - t)"
+
+
+def clean_env() -> dict:
+    env = {key: os.environ[key] for key in ("PATH", "HOME", "LANG") if key in os.environ}
+    env["PYTHONWARNINGS"] = "ignore"
+    return env
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time() -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=SRC_DIR, env=clean_env(),
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_to_health(timeout: float = 60) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SRC_DIR, env=clean_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        raise TimeoutError("服务在超时时间内未就绪")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [import_time() for _ in range(args.runs)]
+    print(f"import graph_agent: p50={statistics.median(imports) * 1000:.0f}ms "
+          f"min={min(imports) * 1000:.0f}ms max={max(imports) * 1000:.0f}ms")
+
+    health = [time_to_health() for _ in range(args.runs)]
+    print(f"首次 /api/health 响应: p50={statistics.median(health) * 1000:.0f}ms "
+          f"min={min(health) * 1000:.0f}ms max={max(health) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+/api/chat/stream 并发基准：同时发起 N 个流式请求，并在期间探测事件循环的响应延迟。
+
+事件循环被阻塞时，探测请求（/openapi.json）的延迟会随搜索/图谱调用一起被拉长；
+异步路径下探测延迟应保持在毫秒级，总耗时接近单个请求而不是 N 倍。
+
+用法: python benchmarks/bench_stream_concurrency.py --clients 16 --search-latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from fakes import install_fakes
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def stream_once(client: httpx.AsyncClient, query: str) -> dict:
+    start = time.perf_counter()
+    first_chunk = None
+    async with client.stream("POST", "/api/chat/stream", json={"query": query}) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "answer_chunk" and first_chunk is None:
+                first_chunk = time.perf_counter() - start
+    return {"total": time.perf_counter() - start, "ttft": first_chunk or 0.0}
+
+
+async def probe_loop(client: httpx.AsyncClient, stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/openapi.json")
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+def pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(base_url: str, clients: int):
+    limits = httpx.Limits(max_connections=clients + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        single = await stream_once(client, "巢湖在哪里")
+
+        stop = asyncio.Event()
+        probes: list = []
+        prober = asyncio.create_task(probe_loop(client, stop, probes))
+        start = time.perf_counter()
+        results = await asyncio.gather(*(stream_once(client, f"巢湖在哪里 #{i}") for i in range(clients)))
+        wall = time.perf_counter() - start
+        stop.set()
+        await prober
+
+    totals = [r["total"] for r in results]
+    ttfts = [r["ttft"] for r in results]
+    print(f"单请求延迟: {single['total']:.2f}s (TTFT {single['ttft']:.2f}s)")
+    print(f"{clients} 个并发流: 总耗时 {wall:.2f}s, 串行下界 {single['total'] * clients:.2f}s")
+    print(f"  延迟  p50={statistics.median(totals):.2f}s p95={pct(totals, 0.95):.2f}s")
+    print(f"  TTFT  p50={statistics.median(ttfts):.2f}s p95={pct(ttfts, 0.95):.2f}s")
+    print(f"  事件循环探测 ({len(probes)} 次): p50={statistics.median(probes) * 1000:.1f}ms "
+          f"max={max(probes) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式接口并发基准")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--search-latency", type=float, default=0.5)
+    parser.add_argument("--graph-latency", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    install_fakes(llm_latency=args.llm_latency, graph_latency=args.graph_latency,
+                  search_latency=args.search_latency)
+    import app as app_module
+
+    port = free_port()
+    server = start_server(app_module.app, port)
+    try:
+        asyncio.run(run(f"http://127.0.0.1:{port}", args.clients))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+工作流编译开销微基准：对比"每个请求都 create_workflow()"与"注册表复用已编译工作流"。
+
+用法: python benchmarks/bench_workflow_compile.py --iterations 200 --qps 20
+"""
+import argparse
+import statistics
+import time
+
+from fakes import install_fakes
+
+
+def measure(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作流编译开销微基准")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--qps", type=float, default=20.0, help="线上峰值每秒请求数")
+    args = parser.parse_args()
+
+    graph_agent = install_fakes()
+    graph_agent.warmup_workflows()
+
+    rebuild = measure(graph_agent.create_workflow, args.iterations)
+    cached = measure(graph_agent.get_workflow, args.iterations)
+
+    rebuild_mean = statistics.mean(rebuild)
+    cached_mean = statistics.mean(cached)
+    print(f"每请求重建编译: mean={rebuild_mean:.3f}ms p50={statistics.median(rebuild):.3f}ms")
+    print(f"注册表复用:     mean={cached_mean * 1000:.2f}µs p50={statistics.median(cached) * 1000:.2f}µs")
+    saved = (rebuild_mean - cached_mean) * args.qps
+    print(f"在 {args.qps:g} QPS 下每秒节省 CPU 时间: {saved:.1f}ms ({saved / 10:.1f}% 单核)")
+
+
+if __name__ == "__main__":
+    main()
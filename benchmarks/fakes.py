@@ -0,0 +1,420 @@
+"""
+基准测试使用的本地替身（ChatOpenAI / Neo4jGraph / DuckDuckGoSearchRun / HTTP 搜索接口，以及写入基准用的嵌入式 Neo4j）。
+
+所有替身都不访问网络，输出确定，延迟可配置，便于在离线环境下复现性能数据。
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+FAKE_CYPHER = "MATCH (l:Lake)-[:MENTIONED_IN_GAZETTEER]->(g:Gazetteer) RETURN l.name AS lake, g.source AS source LIMIT 10"
+FAKE_ANSWER = "根据《合肥志》记载，巢湖在合肥县东南六十里，亦名焦湖，周围四百里。"
+
+# 与 knowledgeMining.ipynb 写入的图谱结构一致的小型样例数据
+SAMPLE_ENTITIES = [
+    {"label": "Lake", "name": "巢湖"}, {"label": "Lake", "name": "丹阳湖"}, {"label": "Lake", "name": "西湖"},
+    {"label": "Gazetteer", "name": "合肥志"}, {"label": "Gazetteer", "name": "太平府志"},
+    {"label": "Poem", "name": "饮湖上初晴后雨"}, {"label": "Poem", "name": "望洞庭湖赠张丞相"},
+]
+SAMPLE_RESPONSES = {
+    "UNION ALL": SAMPLE_ENTITIES,
+    "AS location": [{"lake": "巢湖", "location": "合肥县东南六十里"}],
+    "AS poem": [{"poem": "饮湖上初晴后雨", "lakes": ["西湖"]}],
+    "AS source": [{"source": "合肥志", "content": "在合肥县东南六十里。亦名焦湖。", "lakes": ["巢湖"]}],
+}
+
+
+_CALL_LOCK = threading.Lock()
+_LAKE_NAME = re.compile(r"[\u4e00-\u9fff]{1,3}湖")
+
+
+def fake_structural_chunks(prompt: str) -> Dict[str, Any]:
+    """LLMStructuralTextSplitter 的替身输出：按行切分待处理文本"""
+    match = re.search(r"```(.*)```", prompt, re.S)
+    text = match.group(1) if match else prompt
+    return {"chunks": [{"content": line.strip()} for line in text.splitlines() if line.strip()]}
+
+
+def _extraction_input(prompt: str) -> str:
+    return prompt.rsplit("输入:", 1)[-1].rsplit("输出:", 1)[0].strip()
+
+
+def _fake_records(text: str, poem: bool) -> List[Dict[str, Any]]:
+    lakes = list(dict.fromkeys(_LAKE_NAME.findall(text)))[:3]
+    if poem:
+        return [{"lake_name": lake, "poem_name": text[:8], "poem_full_text": text[:60]} for lake in lakes]
+    return [{"lake_name": lake, "location": "", "gazetteer_source": text[:6], "content": text[:60]} for lake in lakes]
+
+
+def fake_extraction(prompt: str) -> str:
+    """方志 / 诗词提取链的替身输出：输入中出现的每个“某某湖”各产生一条记录"""
+    records = _fake_records(_extraction_input(prompt), poem="古典诗词中提取" in prompt)
+    return json.dumps({"extractions": records}, ensure_ascii=False)
+
+
+def fake_merged_extraction(prompt: str) -> Dict[str, Any]:
+    """合并提取（MergedExtraction）的替身输出：含诗句换行的块视为诗词，其余视为方志"""
+    text = _extraction_input(prompt)
+    poem = "，" in text and "\n" in text
+    return {"gazetteers": [] if poem else _fake_records(text, False), "poems": _fake_records(text, True) if poem else []}
+
+
+class FakeRateLimitError(Exception):
+    """模拟 OpenAI 兼容接口的 429 限流错误"""
+    status_code = 429
+
+
+class FakeChatModel(BaseChatModel):
+    """延迟和吐字速率可配置的确定性聊天模型"""
+
+    latency: float = 0.05  # 首个 token 之前的等待（秒）
+    tokens_per_second: float = 200.0  # 流式输出速率，0 表示不限速
+    chunk_size: int = 2  # 每个流式块包含的字符数
+    prefill_chars_per_second: float = 0.0  # 大于 0 时首个 token 前再等待 提示词字数 / 该速率（模拟长提示词的预填充）
+    answer: str = FAKE_ANSWER
+    cypher: str = FAKE_CYPHER
+    route: str = "both"  # 查询分类器 LLM 兜底时的回答
+    max_parallel: int = 0  # 大于 0 时，同时进行的调用超过该值会抛出 FakeRateLimitError
+    calls: int = 0
+    in_flight: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = str(messages[-1].content) if messages else ""
+        if "Cypher" in prompt:
+            return self.cypher
+        if "查询分类器" in prompt:
+            return self.route
+        if "湖泊信息的专家" in prompt:
+            return fake_extraction(prompt)
+        return self.answer
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        """支持 with_structured_output：按工具 schema 返回确定的 tool_calls"""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    @staticmethod
+    def _usage(prompt: str, output: str) -> Dict[str, int]:
+        """按字符数近似 token 用量，供 /api/metrics 的 token 计数使用"""
+        return {"input_tokens": len(prompt), "output_tokens": len(output), "total_tokens": len(prompt) + len(output)}
+
+    def _message(self, messages: List[BaseMessage], **kwargs: Any) -> AIMessage:
+        tools = kwargs.get("tools")
+        prompt = str(messages[-1].content) if messages else ""
+        if not tools:
+            reply = self._reply(messages)
+            return AIMessage(content=reply, usage_metadata=self._usage(prompt, reply))
+        name = tools[0]["function"]["name"]
+        args = fake_merged_extraction(prompt) if name == "MergedExtraction" else fake_structural_chunks(prompt)
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "call_0"}],
+                         usage_metadata=self._usage(prompt, json.dumps(args, ensure_ascii=False)))
+
+    def _enter(self):
+        with _CALL_LOCK:
+            self.calls += 1
+            self.in_flight += 1
+            overloaded = self.max_parallel and self.in_flight > self.max_parallel
+        if overloaded:
+            self._exit()
+            raise FakeRateLimitError("Rate limit reached: too many concurrent requests")
+
+    def _exit(self):
+        with _CALL_LOCK:
+            self.in_flight -= 1
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    def _token_delay(self) -> float:
+        return self.chunk_size / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _first_token_delay(self, messages: List[BaseMessage]) -> float:
+        if not self.prefill_chars_per_second:
+            return self.latency
+        return self.latency + sum(len(str(m.content)) for m in messages) / self.prefill_chars_per_second
+
+    def _total_delay(self, messages: List[BaseMessage], text: str) -> float:
+        return self._first_token_delay(messages) + self._token_delay() * len(self._chunks(text))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self._enter()
+        try:
+            message = self._message(messages, **kwargs)
+            time.sleep(self._total_delay(messages, str(message.content) or str(message.tool_calls)))
+        finally:
+            self._exit()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self._enter()
+        try:
+            message = self._message(messages, **kwargs)
+            await asyncio.sleep(self._total_delay(messages, str(message.content) or str(message.tool_calls)))
+        finally:
+            self._exit()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._first_token_delay(messages))
+        for piece in self._chunks(self._reply(messages)):
+            time.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._first_token_delay(messages))
+        for piece in self._chunks(self._reply(messages)):
+            await asyncio.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+class FakeNeo4jGraph:
+    """实现 GraphStore 协议的内存图数据库替身"""
+
+    def __init__(self, latency: float = 0.02, rows: Optional[List[Dict[str, Any]]] = None,
+                 responses: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.latency = latency
+        self.responses = responses or {}  # Cypher 片段 -> 返回行，未匹配时返回 rows
+        self._enhanced_schema = False
+        self.rows = rows if rows is not None else [
+            {"lake": "巢湖", "source": "合肥志"},
+            {"lake": "丹阳湖", "source": "太平府志"},
+        ]
+        self.queries: List[str] = []
+        self.schema = (
+            "Node properties:\n"
+            "Lake {name: STRING, location: STRING}\n"
+            "Gazetteer {source: STRING, content: STRING}\n"
+            "Poem {name: STRING, full_text: STRING}\n"
+            "The relationships:\n"
+            "(:Lake)-[:MENTIONED_IN_GAZETTEER]->(:Gazetteer)\n"
+            "(:Lake)-[:MENTIONED_IN_POEM]->(:Poem)"
+        )
+        self.structured_schema = {
+            "node_props": {
+                "Lake": [{"property": "name", "type": "STRING"}, {"property": "location", "type": "STRING"}],
+                "Gazetteer": [{"property": "source", "type": "STRING"}, {"property": "content", "type": "STRING"}],
+                "Poem": [{"property": "name", "type": "STRING"}, {"property": "full_text", "type": "STRING"}],
+            },
+            "rel_props": {},
+            "relationships": [
+                {"start": "Lake", "type": "MENTIONED_IN_GAZETTEER", "end": "Gazetteer"},
+                {"start": "Lake", "type": "MENTIONED_IN_POEM", "end": "Poem"},
+            ],
+            "metadata": {"constraint": [], "index": []},
+        }
+
+    @property
+    def get_schema(self) -> str:
+        return self.schema
+
+    @property
+    def get_structured_schema(self) -> Dict[str, Any]:
+        return self.structured_schema
+
+    def query(self, query: str, params: dict = {}) -> List[Dict[str, Any]]:
+        time.sleep(self.latency)
+        self.queries.append(query)
+        for fragment, rows in self.responses.items():
+            if fragment in query:
+                return list(rows)
+        return list(self.rows)
+
+    def refresh_schema(self) -> None:
+        time.sleep(self.latency)
+
+    def add_graph_documents(self, graph_documents: List[Any], include_source: bool = False) -> None:
+        pass
+
+
+class FakeTransientError(Exception):
+    """模拟 Neo4j 的临时错误（死锁等），可以重试"""
+    code = "Neo.TransientError.Transaction.DeadlockDetected"
+
+
+class InMemoryNeo4j:
+    """
+    写入基准使用的嵌入式 Neo4j 替身：执行 graph_loader 中的建约束语句、湖泊名查询、入库代数、
+    共享节点的预创建和两条 UNWIND ... MERGE 写入语句。
+    没有唯一约束时 MERGE 逐个扫描同标签的节点，有约束时走字典索引，与 Neo4j 的查找代价一致；
+    每次 query 有固定的往返延迟（不持有锁，可并行），写入本身串行执行；
+    error_rate > 0 时按概率抛出 FakeTransientError。
+    """
+
+    _KEYS = {"Lake": "name", "Gazetteer": "source", "Poem": "name"}
+
+    def __init__(self, latency: float = 0.005, error_rate: float = 0.0, seed: int = 42):
+        import random
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.nodes: Dict[str, List[Dict[str, Any]]] = {label: [] for label in self._KEYS}
+        self.indexes: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self.relationships = set()
+        self.calls = 0
+        self.errors = 0
+        self.generation = 0
+
+    def _merge(self, label: str, key: Any, on_create: Dict[str, Any]) -> Dict[str, Any]:
+        index = self.indexes.get(label)
+        prop = self._KEYS[label]
+        if index is not None:
+            node = index.get(key)
+        else:
+            node = next((n for n in self.nodes[label] if n[prop] == key), None)
+        if node is None:
+            node = {prop: key, **on_create}
+            self.nodes[label].append(node)
+            if index is not None:
+                index[key] = node
+        return node
+
+    def _constraint(self, label: str):
+        if label not in self.indexes:
+            prop = self._KEYS[label]
+            self.indexes[label] = {n[prop]: n for n in self.nodes[label]}
+
+    def query(self, query: str, params: dict = {}) -> List[Dict[str, Any]]:
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                raise FakeTransientError("DeadlockDetected: ForsetiClient can't acquire ExclusiveLock")
+            if query.lstrip().startswith("CREATE CONSTRAINT"):
+                self._constraint(re.search(r"\(\w+:(\w+)\)", query).group(1))
+                return []
+            if "RETURN l.name AS name" in query:
+                return [{"name": n["name"]} for n in self.nodes["Lake"]]
+            if ":IngestMeta" in query:
+                self.generation += 1
+                return []
+            poem = ":Poem" in query
+            if ":Lake" not in query:  # 预创建方志 / 诗词节点
+                for row in params.get("data", []):
+                    if poem:
+                        self._merge("Poem", row["poem_name"], {"full_text": row.get("poem_full_text")})
+                    else:
+                        self._merge("Gazetteer", row["gazetteer_source"], {"content": row.get("content")})
+                return []
+            for row in params.get("data", []):
+                lake = self._merge("Lake", row["lake_name"], {"location": row.get("location")} if not poem else {})
+                aliases = lake.setdefault("aliases", [])
+                aliases.extend(a for a in row.get("lake_aliases") or [] if a not in aliases)
+                if poem:
+                    target = self._merge("Poem", row["poem_name"], {"full_text": row.get("poem_full_text")})
+                    self.relationships.add(("MENTIONED_IN_POEM", lake["name"], target["name"]))
+                else:
+                    target = self._merge("Gazetteer", row["gazetteer_source"], {"content": row.get("content")})
+                    self.relationships.add(("MENTIONED_IN_GAZETTEER", lake["name"], target["source"]))
+        return []
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {label: len(nodes) for label, nodes in self.nodes.items()}
+            counts["relationships"] = len(self.relationships)
+            return counts
+
+
+class FakeSearchTool:
+    """与 DuckDuckGoSearchRun.run 接口一致的搜索替身"""
+
+    def __init__(self, latency: float = 0.3):
+        self.latency = latency
+        self.calls = 0
+
+    def run(self, query: str, **kwargs: Any) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return f"{query} 巢湖位于安徽省中部，是中国五大淡水湖之一。"
+
+    def invoke(self, query: str, **kwargs: Any) -> str:
+        return self.run(query)
+
+
+def serve_fake_search(latency: float = 0.1, slow_rate: float = 0.0, slow_latency: float = 2.0,
+                      fail_rate: float = 0.0, seed: int = 0):
+    """
+    在本机随机端口启动返回 JSON 的 HTTP 搜索替身（HttpSearchBackend 的接口），返回 (url, server)。
+    每次请求耗时 latency 秒，以 slow_rate 的概率变为 slow_latency 秒（长尾），以 fail_rate 的概率返回 500；
+    调用 server.shutdown() 停止。
+    """
+    import random
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = parse_qs(urlparse(self.path).query)
+            query = params.get("q", [""])[0]
+            with rng_lock:
+                delay = slow_latency if rng.random() < slow_rate else latency
+                failed = rng.random() < fail_rate
+            time.sleep(delay)
+            if failed:
+                self.send_response(500)
+                self.end_headers()
+                return
+            body = json.dumps({"results": [
+                {"title": "巢湖", "snippet": f"{query} 巢湖位于安徽省中部，是中国五大淡水湖之一。", "url": "https://example.com/chaohu"},
+                {"title": "巢湖市", "snippet": "巢湖市为安徽省辖县级市，由合肥市代管。", "url": "https://example.com/chaohu-city"},
+            ]}, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/search", server
+
+
+def install_fakes(llm_latency: float = 0.05, tokens_per_second: float = 200.0,
+                  graph_latency: float = 0.02, search_latency: float = 0.3):
+    """
+    把 adapter 中的 LLM / 图数据库和 graph_agent 中的搜索工具替换为本地替身，
+    返回 graph_agent 模块。
+    """
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+
+    import adapter
+    import graph_agent
+    adapter.use_backends(
+        llm=FakeChatModel(latency=llm_latency, tokens_per_second=tokens_per_second),
+        graph=FakeNeo4jGraph(latency=graph_latency, responses=SAMPLE_RESPONSES),
+    )
+    graph_agent.use_search_tool(FakeSearchTool(latency=search_latency))
+    # 基准需要每次都真正调用搜索替身：关闭持久化的搜索结果缓存
+    graph_agent.SEARCH_CACHE_TTL = 0
+    graph_agent.use_search_service(None)
+    return graph_agent
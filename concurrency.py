@@ -0,0 +1,211 @@
+"""
+自适应并发控制（AIMD）：入库流程中所有 LLM 调用共享的并发预算。
+
+- 每完成约一个并发窗口的成功调用，上限加 1（加性增）
+- 遇到限流错误（HTTP 429 / RateLimitError）时上限减半（乘性减），同一窗口内只减一次
+- 设置了 latency_target 时，延迟的指数滑动平均超过目标也会小幅下调上限
+
+用法:
+    limiter = AdaptiveLimiter(initial=10, max_limit=32)
+    with limiter.slot():
+        chain.invoke(...)
+
+    runner = AdaptiveRunner(limiter, max_retries=3)  # 批量调用 + 抖动退避重试 + 指标
+    results = runner.map(chain.invoke, inputs)
+"""
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """识别 OpenAI 兼容接口的限流错误（不依赖具体 SDK 的异常类型）"""
+    if type(error).__name__ == "RateLimitError":
+        return True
+    if getattr(error, "status_code", None) == 429 or getattr(getattr(error, "response", None), "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "rate limit" in message or "too many requests" in message
+
+
+class AdaptiveLimiter:
+    """并发上限可动态调整的信号量"""
+
+    def __init__(self, initial: int = 10, min_limit: int = 1, max_limit: int = 64,
+                 latency_target: Optional[float] = None, backoff: float = 0.5, smoothing: float = 0.2):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._latency_ewma: Optional[float] = None
+        self._last_decrease = 0.0
+        self._successes = 0
+        self._rate_limited = 0
+        self._errors = 0
+        self._peak_in_flight = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def release(self, latency: float, error: Optional[BaseException] = None):
+        with self._cond:
+            self._in_flight -= 1
+            if error is not None and is_rate_limit_error(error):
+                self._rate_limited += 1
+                self._decrease(self.backoff)
+            elif error is not None:
+                self._errors += 1
+            else:
+                self._successes += 1
+                self._observe_latency(latency)
+                # 加性增：每个并发窗口（约 limit 次成功）上限加 1
+                self._limit = min(self.max_limit, self._limit + 1.0 / max(self._limit, 1.0))
+            self._cond.notify_all()
+
+    def _observe_latency(self, latency: float):
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma += self.smoothing * (latency - self._latency_ewma)
+        if self.latency_target is not None and self._latency_ewma > self.latency_target:
+            self._decrease(0.9)
+
+    def _decrease(self, factor: float):
+        # 同一个窗口（约一次调用的平均耗时）内的多次失败只触发一次下调
+        now = time.monotonic()
+        if now - self._last_decrease < (self._latency_ewma or 0.0):
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.min_limit), self._limit * factor)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.release(time.perf_counter() - start, e)
+            raise
+        self.release(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "successes": self._successes,
+                "rate_limited": self._rate_limited,
+                "errors": self._errors,
+                "latency_ewma": round(self._latency_ewma, 4) if self._latency_ewma is not None else None,
+            }
+
+
+class CallMetrics:
+    """调用指标：调用次数、重试次数、回退次数与延迟分位数（延迟样本只保留最近 max_samples 个）"""
+
+    def __init__(self, max_samples: int = 10000):
+        self.calls = 0
+        self.retries = 0
+        self.fallbacks = 0
+        self.latencies: Deque[float] = deque(maxlen=max_samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "p50_latency": round(ordered[len(ordered) // 2], 4) if ordered else None,
+            "p95_latency": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4) if ordered else None,
+        }
+
+
+class AdaptiveRunner:
+    """
+    在 AdaptiveLimiter 的并发预算内执行调用：失败的调用按带抖动的指数退避重试，
+    重试耗尽后返回异常对象（与 batch(return_exceptions=True) 一致），由调用方决定如何回退。
+
+    stats() 为累计指标；每次 map 结束后 last_run 记录本轮指标。
+    """
+
+    def __init__(self, limiter: Optional[AdaptiveLimiter] = None, max_retries: int = 3,
+                 retry_backoff: float = 1.0, max_backoff: float = 30.0,
+                 retry_if: Callable[[BaseException], bool] = lambda e: True, name: str = "llm"):
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.retry_if = retry_if
+        self._executor = ThreadPoolExecutor(max_workers=self.limiter.max_limit, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._total = CallMetrics()
+        self.last_run: Dict[str, Any] = {}
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter：在 [0, base * 2^attempt] 内均匀取值，避免同一批失败的请求同时重试
+        return random.uniform(0, min(self.max_backoff, self.retry_backoff * 2 ** attempt))
+
+    def _record(self, metrics: List[CallMetrics], field: str, latency: Optional[float] = None):
+        with self._lock:
+            for m in metrics:
+                if latency is not None:
+                    m.latencies.append(latency)
+                else:
+                    setattr(m, field, getattr(m, field) + 1)
+
+    def call(self, fn: Callable[[], Any], run: Optional[CallMetrics] = None) -> Any:
+        """执行一次调用（含重试），重试耗尽时返回异常对象"""
+        metrics = [self._total] if run is None else [self._total, run]
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.limiter.slot():
+                    self._record(metrics, "calls")
+                    start = time.perf_counter()
+                    result = fn()
+                    latency = time.perf_counter() - start
+                self._record(metrics, "latencies", latency)
+                return result
+            except Exception as e:
+                if attempt < self.max_retries and self.retry_if(e):
+                    self._record(metrics, "retries")
+                    time.sleep(self._backoff(attempt))
+                    continue
+                self._record(metrics, "fallbacks")
+                return e
+
+    def submit(self, fn: Callable[[], Any], run: Optional[CallMetrics] = None) -> Future:
+        return self._executor.submit(self.call, fn, run)
+
+    def map(self, fn: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """对每个元素并发执行 fn，结果按输入顺序返回"""
+        run = CallMetrics()
+        futures = [self.submit(lambda item=item: fn(item), run) for item in items]
+        results = [future.result() for future in futures]
+        with self._lock:
+            self.last_run = run.snapshot()
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._total.snapshot(), "limiter": self.limiter.stats()}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,206 @@
+"""
+繁体 → 简体转换阶段（OpenCC t2s），替代 Traditional2Simplified.ipynb 中的逐行循环。
+
+- 按固定大小的块（在换行处截断）流式读取，内存只与块大小和并发数有关
+- 块在进程池中并行转换，按输入顺序输出，结果与逐行转换完全一致（去掉首尾空白和空行）
+- 每个块记录输入 / 输出校验和（<输出>.manifest.json），重跑时输入未变的块直接复用上次的输出
+
+用法:
+    python conversion.py data.txt data_simplified.txt --workers 4
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_BLOCK_BYTES = 4 * 1024 * 1024
+MANIFEST_VERSION = 1
+
+_converter = None
+
+
+def _init_worker(config: str):
+    global _converter
+    from opencc import OpenCC
+    _converter = OpenCC(config)
+
+
+def normalize_lines(text: str) -> str:
+    """与 notebook 相同：每行去掉首尾空白，丢弃空行，每行以换行结尾"""
+    lines = [line.strip() for line in text.split("\n")]
+    return "".join(line + "\n" for line in lines if line)
+
+
+def _convert_block(data: bytes, normalize: bool = True) -> str:
+    # 整块调用一次 convert，省去逐行调用的开销；词组不跨行，结果与逐行转换相同
+    text = _converter.convert(data.decode("utf-8"))
+    return normalize_lines(text) if normalize else text
+
+
+def _convert_numbered(item: Tuple[int, bytes]) -> Tuple[int, str]:
+    line_no, data = item
+    return line_no, _convert_block(data, normalize=False)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def iter_blocks(path: str, block_bytes: int = DEFAULT_BLOCK_BYTES) -> Iterator[bytes]:
+    """按约 block_bytes 大小读取文件，每块都在换行处结束（不会截断 UTF-8 字符或行）"""
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                if tail:
+                    yield tail
+                return
+            data = tail + data
+            cut = data.rfind(b"\n")
+            if cut < 0:
+                tail = data
+                continue
+            yield data[:cut + 1]
+            tail = data[cut + 1:]
+
+
+def ordered_map(executor: Executor, fn: Callable[..., Any], items: Iterable[Any], window: int,
+                *args: Any) -> Iterator[Any]:
+    """并行执行 fn 并按输入顺序产出结果；同时在途的任务不超过 window 个"""
+    pending: Deque[Any] = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _make_executor(workers: int, config: str) -> ProcessPoolExecutor:
+    # 入库流程中其他阶段的线程已经在运行，用 spawn 避免 fork 多线程进程带来的死锁
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(config,))
+
+
+def iter_converted_lines(path: str, start_line: int = 0, workers: int = 1, block_bytes: int = DEFAULT_BLOCK_BYTES,
+                         config: str = "t2s") -> Iterator[Tuple[int, str]]:
+    """
+    供入库流程使用：产出 (原始行号, 转换后的行)，跳过空行和 start_line 之前的行。
+    行号与输入文件一致，检查点可以照常按行续跑。
+    """
+    def numbered_blocks() -> Iterator[Tuple[int, bytes]]:
+        line_no = 0
+        for block in iter_blocks(path, block_bytes):
+            count = block.count(b"\n") + (0 if block.endswith(b"\n") else 1)
+            if line_no + count > start_line:  # 整块都在续跑位置之前的不必转换
+                yield line_no, block
+            line_no += count
+
+    with _make_executor(workers, config) as executor:
+        for line_no, text in ordered_map(executor, _convert_numbered, numbered_blocks(), workers * 2):
+            for offset, line in enumerate(text.split("\n")):
+                stripped = line.strip()
+                if line_no + offset >= start_line and stripped:
+                    yield line_no + offset, stripped + "\n"
+
+
+def _load_manifest(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("version") == MANIFEST_VERSION else None
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def convert_file(src: str, dst: str, workers: int = 1, block_bytes: int = DEFAULT_BLOCK_BYTES,
+                 config: str = "t2s", manifest_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    转换整个文件并返回统计信息。输出先写入临时文件再原子替换；
+    manifest 中记录每个块的校验和，输入未变的块直接从上次的输出中复制。
+    """
+    manifest_path = manifest_path or dst + ".manifest.json"
+    previous = _load_manifest(manifest_path)
+    reusable: Dict[str, Tuple[int, int, str]] = {}  # 输入校验和 -> (旧输出中的偏移, 长度, 输出校验和)
+    if previous is not None and previous.get("config") == config and os.path.exists(dst):
+        offset = 0
+        for block in previous["blocks"]:
+            reusable[block["in"]] = (offset, block["out_len"], block["out"])
+            offset += block["out_len"]
+
+    stats = {"blocks": 0, "reused": 0, "converted": 0, "bytes_in": 0, "bytes_out": 0}
+    blocks: List[Dict[str, Any]] = []
+    old_output = open(dst, "rb") if reusable else None
+    tmp_path = dst + ".tmp"
+    start = time.perf_counter()
+
+    def reuse(digest: str) -> Optional[bytes]:
+        offset, length, out_digest = reusable[digest]
+        old_output.seek(offset)
+        data = old_output.read(length)
+        return data if _digest(data) == out_digest else None
+
+    try:
+        with _make_executor(workers, config) as executor, open(tmp_path, "wb") as out:
+            pending: Deque[Tuple[str, int, Any, bool]] = deque()
+
+            def finish(digest: str, size: int, result: Any, reused: bool):
+                data = result if reused else result.result().encode("utf-8")
+                out.write(data)
+                blocks.append({"in": digest, "in_len": size, "out": _digest(data), "out_len": len(data)})
+                stats["blocks"] += 1
+                stats["reused" if reused else "converted"] += 1
+                stats["bytes_in"] += size
+                stats["bytes_out"] += len(data)
+
+            for block in iter_blocks(src, block_bytes):
+                digest = _digest(block)
+                cached = reuse(digest) if digest in reusable else None
+                if cached is not None:
+                    pending.append((digest, len(block), cached, True))
+                else:
+                    pending.append((digest, len(block), executor.submit(_convert_block, block), False))
+                while len(pending) > workers * 2 or (pending and pending[0][3]):
+                    finish(*pending.popleft())
+            while pending:
+                finish(*pending.popleft())
+            out.flush()
+            os.fsync(out.fileno())
+    finally:
+        if old_output is not None:
+            old_output.close()
+
+    os.replace(tmp_path, dst)
+    manifest = {"version": MANIFEST_VERSION, "config": config, "block_bytes": block_bytes, "blocks": blocks}
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["mb_per_second"] = stats["bytes_in"] / stats["seconds"] / 1024 / 1024 if stats["seconds"] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="繁体 → 简体转换（并行、按块、可跳过未变化的内容）")
+    parser.add_argument("src", help="输入文本，如 data.txt")
+    parser.add_argument("dst", help="输出文本，如 data_simplified.txt")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--block-mb", type=float, default=DEFAULT_BLOCK_BYTES / 1024 / 1024)
+    parser.add_argument("--config", default="t2s", help="OpenCC 配置，默认 t2s")
+    args = parser.parse_args()
+
+    stats = convert_file(args.src, args.dst, workers=args.workers, block_bytes=int(args.block_mb * 1024 * 1024),
+                         config=args.config)
+    print(f"✅ 转换完成: {stats['blocks']} 块（复用 {stats['reused']}，转换 {stats['converted']}），"
+          f"{stats['bytes_in'] / 1024 / 1024:.1f}MB，{stats['seconds']:.2f}s，{stats['mb_per_second']:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
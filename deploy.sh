@@ -6,7 +6,7 @@ show_help() {
     echo "  frontend   只构建前端"
     echo "  backend    只安装后端依赖"
     echo "  all        完整安装（默认）"
-    echo "  start      启动 FastAPI 服务"
+    echo "  start      启动 FastAPI 服务（可追加参数，如 --workers 4）"
     echo "  help       显示帮助信息"
 }
 
@@ -72,7 +72,7 @@ start_service() {
     source .venv/bin/activate || { echo "❌ 虚拟环境激活失败"; exit 1; }
     cd src || exit 1
     echo "启动 FastAPI 服务..."
-    python app.py
+    python app.py "$@"
 }
 
 # 主逻辑
@@ -84,7 +84,7 @@ case "$1" in
         backend_install
         ;;
     start)
-        start_service
+        start_service "${@:2}"
         ;;
     all|"" )
         echo "\n=========================================="
@@ -0,0 +1,164 @@
+"""
+写入图谱前的实体归一：把同一湖泊的不同写法合并到一个规范名上。
+
+提取结果中同一湖泊常以多个名称出现（《合肥志》巢湖条中的 巢湖 / 焦湖 / 漅湖），
+MERGE (l:Lake {name: row.lake_name}) 会把每个写法各建成一个节点。AliasResolver 依次尝试：
+1. 别名词典（lake_aliases.json：规范名 -> 别名，另含异体字对照表）
+2. 去掉空白、标点并替换异体字后的精确匹配
+3. 模糊匹配：去掉末尾的通名（湖 / 泽 / 塘 …）后比较“专名”，编辑距离不超过 1 且相似度达到阈值时合并；
+   候选按“删去一个字”的变体建倒排索引（symmetric delete），每个名称只查 O(长度) 个键，不做两两比较
+规范名第一次出现（或从图谱中预载）的写法胜出，其余写法作为别名随记录写入 Lake 节点的 aliases 属性。
+方志来源与诗词名只做书名号、空白的规范化。
+
+用法:
+    resolver = AliasResolver.from_file()
+    gazetteer_rows, poem_rows = resolver.resolve_rows(gazetteer_rows, poem_rows)
+"""
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_ALIAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lake_aliases.json")
+
+GENERIC_SUFFIXES = set("湖泽塘荡泖潭陂池浦")  # 通名，比较时只看其前面的专名
+DIRECTION_CHARS = set("东西南北上下前后内外大小新旧")  # 只差这些字的名称通常是两个不同的湖
+MAX_EDITS = 1
+
+_STRIP = re.compile(r"[\s《》〈〉「」『』“”\"'（）()，。、：；]")
+
+
+def normalize_title(name: Optional[str]) -> Optional[str]:
+    """方志来源 / 诗词名：去掉书名号、引号和空白"""
+    return _STRIP.sub("", name) if name else name
+
+
+def _core(key: str) -> str:
+    """去掉末尾的一个通名字（彭蠡湖 -> 彭蠡）；两字名称（巢湖、西湖）保持原样，避免只剩一个字"""
+    return key[:-1] if len(key) > 2 and key[-1] in GENERIC_SUFFIXES else key
+
+
+def _deletes(core: str) -> Set[str]:
+    return {core} | {core[:i] + core[i + 1:] for i in range(len(core))}
+
+
+def edit_distance(a: str, b: str, limit: int = MAX_EDITS) -> int:
+    """Levenshtein 距离；超过 limit 时提前返回 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def load_aliases(path: str = DEFAULT_ALIAS_PATH) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """读取别名词典，返回 (规范名 -> 别名列表, 异体字 -> 正字)"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("lakes", {}), data.get("variants", {})
+
+
+class AliasResolver:
+    """湖泊名称归一器。非线程安全，由入库流程的提交线程独占使用"""
+
+    def __init__(self, aliases: Optional[Dict[str, List[str]]] = None, variants: Optional[Dict[str, str]] = None,
+                 threshold: float = 0.8):
+        self.threshold = threshold
+        self._variants = str.maketrans(variants or {})
+        self._canonical: Dict[str, str] = {}  # 规范化后的写法 -> 规范名
+        self._aliases: Dict[str, Set[str]] = {}  # 规范名 -> 别名
+        self._blocks: Dict[str, Set[str]] = {}  # 专名删去一个字的变体 -> 规范名
+        self.fuzzy_merges: List[Tuple[str, str, float]] = []  # (原写法, 规范名, 相似度)，供人工复核
+        self._stats = {"resolved": 0, "dictionary": 0, "fuzzy": 0, "new": 0, "comparisons": 0}
+        for canonical, names in (aliases or {}).items():
+            self._register(canonical)
+            for name in names:
+                self._canonical[self._key(name)] = canonical
+                self._aliases[canonical].add(self._key(name))
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_ALIAS_PATH, **kwargs: Any) -> "AliasResolver":
+        aliases, variants = load_aliases(path)
+        return cls(aliases, variants, **kwargs)
+
+    def _key(self, name: str) -> str:
+        return _STRIP.sub("", name).translate(self._variants)
+
+    def _register(self, canonical: str):
+        key = self._key(canonical)
+        self._canonical.setdefault(key, canonical)
+        self._aliases.setdefault(canonical, set())
+        for variant in _deletes(_core(key)):
+            self._blocks.setdefault(variant, set()).add(canonical)
+
+    def seed(self, names: Iterable[Optional[str]]):
+        """预载图谱中已有的湖泊名（续跑时保持与已写入节点一致的规范名）"""
+        for name in names:
+            if name and self._key(name) not in self._canonical:
+                self._register(name)
+
+    def _fuzzy(self, key: str) -> Optional[Tuple[str, float]]:
+        core = _core(key)
+        if len(core) < 2:  # 单字名称歧义太大，只做精确匹配
+            return None
+        candidates = set()
+        for variant in _deletes(core):
+            candidates |= self._blocks.get(variant, set())
+        best = None
+        for canonical in candidates:
+            other = _core(self._key(canonical))
+            if len(other) < 2 or (set(core) ^ set(other)) & DIRECTION_CHARS:
+                continue
+            self._stats["comparisons"] += 1
+            similarity = 1 - edit_distance(core, other) / max(len(core), len(other))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (canonical, similarity)
+        return best
+
+    def resolve(self, name: Optional[str]) -> Optional[str]:
+        """返回规范名；未见过且无法合并的名称成为新的规范名"""
+        if not name:
+            return name
+        self._stats["resolved"] += 1
+        key = self._key(name)
+        canonical = self._canonical.get(key)
+        if canonical is not None:
+            if key != canonical:  # 只差书名号、空白或异体字的写法不算别名
+                self._stats["dictionary"] += 1
+                self._aliases[canonical].add(key)
+            return canonical
+        match = self._fuzzy(key)
+        if match is not None:
+            canonical, similarity = match
+            self._stats["fuzzy"] += 1
+            self.fuzzy_merges.append((name, canonical, round(similarity, 3)))
+            self._canonical[key] = canonical
+            self._aliases[canonical].add(key)
+            return canonical
+        self._stats["new"] += 1
+        self._register(key)
+        return key
+
+    def aliases(self, canonical: str) -> List[str]:
+        return sorted(self._aliases.get(canonical, ()))
+
+    def resolve_rows(self, gazetteer_rows: List[Dict[str, Any]],
+                     poem_rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """返回归一后的记录副本：lake_name 换成规范名并附带 lake_aliases，方志来源 / 诗词名去掉书名号"""
+        gazetteer_rows = [{**row, "lake_name": self.resolve(row.get("lake_name")),
+                           "gazetteer_source": normalize_title(row.get("gazetteer_source"))} for row in gazetteer_rows]
+        poem_rows = [{**row, "lake_name": self.resolve(row.get("lake_name")),
+                      "poem_name": normalize_title(row.get("poem_name"))} for row in poem_rows]
+        # 整批归一完成后再附上别名，同一湖泊的记录带有相同的别名列表
+        for row in gazetteer_rows + poem_rows:
+            row["lake_aliases"] = self.aliases(row["lake_name"]) if row["lake_name"] else []
+        return gazetteer_rows, poem_rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "canonical": len(self._aliases)}
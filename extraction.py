@@ -0,0 +1,261 @@
+"""
+湖泊信息提取：方志 / 诗词两条 Few-shot 提取链，以及统一调度它们的 ExtractionEngine。
+
+输出结构、示例与提示词与 knowledgeMining.ipynb 保持一致，供 pipeline.py 等脚本复用。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.output_parsers import PydanticOutputParser
+from langchain.prompts import FewShotPromptTemplate, PromptTemplate
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field
+
+from concurrency import AdaptiveLimiter, AdaptiveRunner, is_rate_limit_error
+
+
+# 输出结构 (Pydantic Models) 和解析器
+class GazetteerInfo(BaseModel):
+    lake_name: str = Field(description="湖泊的名称")
+    location: str = Field(description="湖泊所在的古代地名")
+    gazetteer_source: str = Field(description="记载该湖泊的方志名称")
+    content: str = Field(description="方志中关于该湖泊的原始记载内容")
+
+class PoemInfo(BaseModel):
+    lake_name: str = Field(description="诗词中提到的湖泊名称")
+    poem_name: str = Field(description="提到该湖泊的诗词名称")
+    poem_full_text: str = Field(description="提到该湖泊的完整诗词内容")
+
+# 支持多湖泊的输出结构
+class MultipleGazetteerInfo(BaseModel):
+    extractions: List[GazetteerInfo] = Field(description="从文本中提取的所有湖泊信息列表")
+
+class MultiplePoemInfo(BaseModel):
+    extractions: List[PoemInfo] = Field(description="从文本中提取的所有诗词信息列表")
+
+# 创建输出解析器 - 使用多湖泊解析器
+gazetteer_parser = PydanticOutputParser(pydantic_object=GazetteerInfo)
+poem_parser = PydanticOutputParser(pydantic_object=PoemInfo)
+
+# 多湖泊解析器
+multi_gazetteer_parser = PydanticOutputParser(pydantic_object=MultipleGazetteerInfo)
+multi_poem_parser = PydanticOutputParser(pydantic_object=MultiplePoemInfo)
+
+# Few-shot 提示
+# 方志的 Few-shot 示例
+gazetteer_examples = [
+    {
+        "input": "《大清一统志》：西湖在杭州府城西，周三十里。其水甘澄，能疗疾。苏轼尝官此，有诗纪其事。",
+        "output": MultipleGazetteerInfo(
+            extractions=[GazetteerInfo(
+                lake_name="西湖",
+                location="杭州府",
+                gazetteer_source="大清一统志",
+                content="西湖在杭州府城西，周三十里。其水甘澄，能疗疾。苏轼尝官此，有诗纪其事。"
+            )]
+        )
+    },
+    {
+        "input": "《太平寰宇记》：洞庭湖在岳州之南，方圆八百里，其气势浩瀚，为天下之冠。鄱阳湖在饶州，纵广三百三十里。",
+        "output": MultipleGazetteerInfo(
+            extractions=[
+                GazetteerInfo(
+                    lake_name="洞庭湖",
+                    location="岳州",
+                    gazetteer_source="太平寰宇记",
+                    content="洞庭湖在岳州之南，方圆八百里，其气势浩瀚，为天下之冠。"
+                ),
+                GazetteerInfo(
+                    lake_name="鄱阳湖",
+                    location="饶州",
+                    gazetteer_source="太平寰宇记",
+                    content="鄱阳湖在饶州，纵广三百三十里。"
+                )
+            ]
+        )
+    }
+]
+
+# 诗词的 Few-shot 示例
+poem_examples = [
+    {
+        "input": "望洞庭湖赠张丞相 - 孟浩然\n八月湖水平，涵虚混太清。气蒸云梦泽，波撼岳阳城。",
+        "output": MultiplePoemInfo(
+            extractions=[PoemInfo(
+                lake_name="洞庭湖",
+                poem_name="望洞庭湖赠张丞相",
+                poem_full_text="八月湖水平，涵虚混太清。气蒸云梦泽，波撼岳阳城。"
+            )]
+        )
+    },
+    {
+        "input": "饮湖上初晴后雨 - 苏轼\n水光潋滟晴方好，山色空蒙雨亦奇。欲把西湖比西子，淡妆浓抹总相宜。\n又题\n朝曦迎客艳重冈，晚雨留人入醉乡。此意自佳君不会，一杯当属水仙王。-- 此诗亦咏西湖",
+        "output": MultiplePoemInfo(
+            extractions=[
+                PoemInfo(
+                    lake_name="西湖",
+                    poem_name="饮湖上初晴后雨",
+                    poem_full_text="水光潋滟晴方好，山色空蒙雨亦奇。欲把西湖比西子，淡妆浓抹总相宜。"
+                ),
+                PoemInfo(
+                    lake_name="西湖",
+                    poem_name="又题",
+                    poem_full_text="朝曦迎客艳重冈，晚雨留人入醉乡。此意自佳君不会，一杯当属水仙王。"
+                )
+            ]
+        )
+    }
+]
+
+# 创建 Few-shot 提示模板
+example_prompt = PromptTemplate(
+    input_variables=["input", "output"],
+    template="输入:\n{input}\n输出:\n{output}"
+)
+
+# 方志的 Few-shot 提示
+gazetteer_prompt = FewShotPromptTemplate(
+    examples=gazetteer_examples,
+    example_prompt=example_prompt,
+    suffix="输入:\n{input}\n输出:",
+    input_variables=["input"],
+    example_separator="\n\n",
+    prefix="""
+    你是一个专门从古代文献中提取一个或多个湖泊信息的专家。
+    注意区分湖的别名和本名,区分方志和诗词，只保留本名。
+    如果不是文献方志，如诗词等，请不要提取，返回空列表。
+    如果文中提到多个湖泊，且这些湖泊不是同一湖泊的别名，请提取所有湖泊信息。
+    如果是文献方志，请根据以下格式提取信息：\n{format_instructions}
+    """,
+    partial_variables={"format_instructions": multi_gazetteer_parser.get_format_instructions()}
+)
+
+# 诗词的 Few-shot 提示
+poem_prompt = FewShotPromptTemplate(
+    examples=poem_examples,
+    example_prompt=example_prompt,
+    suffix="输入:\n{input}\n输出:",
+    input_variables=["input"],
+    example_separator="\n\n",
+    prefix="""你是一个专门从中国古典诗词中提取一个或多个湖泊信息的专家。
+    注意区分湖的别名和本名，区分方志和诗词，只保留本名。
+    如果不是诗词，如方志等，请不要提取，返回空列表。
+    如果文中提到多个湖泊，且这些湖泊不是同一湖泊的别名，请提取所有湖泊信息。
+    如果是诗词，请根据以下格式，请根据以下格式提取信息：\n{format_instructions}
+    """,
+    partial_variables={"format_instructions": multi_poem_parser.get_format_instructions()}
+)
+
+
+def build_extraction_chains(llm: BaseChatModel) -> Tuple[Runnable, Runnable]:
+    """构建 (方志提取链, 诗词提取链)"""
+    gazetteer_chain = gazetteer_prompt | llm | multi_gazetteer_parser
+    poem_chain = poem_prompt | llm | multi_poem_parser
+    return gazetteer_chain, poem_chain
+
+
+def collect_extractions(results: List[Any], label: str = "提取") -> List[Dict[str, Any]]:
+    """把 chain.batch(..., return_exceptions=True) 的结果展开为写库用的字典列表，失败的块只记录警告"""
+    rows = []
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            print(f"  [警告] {label}失败 (块 {i+1}): {result}")
+            continue
+        if not result.extractions:
+            continue
+        for extraction in result.extractions:
+            rows.append(extraction.model_dump())
+    return rows
+
+
+# 合并模式：一次结构化输出调用同时返回方志与诗词记录，每个块只调用一次 LLM
+class MergedExtraction(BaseModel):
+    gazetteers: List[GazetteerInfo] = Field(description="从方志等文献记载中提取的湖泊信息列表，文本不是方志时为空列表")
+    poems: List[PoemInfo] = Field(description="从诗词中提取的湖泊信息列表，文本不是诗词时为空列表")
+
+merged_examples = [
+    {"input": example["input"], "output": MergedExtraction(gazetteers=example["output"].extractions, poems=[])}
+    for example in gazetteer_examples
+] + [
+    {"input": example["input"], "output": MergedExtraction(gazetteers=[], poems=example["output"].extractions)}
+    for example in poem_examples
+]
+
+merged_prompt = FewShotPromptTemplate(
+    examples=merged_examples,
+    example_prompt=example_prompt,
+    suffix="输入:\n{input}\n输出:",
+    input_variables=["input"],
+    example_separator="\n\n",
+    prefix="""你是一个专门从古代文献方志和中国古典诗词中提取一个或多个湖泊信息的专家。
+    注意区分湖的别名和本名，区分方志和诗词，只保留本名。
+    方志等文献中的记载放入 gazetteers，诗词放入 poems；文本只属于其中一类时，另一类返回空列表。
+    如果文中提到多个湖泊，且这些湖泊不是同一湖泊的别名，请提取所有湖泊信息。
+    """
+)
+
+EXTRACTION_MODES = ("sequential", "interleaved", "merged")
+
+
+class ExtractionEngine:
+    """
+    方志 / 诗词提取调度器。
+
+    - sequential: 与 knowledgeMining.ipynb 相同，方志链整批完成后再跑诗词链（对照基线）
+    - interleaved: 两条链的调用交错提交，共享同一个并发预算，不再互相等待
+    - merged: 每个块一次结构化输出调用同时返回两类记录，LLM 调用次数减半
+
+    interleaved / merged 的并发由 AdaptiveLimiter 按延迟与限流错误自动调整，
+    遇到限流错误时按指数退避重试。
+    """
+
+    def __init__(self, llm: BaseChatModel, mode: str = "interleaved", limiter: Optional[AdaptiveLimiter] = None,
+                 max_retries: int = 3, retry_backoff: float = 1.0):
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"未知的提取模式: {mode}，可选 {EXTRACTION_MODES}")
+        self.mode = mode
+        self.limiter = limiter or AdaptiveLimiter(initial=10, max_limit=32)
+        # 只有限流错误值得重试；解析失败等错误重试也大概率得到同样结果
+        self.runner = AdaptiveRunner(self.limiter, max_retries=max_retries, retry_backoff=retry_backoff,
+                                     retry_if=is_rate_limit_error, name="extract")
+        self.gazetteer_chain, self.poem_chain = build_extraction_chains(llm)
+        self.merged_chain = merged_prompt | llm.with_structured_output(MergedExtraction)
+        self._batch_calls = 0
+
+    def _submit(self, chain: Runnable, text: str):
+        return self.runner.submit(lambda: chain.invoke({"input": text}))
+
+    def extract(self, texts: List[str]) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """对每个文本块返回 (方志记录, 诗词记录)"""
+        if not texts:
+            return []
+        if self.mode == "sequential":
+            inputs = [{"input": text} for text in texts]
+            config = {"max_concurrency": self.limiter.limit}
+            gazetteer_results = self.gazetteer_chain.batch(inputs, config=config, return_exceptions=True)
+            poem_results = self.poem_chain.batch(inputs, config=config, return_exceptions=True)
+            self._batch_calls += 2 * len(texts)
+        elif self.mode == "interleaved":
+            # 同一个块的两次调用相邻提交，线程池按提交顺序取任务，两条链交替推进
+            futures = []
+            for text in texts:
+                futures.append((self._submit(self.gazetteer_chain, text), self._submit(self.poem_chain, text)))
+            gazetteer_results = [gazetteer.result() for gazetteer, _ in futures]
+            poem_results = [poem.result() for _, poem in futures]
+        else:
+            merged = [future.result() for future in [self._submit(self.merged_chain, text) for text in texts]]
+            gazetteer_results = [MultipleGazetteerInfo(extractions=r.gazetteers) if isinstance(r, MergedExtraction) else r for r in merged]
+            poem_results = [MultiplePoemInfo(extractions=r.poems) if isinstance(r, MergedExtraction) else r for r in merged]
+
+        return [
+            (collect_extractions([gazetteer], "方志提取"), collect_extractions([poem], "诗词提取"))
+            for gazetteer, poem in zip(gazetteer_results, poem_results)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.runner.stats()
+        stats["calls"] += self._batch_calls
+        return {"mode": self.mode, **stats}
+
+    def close(self):
+        self.runner.close()
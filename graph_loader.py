@@ -0,0 +1,189 @@
+"""
+Neo4j 批量写入：幂等、分批、可并行。
+
+knowledgeMining.ipynb 把全部方志记录和全部诗词记录各用一条 UNWIND 语句写入，
+大语料下是一个巨型事务，且 Lake.name / Gazetteer.source / Poem.name 上没有约束，每次 MERGE 都要扫描整个标签。
+BulkLoader：
+- 写入前创建唯一约束（同时带来索引），MERGE 变为索引查找
+- 按 batch_size 分批提交，遇到死锁、连接中断等临时错误按指数退避重试
+- workers > 1 时多批并行写入（每次 graph.query 使用独立的会话）；同一湖泊的记录总在同一条写入通道中，
+  并行事务不会争抢同一个 Lake 节点。同一部方志 / 同一首诗可能关联多个湖泊、出现在多条通道中，
+  因此先用一次串行写入建好全部 Gazetteer / Poem 节点，通道中的 MERGE 只会匹配到已有节点、不会并发创建；
+  但建立关系仍要锁住两端节点，指向同一方志 / 诗词的关系在通道之间仍可能短暂等锁（由重试兜底），
+  通道只是减少而不是消除锁竞争
+- 全部使用 MERGE，重复写入同一批数据不会产生重复节点或关系；Lake.aliases 只追加尚未记录的别名
+- 每次 load_extractions 写完后递增 (:IngestMeta {id: "ingestion"}) 节点的 generation，
+  问答服务的答案缓存据此发现重新入库（即使节点数与关系数没有变化）
+
+用法:
+    loader = BulkLoader(graph, batch_size=1000, workers=4)
+    loader.ensure_schema()
+    loader.load_extractions(gazetteer_rows, poem_rows)
+"""
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+GAZETTEER_WRITE_QUERY = """
+UNWIND $data as row
+MERGE (l:Lake {name: row.lake_name})
+ON CREATE SET l.location = row.location
+SET l.aliases = coalesce(l.aliases, []) + [a IN coalesce(row.lake_aliases, []) WHERE NOT a IN coalesce(l.aliases, [])]
+MERGE (g:Gazetteer {source: row.gazetteer_source})
+ON CREATE SET g.content = row.content
+MERGE (l)-[:MENTIONED_IN_GAZETTEER]->(g)
+"""
+
+POEM_WRITE_QUERY = """
+UNWIND $data as row
+MERGE (l:Lake {name: row.lake_name})
+SET l.aliases = coalesce(l.aliases, []) + [a IN coalesce(row.lake_aliases, []) WHERE NOT a IN coalesce(l.aliases, [])]
+MERGE (p:Poem {name: row.poem_name})
+ON CREATE SET p.full_text = row.poem_full_text
+MERGE (l)-[:MENTIONED_IN_POEM]->(p)
+"""
+
+# 并行写入前串行创建被多条通道共享的节点
+GAZETTEER_NODE_QUERY = """
+UNWIND $data as row
+MERGE (g:Gazetteer {source: row.gazetteer_source})
+ON CREATE SET g.content = row.content
+"""
+
+POEM_NODE_QUERY = """
+UNWIND $data as row
+MERGE (p:Poem {name: row.poem_name})
+ON CREATE SET p.full_text = row.poem_full_text
+"""
+
+LAKE_NAMES_QUERY = "MATCH (l:Lake) RETURN l.name AS name"
+
+GENERATION_QUERY = """
+MERGE (m:IngestMeta {id: "ingestion"})
+SET m.generation = coalesce(m.generation, 0) + 1, m.updated_at = timestamp()
+"""
+
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT lake_name IF NOT EXISTS FOR (l:Lake) REQUIRE l.name IS UNIQUE",
+    "CREATE CONSTRAINT gazetteer_source IF NOT EXISTS FOR (g:Gazetteer) REQUIRE g.source IS UNIQUE",
+    "CREATE CONSTRAINT poem_name IF NOT EXISTS FOR (p:Poem) REQUIRE p.name IS UNIQUE",
+]
+
+_TRANSIENT_NAMES = {"TransientError", "ServiceUnavailable", "SessionExpired", "DeadlockDetectedError"}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """识别可以重试的 Neo4j 错误（不依赖 neo4j 驱动的异常类型）"""
+    if type(error).__name__ in _TRANSIENT_NAMES:
+        return True
+    code = getattr(error, "code", None) or ""
+    return code.startswith("Neo.TransientError") or "DeadlockDetected" in str(error)
+
+
+def _dedupe(rows: Iterable[Dict[str, Any]], keys: Sequence[str]) -> List[Dict[str, Any]]:
+    """同一键的记录只保留第一条（与 MERGE ... ON CREATE SET 的效果一致）"""
+    seen = set()
+    unique = []
+    for row in rows:
+        key = tuple(row.get(k) for k in keys)
+        if key not in seen:
+            seen.add(key)
+            unique.append(row)
+    return unique
+
+
+class BulkLoader:
+    """分批、并行、带重试的 Neo4j 写入器。graph 为 Neo4jGraph 或任何提供 query(query, params) 的对象"""
+
+    def __init__(self, graph, batch_size: int = 1000, workers: int = 1, max_retries: int = 5,
+                 retry_backoff: float = 0.5):
+        self.graph = graph
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.retries = 0
+
+    def _query(self, query: str, params: Dict[str, Any]):
+        """执行一条语句，临时错误按指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.graph.query(query, params)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def lake_names(self) -> List[str]:
+        """图谱中已有的湖泊名，供 entity_resolution.AliasResolver.seed 使用"""
+        return [row["name"] for row in self._query(LAKE_NAMES_QUERY, {}) if row.get("name")]
+
+    def ensure_schema(self):
+        """创建唯一约束（IF NOT EXISTS，可重复执行）"""
+        for query in SCHEMA_QUERIES:
+            self._query(query, {})
+
+    def _write(self, query: str, batch: List[Dict[str, Any]]):
+        self._query(query, {"data": batch})
+        with self._lock:
+            self.batches += 1
+            self.rows += len(batch)
+
+    def _lanes(self, rows: List[Dict[str, Any]], lane_key: str) -> List[List[Dict[str, Any]]]:
+        """按 lane_key 的哈希把记录分到 workers 条通道，同一湖泊只会出现在一条通道里（方志 / 诗词节点可能跨通道共享）"""
+        lanes: List[List[Dict[str, Any]]] = [[] for _ in range(self.workers)]
+        for row in rows:
+            lanes[zlib.crc32(str(row.get(lane_key)).encode("utf-8")) % self.workers].append(row)
+        return lanes
+
+    def _write_lane(self, query: str, rows: List[Dict[str, Any]]):
+        for i in range(0, len(rows), self.batch_size):
+            self._write(query, rows[i:i + self.batch_size])
+
+    def load(self, query: str, rows: List[Dict[str, Any]], lane_key: str = "lake_name"):
+        """把 rows 分批写入；workers > 1 时各通道并行，任一批次最终失败时抛出异常"""
+        if not rows:
+            return
+        if self.workers == 1:
+            self._write_lane(query, rows)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="neo4j-load") as executor:
+            futures = [executor.submit(self._write_lane, query, lane) for lane in self._lanes(rows, lane_key) if lane]
+            for future in futures:
+                future.result()
+
+    def load_extractions(self, gazetteer_rows: List[Dict[str, Any]], poem_rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """写入方志 / 诗词记录，返回去重后实际写入的条数"""
+        gazetteer_rows = _dedupe(gazetteer_rows, ("lake_name", "gazetteer_source"))
+        poem_rows = _dedupe(poem_rows, ("lake_name", "poem_name"))
+        if self.workers > 1:
+            self.create_shared_nodes(gazetteer_rows, poem_rows)
+        self.load(GAZETTEER_WRITE_QUERY, gazetteer_rows)
+        self.load(POEM_WRITE_QUERY, poem_rows)
+        if gazetteer_rows or poem_rows:
+            self.bump_generation()
+        return len(gazetteer_rows), len(poem_rows)
+
+    def create_shared_nodes(self, gazetteer_rows: List[Dict[str, Any]], poem_rows: List[Dict[str, Any]]):
+        """串行地 MERGE 全部 Gazetteer / Poem 节点，之后并行通道不会同时创建同一个节点"""
+        for query, rows, key in ((GAZETTEER_NODE_QUERY, gazetteer_rows, "gazetteer_source"),
+                                 (POEM_NODE_QUERY, poem_rows, "poem_name")):
+            nodes = _dedupe(rows, (key,))
+            for i in range(0, len(nodes), self.batch_size):
+                self._query(query, {"data": nodes[i:i + self.batch_size]})
+
+    def bump_generation(self):
+        """递增入库代数，通知问答服务图谱内容已变化"""
+        self._query(GENERATION_QUERY, {})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"batches": self.batches, "rows": self.rows, "retries": self.retries,
+                    "batch_size": self.batch_size, "workers": self.workers}
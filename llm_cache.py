@@ -0,0 +1,186 @@
+"""
+入库流程使用的持久化 LLM 响应缓存（基于 SQLite，按内容寻址）。
+
+键为 sha256(模型配置 + 完整提示词)：模型配置由 LangChain 序列化，包含模型名、温度以及结构化输出的
+schema 等调用参数；提示词是模板渲染后的全文。因此修改提示模板、更换模型或调整温度都会自然地
+产生新键，只有内容变化的输入才会重新调用 LLM。
+
+用法：
+    cache = DiskLLMCache("llm_cache.db", max_bytes=512 * 1024 * 1024)
+    llm = with_cache(llm, cache)  # 之后基于该 llm 构建的分割器和提取链都会走缓存
+    print(cache.stats())
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+def _dump_generations(generations: RETURN_VAL_TYPE) -> str:
+    records = []
+    for gen in generations:
+        record: Dict[str, Any] = {"text": gen.text, "generation_info": gen.generation_info}
+        if isinstance(gen, ChatGeneration):
+            # 消息（含结构化输出的 tool_calls）按 LangChain 的消息字典格式保存
+            record["message"] = message_to_dict(gen.message)
+        records.append(record)
+    return json.dumps(records, ensure_ascii=False)
+
+
+def _load_generations(value: str) -> RETURN_VAL_TYPE:
+    generations = []
+    for record in json.loads(value):
+        if "message" in record:
+            message = messages_from_dict([record["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=record["generation_info"]))
+        else:
+            generations.append(Generation(text=record["text"], generation_info=record["generation_info"]))
+    return generations
+
+
+class DiskLLMCache(BaseCache):
+    """
+    有容量上限的磁盘缓存。条目按最近访问时间淘汰（近似 LRU），
+    每个线程持有独立连接，适配 chain.batch 的线程池并发。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access);
+    """
+
+    def __init__(self, path: str = "llm_cache.db", max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, evict_batch: int = 100):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_batch = evict_batch  # 超出上限后一次多淘汰一批，避免每次写入都触发淘汰
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        # 条目数与总字节数只在打开时统计一次，之后随写入 / 淘汰增减，写入路径上不再扫描全表。
+        # 多个进程共用同一个缓存文件时，各自只累计本进程的写入，上限按近似值执行
+        self._count, self._bytes = conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM llm_cache").fetchone()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            with self._lock:
+                self._misses += 1
+            return None
+        conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            self._hits += 1
+        return _load_generations(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self.make_key(prompt, llm_string)
+        value = _dump_generations(return_val)
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        conn = self._conn()
+        previous = conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, value, size, now, now),
+        )
+        with self._lock:
+            self._writes += 1
+            if previous is None:
+                self._count += 1
+                self._bytes += size
+            else:
+                self._bytes += size - previous[0]
+        self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """超出条目数或字节数上限时，删除最久未访问的条目"""
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        with self._lock:
+            count, total = self._count, self._bytes
+        excess = 0
+        if self.max_entries is not None and count > self.max_entries:
+            excess = count - self.max_entries + self.evict_batch
+        if self.max_bytes is not None and total > self.max_bytes:
+            # 按平均条目大小估算需要淘汰的条数
+            average = total / count if count else 1
+            excess = max(excess, int((total - self.max_bytes) / average) + self.evict_batch)
+        if excess <= 0:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 沿 last_access 索引只读取被淘汰的条目，得到需要从累计值中扣除的字节数
+            victims, freed = conn.execute(
+                "SELECT count(*), coalesce(sum(size), 0) FROM "
+                "(SELECT size FROM llm_cache ORDER BY last_access LIMIT ?)", (excess,)).fetchone()
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._evictions += victims
+            self._count = max(self._count - victims, 0)
+            self._bytes = max(self._bytes - freed, 0)
+
+    def clear(self, **kwargs: Any) -> None:
+        self._conn().execute("DELETE FROM llm_cache")
+        with self._lock:
+            self._count = self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        count, total = self._conn().execute("SELECT count(*), coalesce(sum(size), 0) FROM llm_cache").fetchone()
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "path": self.path,
+                "entries": count,
+                "bytes": total,
+                "hits": self._hits,
+                "misses": self._misses,
+                "writes": self._writes,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def with_cache(llm: BaseChatModel, cache: BaseCache) -> BaseChatModel:
+    """返回使用指定缓存的模型副本，不影响原模型和 LangChain 的全局缓存设置"""
+    return llm.model_copy(update={"cache": cache})
@@ -1,13 +1,21 @@
+import copy
+import hashlib
 import os
-from typing import List, Any
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import List, Any, Iterable, Optional, Tuple
 from langchain_text_splitters import TextSplitter, RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
+from langchain_core.caches import BaseCache
 
 # --- 依赖与之前的实现 ---
 from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
+from llm_cache import with_cache
+from concurrency import AdaptiveLimiter, AdaptiveRunner
+from rulesplitter import RuleStructuralTextSplitter
 
 # (这里我们直接复用上一版代码中的 LLMStructuralTextSplitter 及其辅助类)
 # --- Pydantic 模型 ---
@@ -30,9 +38,11 @@ class LLMStructuralTextSplitter(TextSplitter):
     5.  重要提示：请确保你输出的所有内容严格遵守安全准则，避免生成任何可能被内容过滤器拦截的文本。
     待处理文本: ```{input}```"""
     
-    def __init__(self, llm: BaseChatModel, **kwargs: Any):
+    def __init__(self, llm: BaseChatModel, cache: Optional[BaseCache] = None, **kwargs: Any):
         super().__init__(**kwargs)
-        self.llm = llm
+        # 传入 cache（如 llm_cache.DiskLLMCache）后，相同提示词 + 模型配置的请求直接复用磁盘上的结果
+        self.cache = cache
+        self.llm = with_cache(llm, cache) if cache is not None else llm
         # 将核心逻辑构建成一个可调用的链，方便后续使用 .batch()
         self.chain = (
             ChatPromptTemplate.from_template(self.PROMPT_TEMPLATE)
@@ -49,66 +59,272 @@ class LLMStructuralTextSplitter(TextSplitter):
         return [text]
 
 
+# --- 规则优先、LLM 兜底 ---
+def split_coarse_chunks(texts: List[str], fine_splitter: LLMStructuralTextSplitter, runner: AdaptiveRunner,
+                        pre_splitter: Optional[RuleStructuralTextSplitter] = None,
+                        rule_threshold: float = 0.9) -> Tuple[List[Any], int]:
+    """
+    对一组预分块做结构化分块。规则分块器置信度达到 rule_threshold 的块直接采用规则结果，
+    其余交给 LLM（经 runner 限流与重试）。返回与 texts 对齐的结果列表（DocumentChunks 或异常对象）
+    以及由规则处理的块数。
+    """
+    results: List[Any] = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        if pre_splitter is not None:
+            chunks, confidence = pre_splitter.split_with_confidence(text)
+            if confidence >= rule_threshold:
+                results[i] = DocumentChunks(chunks=[StructuralChunk(content=chunk) for chunk in chunks])
+                continue
+        pending.append(i)
+    llm_results = runner.map(fine_splitter.chain.invoke, [{"input": texts[i]} for i in pending])
+    for i, result in zip(pending, llm_results):
+        results[i] = result
+    return results, len(texts) - len(pending)
+
+
+# --- 按位置拼接重叠块 ---
+def locate_coarse_chunks(text: str, chunks: List[str]) -> List[int]:
+    """返回每个预分块在原文中的起始位置（预分块按顺序出现，彼此重叠）"""
+    starts = []
+    search_from = 0
+    for chunk in chunks:
+        start = text.find(chunk, search_from)
+        if start < 0:
+            start = search_from
+        starts.append(start)
+        search_from = start + 1
+    return starts
+
+
+def locate_chunk(source: str, chunk: str, hint: int = 0, anchor: int = 12, min_match: float = 0.6) -> Optional[Tuple[int, int]]:
+    """
+    在预分块 source 中定位 LLM 输出的细分块，返回 [start, end)。
+    LLM 偶尔会改动标点、空白或漏掉个别字，因此依次尝试：精确匹配 → 首尾锚点 → 最长公共子串拼接。
+    """
+    start = source.find(chunk, hint)
+    if start < 0:
+        start = source.find(chunk)
+    if start >= 0:
+        return start, start + len(chunk)
+
+    size = min(anchor, len(chunk) // 3)
+    lo, hi = 0, len(source)
+    if size >= 4:
+        head = source.find(chunk[:size], hint)
+        if head < 0:
+            head = source.find(chunk[:size])
+        tail = source.find(chunk[-size:], max(head, 0))
+        if head >= 0 and tail >= 0 and 0.5 * len(chunk) <= tail + size - head <= 1.5 * len(chunk):
+            return head, tail + size
+        # 只命中一端锚点时，在其附近做局部对齐
+        if head >= 0:
+            lo, hi = head, min(len(source), head + 2 * len(chunk))
+        elif tail >= 0:
+            lo, hi = max(0, tail + size - 2 * len(chunk)), tail + size
+
+    window = source[lo:hi]
+    blocks = [b for b in SequenceMatcher(None, window, chunk, autojunk=False).get_matching_blocks() if b.size >= 4]
+    if blocks and sum(b.size for b in blocks) >= min_match * len(chunk):
+        first, last = blocks[0], blocks[-1]
+        return lo + max(0, first.a - first.b), lo + min(len(window), last.a + last.size + len(chunk) - last.b - last.size)
+    return None
+
+
+class OverlapStitcher:
+    """
+    把各预分块的细分结果按原文位置拼接起来，代替逐字比较的去重。
+
+    相邻预分块有 chunk_overlap 个字符的重叠，LLM 对重叠区的两次输出往往不完全相同，按内容去重拦不住。
+    这里先把每个细分块定位回原文的 [start, end)，再按位置取舍：
+    - 已输出内容完全覆盖该块：视为重复，丢弃
+    - 已输出内容覆盖了该块绝大部分（新增部分不足 min_new）：只输出未覆盖部分的原文，
+      重叠区的不同渲染不再重复出现，被上一个预分块截断的内容也不会丢失
+    - 块贴着预分块末尾、且完全落在与下一个预分块的重叠区内：很可能被截断，交给下一个预分块输出完整版本
+    - 无法定位的块：退回按内容摘要去重（只记住最近 dedupe_window 个）
+    covered_until 为已输出内容的最远位置，可保存到检查点，续跑时恢复。
+    """
+
+    def __init__(self, covered_until: int = 0, min_new: float = 0.2, tolerance: int = 2, min_fragment: int = 8,
+                 dedupe_window: int = 4096):
+        self.covered_until = covered_until
+        self.min_new = min_new
+        self.tolerance = tolerance
+        self.min_fragment = min_fragment
+        self.dedupe_window = dedupe_window
+        self._recent: "OrderedDict[bytes, None]" = OrderedDict()
+        self.emitted = 0
+        self.duplicates = 0
+        self.deferred = 0
+        self.trimmed = 0
+        self.unlocated = 0
+
+    def _seen(self, content: str) -> bool:
+        digest = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+        if digest in self._recent:
+            return True
+        self._recent[digest] = None
+        if len(self._recent) > self.dedupe_window:
+            self._recent.popitem(last=False)
+        return False
+
+    def stitch(self, coarse_text: str, coarse_start: int, next_start: Optional[int],
+               fine_chunks: Iterable[str]) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """
+        处理一个预分块的细分结果，返回 (内容, 原文起点, 原文终点) 列表；无法定位的块起止为 None。
+        coarse_start 为预分块在原文中的起点，next_start 为下一个预分块的起点（最后一块传 None）。
+        """
+        output = []
+        coarse_end = coarse_start + len(coarse_text.rstrip())
+        hint = 0
+        for content in fine_chunks:
+            content = content.strip()
+            if not content:
+                continue
+            span = locate_chunk(coarse_text, content, hint)
+            if span is None:
+                if self._seen(content):
+                    self.duplicates += 1
+                    continue
+                self.unlocated += 1
+                self.emitted += 1
+                output.append((content, None, None))
+                continue
+            hint = max(0, span[1] - self.tolerance)
+            start, end = coarse_start + span[0], coarse_start + span[1]
+            if next_start is not None and start >= next_start and end >= coarse_end - self.tolerance:
+                self.deferred += 1
+                continue
+            new = end - max(start, self.covered_until)
+            if start < self.covered_until and new <= self.tolerance:
+                self.duplicates += 1
+                continue
+            if start < self.covered_until and new < self.min_new * (end - start):
+                start = self.covered_until
+                content = coarse_text[start - coarse_start:end - coarse_start].strip()
+                if len(content) < self.min_fragment:
+                    self.duplicates += 1
+                    continue
+                self.trimmed += 1
+            self._seen(content)
+            self.covered_until = max(self.covered_until, end)
+            self.emitted += 1
+            output.append((content, start, end))
+        return output
+
+    def stats(self) -> dict:
+        return {"emitted": self.emitted, "duplicates": self.duplicates, "deferred": self.deferred,
+                "trimmed": self.trimmed, "unlocated": self.unlocated, "covered_until": self.covered_until}
+
+
 class ConcurrentHierarchicalSplitter(TextSplitter):
     """
     一个支持可控并发和错误处理的、生产级别的分层文本分割器。
+
+    并发不再是固定的 max_concurrency：以它为初始值，请求持续成功时逐步放大，遇到限流（429）时减半；
+    失败的块先按带抖动的指数退避重试 max_retries 次，仍失败才保留原始粗分块。
+    每次 split_text 的调用数、重试数、回退数与延迟 p50/p95 记录在 last_run_metrics。
+
+    传入 pre_splitter（rulesplitter.RuleStructuralTextSplitter）后，结构明显、规则置信度不低于
+    rule_threshold 的预分块不再调用 LLM。
+
+    分割器自己创建的 AdaptiveRunner 持有线程池，用完后调用 close()（或用 with 语句）释放；
+    传入 runner 时与其他阶段共享它的线程池和并发预算，由创建者负责关闭。
     """
     def __init__(self, 
                  coarse_splitter: TextSplitter, 
                  fine_splitter: LLMStructuralTextSplitter,
                  max_concurrency: int = 5,
+                 limiter: Optional[AdaptiveLimiter] = None,
+                 max_retries: int = 3,
+                 retry_backoff: float = 1.0,
+                 pre_splitter: Optional[RuleStructuralTextSplitter] = None,
+                 rule_threshold: float = 0.9,
+                 runner: Optional[AdaptiveRunner] = None,
                  **kwargs: Any):
         super().__init__(**kwargs)
         self.coarse_splitter = coarse_splitter
         self.fine_splitter = fine_splitter
         self.max_concurrency = max_concurrency
+        self._owns_runner = runner is None
+        if runner is not None:
+            self.limiter = runner.limiter
+            self.runner = runner
+        else:
+            # 传入 limiter 可与提取链等其他 LLM 调用共享同一个并发预算
+            self.limiter = limiter or AdaptiveLimiter(initial=max_concurrency, max_limit=max_concurrency * 4)
+            self.runner = AdaptiveRunner(self.limiter, max_retries=max_retries, retry_backoff=retry_backoff, name="split")
+        self.pre_splitter = pre_splitter
+        self.rule_threshold = rule_threshold
+        self.last_run_metrics: dict = {}
+
+    def close(self):
+        """释放自己创建的 runner 的线程池；共享的 runner 由创建者关闭"""
+        if self._owns_runner:
+            self.runner.close()
+
+    def __enter__(self) -> "ConcurrentHierarchicalSplitter":
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        self.close()
 
     def split_text(self, text: str) -> List[str]:
+        return [content for content, _, _ in self.split_text_with_offsets(text)]
+
+    def create_documents(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> List[Document]:
+        """与 TextSplitter 相同，另在 metadata 中记录每个块在原文中的 start_index / end_index"""
+        metadatas = metadatas or [{}] * len(texts)
+        documents = []
+        for text, metadata in zip(texts, metadatas):
+            for content, start, end in self.split_text_with_offsets(text):
+                documents.append(Document(page_content=content,
+                                          metadata={**copy.deepcopy(metadata), "start_index": start, "end_index": end}))
+        return documents
+
+    def split_text_with_offsets(self, text: str) -> List[Tuple[str, Optional[int], Optional[int]]]:
         # 1. 重叠预分块
         print("--- 步骤 1: 正在进行重叠预分块... ---")
         coarse_chunks_text = self.coarse_splitter.split_text(text)
+        coarse_starts = locate_coarse_chunks(text, coarse_chunks_text)
         print(f"--- 预分块完成，共得到 {len(coarse_chunks_text)} 个重叠的巨型块。 ---")
         
         # 2. 并发处理
-        print(f"\n--- 步骤 2: 正在并发处理所有块 (并发上限: {self.max_concurrency})... ---")
+        print(f"\n--- 步骤 2: 正在并发处理所有块 (初始并发: {self.limiter.limit}，自适应调整)... ---")
         inputs = [{"input": chunk} for chunk in coarse_chunks_text]
         
-        # --- 核心修改1：在 .batch() 中加入 return_exceptions=True ---
-        results_list = self.fine_splitter.chain.batch(
-            inputs, 
-            config={"max_concurrency": self.max_concurrency},
-            return_exceptions=True  # <-- 优雅处理错误的关键！
-        )
+        # --- 核心修改1：规则有把握的块直接分块；LLM 调用失败先重试，重试耗尽后以异常对象返回（同 return_exceptions=True） ---
+        results_list, rule_count = split_coarse_chunks(coarse_chunks_text, self.fine_splitter, self.runner,
+                                                       self.pre_splitter, self.rule_threshold)
+        self.last_run_metrics = {**self.runner.last_run, "limit": self.limiter.limit, "rule_chunks": rule_count}
         print("--- 并发处理完成。 ---")
+        print(f"--- 调用统计: {self.last_run_metrics} ---")
+        if self.fine_splitter.cache is not None and hasattr(self.fine_splitter.cache, "stats"):
+            print(f"--- LLM 缓存统计: {self.fine_splitter.cache.stats()} ---")
 
-        # 3. 裁剪去重，并处理异常
-        print("\n--- 步骤 3: 正在进行结果的裁剪、去重与错误处理... ---")
+        # 3. 按原文位置拼接重叠区，并处理异常
+        print("\n--- 步骤 3: 正在按原文位置拼接重叠块并处理错误... ---")
         final_chunks = []
-        seen_chunks = set()
+        stitcher = OverlapStitcher()
 
         # --- 核心修改2：在循环中检查结果是成功还是异常 ---
         for i, result in enumerate(results_list):
+            next_start = coarse_starts[i + 1] if i + 1 < len(coarse_starts) else None
             # 如果结果是一个异常对象
             if isinstance(result, Exception):
-                failed_input_text = inputs[i]['input']
                 print(f"  [警告] 第 {i+1} 个块处理失败，错误类型: {type(result).__name__}。将保留原始粗分块内容。")
                 # 决策：将未被成功处理的原始粗分块直接加入最终结果
                 # 这样可以保证数据不丢失，后续可以人工检查这些失败的块。
-                if failed_input_text not in seen_chunks:
-                    final_chunks.append(failed_input_text)
-                    seen_chunks.add(failed_input_text)
-                continue # 继续处理下一个结果
-
+                candidates = [inputs[i]['input']]
             # 如果结果是正常的 DocumentChunks 对象
-            if isinstance(result, DocumentChunks):
-                for chunk_obj in result.chunks:
-                    chunk_content = chunk_obj.content.strip()
-                    if chunk_content and chunk_content not in seen_chunks:
-                        final_chunks.append(chunk_content)
-                        seen_chunks.add(chunk_content)
+            elif isinstance(result, DocumentChunks):
+                candidates = [chunk_obj.content for chunk_obj in result.chunks]
             else:
                 # 兜底处理未知类型的返回结果
                 print(f"  [警告] 第 {i+1} 个块返回了未知类型的结果: {type(result).__name__}。")
+                continue
+            final_chunks.extend(stitcher.stitch(coarse_chunks_text[i], coarse_starts[i], next_start, candidates))
 
-        print("--- 裁剪、去重与错误处理完成。 ---")
-        return final_chunks
\ No newline at end of file
+        self.last_run_metrics["stitch"] = stitcher.stats()
+        print(f"--- 拼接完成: {stitcher.stats()} ---")
+        return final_chunks
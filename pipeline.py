@@ -0,0 +1,495 @@
+"""
+流式、可断点续跑的入库流程：繁简转换 → 重叠预分块 → LLM 结构化分块 → 方志/诗词提取 → 批量写入 Neo4j。
+
+原先这几步分散在 Traditional2Simplified.ipynb / chunk.ipynb / knowledgeMining.ipynb 中，
+每一步都要把完整结果放进内存后再手动运行下一步。这里每个阶段都是一个生成器，运行在独立线程中，
+阶段之间用有界队列连接：
+- 各阶段同时推进，LLM 分块与提取、写库互相重叠，而不是严格串行
+- 队列有界，内存占用只与队列长度和批大小有关，与输入文件大小无关，可处理完整的永乐大典文本
+- 每写入一批就原子地更新检查点；进程崩溃后重跑同一命令，会从最后一个已提交的预分块处继续
+  （Neo4j 写入使用 MERGE，重放的少量重叠内容不会产生重复节点）
+
+用法:
+    python pipeline.py data.txt --convert --chunks-out split_outputs_jsonl/processed_chunks.jsonl
+    python pipeline.py data_simplified.txt --no-graph          # 只分块，不提取、不写库
+    python pipeline.py data.txt --restart                      # 忽略检查点从头开始
+"""
+import argparse
+import bisect
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+
+from concurrency import AdaptiveLimiter, AdaptiveRunner
+from conversion import iter_converted_lines
+from entity_resolution import DEFAULT_ALIAS_PATH, AliasResolver
+from extraction import EXTRACTION_MODES, ExtractionEngine
+from graph_loader import BulkLoader
+from llmsplitter import DocumentChunks, LLMStructuralTextSplitter, OverlapStitcher, locate_coarse_chunks, split_coarse_chunks
+from rulesplitter import RuleStructuralTextSplitter
+
+_END = object()  # 队列结束标记
+
+
+class WorkItem:
+    """一个预分块及其在后续各阶段产生的结果，按 coarse_id 顺序流过整个流程"""
+
+    __slots__ = ("coarse_id", "text", "start_line", "end_line", "start_offset", "next_start", "lines",
+                 "chunks", "spans", "gazetteer_rows", "poem_rows")
+
+    def __init__(self, coarse_id: int, text: str, start_line: int, end_line: int, start_offset: int = 0,
+                 next_start: Optional[int] = None, lines: Optional[List[Tuple[int, int]]] = None):
+        self.coarse_id = coarse_id
+        self.text = text
+        self.start_line = start_line  # 预分块起止所在的输入行号（从 0 开始）
+        self.end_line = end_line
+        self.start_offset = start_offset  # 预分块在（转换后的）全文中的字符位置
+        self.next_start = next_start  # 下一个预分块的起点，最后一块为 None
+        self.lines = lines or []  # 预分块覆盖的各行：(行号, 行首字符位置)
+        self.chunks: List[str] = []
+        self.spans: List[Tuple[Optional[int], Optional[int]]] = []  # 各细分块在全文中的 [start, end)
+        self.gazetteer_rows: List[Dict[str, Any]] = []
+        self.poem_rows: List[Dict[str, Any]] = []
+
+
+# --- 各阶段（生成器） ---
+
+def read_lines(path: str, start_line: int = 0) -> Iterator[Tuple[int, str]]:
+    """逐行读取输入文本，跳过 start_line 之前的行"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if line_no >= start_line:
+                yield line_no, line
+
+
+def coarse_split(lines: Iterable[Tuple[int, str]], splitter: TextSplitter, chunk_size: int,
+                 first_id: int = 0, first_offset: int = 0, window_factor: int = 4) -> Iterator[WorkItem]:
+    """
+    流式重叠预分块。缓冲区累积到 chunk_size * window_factor 后切分一次，
+    输出除最后一块外的所有块，最后一块连同其后的文本留在缓冲区中与后续行一起再切分，
+    因此块边界与对整篇文本切分基本一致，而内存只占一个窗口。
+    first_offset 为第一行在全文中的字符位置（续跑时从检查点恢复），用于给细分块标注原文位置。
+    """
+    buffer = ""
+    buffer_base = first_offset  # 缓冲区起点在全文中的字符位置
+    line_starts: List[int] = []  # 缓冲区中每一行的起始字符位置（相对缓冲区，可能为负）
+    line_numbers: List[int] = []
+    next_id = first_id
+
+    def line_at(offset: int) -> int:
+        return line_numbers[max(0, bisect.bisect_right(line_starts, offset) - 1)]
+
+    def lines_between(start: int, end: int) -> List[Tuple[int, int]]:
+        first = max(0, bisect.bisect_right(line_starts, start) - 1)
+        last = max(0, bisect.bisect_right(line_starts, end) - 1)
+        return [(line_numbers[i], buffer_base + line_starts[i]) for i in range(first, last + 1)]
+
+    def flush(final: bool):
+        nonlocal buffer, buffer_base, line_starts, line_numbers, next_id
+        chunks = splitter.split_text(buffer)
+        if not chunks:
+            return []
+        emit = chunks if final else chunks[:-1]
+        items = []
+        starts = locate_coarse_chunks(buffer, chunks)
+        for k, (chunk, start) in enumerate(zip(emit, starts)):
+            end = start + len(chunk) - 1
+            next_start = buffer_base + starts[k + 1] if k + 1 < len(chunks) else None
+            items.append(WorkItem(next_id, chunk, line_at(start), line_at(end), buffer_base + start,
+                                  next_start, lines_between(start, end)))
+            next_id += 1
+        if not final:
+            # 从最后一块的起点开始保留缓冲区，并把行号表平移到新的起点
+            keep_from = starts[-1]
+            first_line = bisect.bisect_right(line_starts, keep_from) - 1
+            line_numbers = line_numbers[first_line:]
+            line_starts = [s - keep_from for s in line_starts[first_line:]]
+            buffer = buffer[keep_from:]
+            buffer_base += keep_from
+        return items
+
+    for line_no, line in lines:
+        line_starts.append(len(buffer))
+        line_numbers.append(line_no)
+        buffer += line
+        if len(buffer) >= chunk_size * window_factor:
+            yield from flush(final=False)
+    if buffer.strip():
+        yield from flush(final=True)
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def structural_split(items: Iterable[WorkItem], fine_splitter: LLMStructuralTextSplitter,
+                     batch_size: int, runner: AdaptiveRunner, stitcher: OverlapStitcher,
+                     pre_splitter: Optional[RuleStructuralTextSplitter] = None, rule_threshold: float = 0.9,
+                     counters: Optional[Dict[str, int]] = None) -> Iterator[WorkItem]:
+    """
+    结构化分块。与 ConcurrentHierarchicalSplitter 相同：规则有把握的块不调用 LLM，
+    失败的块经 runner 重试后仍失败时保留原始预分块内容，
+    重叠区由 OverlapStitcher 按原文位置取舍，每个细分块带上在全文中的起止位置。
+    """
+    for batch in _batched(items, batch_size):
+        results, rule_count = split_coarse_chunks([item.text for item in batch], fine_splitter, runner,
+                                                  pre_splitter, rule_threshold)
+        if counters is not None:
+            counters["rule_chunks"] = counters.get("rule_chunks", 0) + rule_count
+            counters["llm_chunks"] = counters.get("llm_chunks", 0) + len(batch) - rule_count
+        for item, result in zip(batch, results):
+            if isinstance(result, DocumentChunks):
+                candidates = [chunk.content for chunk in result.chunks]
+            else:
+                reason = type(result).__name__ if isinstance(result, Exception) else "未知返回类型"
+                print(f"  [警告] 预分块 {item.coarse_id} 处理失败 ({reason})，保留原始预分块内容。")
+                candidates = [item.text]
+            for content, start, end in stitcher.stitch(item.text, item.start_offset, item.next_start, candidates):
+                item.chunks.append(content)
+                item.spans.append((start, end))
+            yield item
+
+
+def extract(items: Iterable[WorkItem], engine: ExtractionEngine, batch_size: int) -> Iterator[WorkItem]:
+    """方志 / 诗词提取，按批交给提取引擎，结果挂到对应的预分块上"""
+    for batch in _batched(items, batch_size):
+        texts, owners = [], []
+        for item in batch:
+            for chunk in item.chunks:
+                texts.append(chunk)
+                owners.append(item)
+        for owner, (gazetteer_rows, poem_rows) in zip(owners, engine.extract(texts)):
+            owner.gazetteer_rows.extend(gazetteer_rows)
+            owner.poem_rows.extend(poem_rows)
+        yield from batch
+
+
+# --- 阶段线程与有界队列 ---
+
+class _StageFailed(Exception):
+    pass
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(q: queue.Queue, stop: threading.Event) -> Iterator[Any]:
+    while not stop.is_set():
+        try:
+            item = q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if item is _END:
+            return
+        yield item
+
+
+def _start_stage(name: str, transform: Callable[[Iterable[Any]], Iterable[Any]], source: Iterable[Any],
+                 queue_size: int, stop: threading.Event, errors: List[Tuple[str, BaseException]]) -> queue.Queue:
+    """在独立线程中运行一个阶段，返回它的输出队列"""
+    outbox: queue.Queue = queue.Queue(maxsize=queue_size)
+
+    def run():
+        try:
+            for item in transform(source):
+                if not _put(outbox, item, stop):
+                    return
+        except BaseException as e:
+            errors.append((name, e))
+            stop.set()
+        finally:
+            _put(outbox, _END, stop)
+
+    threading.Thread(target=run, name=f"pipeline-{name}", daemon=True).start()
+    return outbox
+
+
+# --- 检查点 ---
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    """原子写入：先写临时文件再替换，崩溃时不会留下半个检查点"""
+    checkpoint["updated_at"] = datetime.now().isoformat()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# --- 提交（写库 + 分块输出 + 检查点） ---
+
+class Committer:
+    """在主线程中按批提交已完成的预分块，提交成功后才推进检查点"""
+
+    def __init__(self, loader: Optional[BulkLoader], resolver: Optional[AliasResolver], chunks_out: Optional[str],
+                 checkpoint_path: str, checkpoint: Dict[str, Any], source: str, append: bool):
+        self.loader = loader
+        self.resolver = resolver
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint = checkpoint
+        self.source = source
+        self.chunks_file = open(chunks_out, "a" if append else "w", encoding="utf-8") if chunks_out else None
+
+    def commit(self, items: List[WorkItem]):
+        gazetteer_rows = [row for item in items for row in item.gazetteer_rows]
+        poem_rows = [row for item in items for row in item.poem_rows]
+        if self.loader is not None:
+            if self.resolver is not None:
+                gazetteer_rows, poem_rows = self.resolver.resolve_rows(gazetteer_rows, poem_rows)
+            self.loader.load_extractions(gazetteer_rows, poem_rows)
+
+        chunk_count = sum(len(item.chunks) for item in items)
+        if self.chunks_file is not None:
+            for item in items:
+                for chunk, (start, end) in zip(item.chunks, item.spans):
+                    metadata = {"source": self.source, "coarse_id": item.coarse_id, "start_index": start, "end_index": end}
+                    record = {"page_content": chunk, "metadata": metadata}
+                    self.chunks_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.chunks_file.flush()
+            os.fsync(self.chunks_file.fileno())
+
+        covered_until = max([end for item in items for _, end in item.spans if end is not None]
+                            + [self.checkpoint.get("covered_until", 0)])
+        resume_line, resume_offset = _resume_point(items, covered_until)
+        self.checkpoint.update({
+            "committed_coarse_id": items[-1].coarse_id,
+            # 从已输出内容末尾所在的行重新读入；重读的重叠部分由 covered_until 去重、由 MERGE 吸收
+            "resume_line": resume_line,
+            "resume_offset": resume_offset,
+            "covered_until": covered_until,
+            "chunks_written": self.checkpoint.get("chunks_written", 0) + chunk_count,
+            "gazetteer_rows": self.checkpoint.get("gazetteer_rows", 0) + len(gazetteer_rows),
+            "poem_rows": self.checkpoint.get("poem_rows", 0) + len(poem_rows),
+        })
+        save_checkpoint(self.checkpoint_path, self.checkpoint)
+
+    def close(self):
+        if self.chunks_file is not None:
+            self.chunks_file.close()
+
+
+def _resume_point(items: List[WorkItem], covered_until: int) -> Tuple[int, int]:
+    """已输出内容末尾 covered_until 所在的行：(行号, 行首字符位置)。找不到时保守地退回本批第一块的起始行"""
+    for item in reversed(items):
+        if item.lines and item.lines[0][1] <= covered_until:
+            offsets = [offset for _, offset in item.lines]
+            return item.lines[max(0, bisect.bisect_right(offsets, covered_until) - 1)]
+    return items[0].lines[0] if items[0].lines else (items[0].start_line, items[0].start_offset)
+
+
+def _run_config(input_path: str, chunk_size: int, chunk_overlap: int, convert: bool, convert_config: str,
+                extract_enabled: bool, extract_mode: str, rule_threshold: Optional[float], write_graph: bool,
+                alias_path: Optional[str]) -> Dict[str, Any]:
+    """影响输出内容的全部选项；续跑时任一项变化都要求 --restart，避免同一份输出混入两种配置的结果"""
+    return {
+        "input": os.path.abspath(input_path),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "convert": convert,
+        "convert_config": convert_config if convert else None,
+        "extract": extract_enabled,
+        "extract_mode": extract_mode if extract_enabled else None,
+        "rule_threshold": rule_threshold,
+        "graph": write_graph,
+        "aliases": os.path.abspath(alias_path) if write_graph and alias_path else None,
+    }
+
+
+def run_pipeline(input_path: str, llm, graph=None, *, chunks_out: Optional[str] = None,
+                 checkpoint_path: Optional[str] = None, restart: bool = False, convert: bool = False,
+                 extract_enabled: bool = True, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 batch_size: int = 10, max_concurrency: int = 10, commit_every: int = 20,
+                 queue_size: int = 8, extract_mode: str = "interleaved",
+                 rule_threshold: Optional[float] = 0.9, convert_workers: int = 1, convert_config: str = "t2s",
+                 graph_batch_size: int = 1000, graph_workers: int = 1,
+                 alias_path: Optional[str] = DEFAULT_ALIAS_PATH) -> Dict[str, Any]:
+    """
+    运行完整流程并返回最终检查点。llm / graph 由调用方传入（graph 为 None 时不写库）；
+    commit_every 为每次提交包含的预分块数，queue_size 为各阶段之间的队列长度，
+    extract_mode 见 extraction.ExtractionEngine；rule_threshold 为规则分块的置信度阈值，None 表示全部交给 LLM；
+    convert_workers 为繁简转换的进程数，convert_config 为 OpenCC 配置；graph_batch_size / graph_workers 见 graph_loader.BulkLoader；
+    alias_path 为湖泊别名词典（None 时不做实体归一）。
+    """
+    checkpoint_path = checkpoint_path or input_path + ".checkpoint.json"
+    config = _run_config(input_path, chunk_size, chunk_overlap, convert, convert_config, extract_enabled, extract_mode,
+                         rule_threshold, graph is not None and extract_enabled, alias_path)
+    checkpoint = None if restart else load_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint.get("config") != config:
+        raise ValueError(f"检查点 {checkpoint_path} 的配置与本次运行不一致，请使用 --restart 重新开始")
+    if checkpoint is not None and checkpoint.get("finished"):
+        print(f"✅ 检查点显示该输入已全部处理完成: {checkpoint_path}")
+        return checkpoint
+
+    resuming = checkpoint is not None
+    if resuming:
+        print(f"🔁 从检查点继续: 已提交预分块 {checkpoint['committed_coarse_id']}，从第 {checkpoint['resume_line'] + 1} 行读起")
+    else:
+        checkpoint = {"config": config, "committed_coarse_id": -1, "resume_line": 0, "resume_offset": 0, "covered_until": 0}
+    first_id = checkpoint["committed_coarse_id"] + 1
+
+    coarse_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, keep_separator=True, is_separator_regex=False
+    )
+    fine_splitter = LLMStructuralTextSplitter(llm=llm)
+
+    stop = threading.Event()
+    errors: List[Tuple[str, BaseException]] = []
+    lines: Iterable[Tuple[int, str]]
+    if convert:
+        # 繁简转换按块在进程池中并行，输出的行号与输入文件一致（与 Traditional2Simplified.ipynb 的处理一致）
+        lines = _drain(_start_stage("convert", lambda _: iter_converted_lines(input_path, checkpoint["resume_line"], convert_workers,
+                                                                                   config=convert_config),
+                                    None, queue_size * 64, stop, errors), stop)
+    else:
+        lines = read_lines(input_path, checkpoint["resume_line"])
+    first_offset = checkpoint.get("resume_offset", 0)
+    coarse = _drain(_start_stage("coarse", lambda src: coarse_split(src, coarse_splitter, chunk_size, first_id, first_offset), lines, queue_size, stop, errors), stop)
+    # 分块与提取调用同一个模型服务，共享一个自适应并发预算
+    limiter = AdaptiveLimiter(initial=max_concurrency, max_limit=max_concurrency * 4)
+    split_runner = AdaptiveRunner(limiter, name="split")
+    stitcher = OverlapStitcher(covered_until=checkpoint.get("covered_until", 0))
+    pre_splitter = RuleStructuralTextSplitter() if rule_threshold is not None else None
+    split_counters: Dict[str, int] = {}
+    fine = _drain(_start_stage("split", lambda src: structural_split(src, fine_splitter, batch_size, split_runner, stitcher,
+                                                                     pre_splitter, rule_threshold or 0.0, split_counters),
+                               coarse, queue_size, stop, errors), stop)
+    engine = None
+    if extract_enabled:
+        engine = ExtractionEngine(llm, mode=extract_mode, limiter=limiter)
+        fine = _drain(_start_stage("extract", lambda src: extract(src, engine, batch_size), fine, queue_size, stop, errors), stop)
+
+    loader = None
+    if graph is not None and extract_enabled:
+        loader = BulkLoader(graph, batch_size=graph_batch_size, workers=graph_workers)
+        loader.ensure_schema()
+    resolver = None
+    if loader is not None and alias_path:
+        resolver = AliasResolver.from_file(alias_path)
+        resolver.seed(loader.lake_names())
+    committer = Committer(loader, resolver, chunks_out, checkpoint_path, checkpoint,
+                          os.path.basename(input_path), append=resuming)
+    start = time.perf_counter()
+    try:
+        for batch in _batched(fine, commit_every):
+            committer.commit(batch)
+            print(f"  -> 已提交预分块 {batch[-1].coarse_id}（累计片段 {checkpoint['chunks_written']}，"
+                  f"方志 {checkpoint['gazetteer_rows']}，诗词 {checkpoint['poem_rows']}，{time.perf_counter() - start:.1f}s）")
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        committer.close()
+        print(f"--- 分块统计: {split_runner.stats()}，规则 / LLM: {split_counters}，拼接: {stitcher.stats()} ---")
+        split_runner.close()
+        if engine is not None:
+            print(f"--- 提取统计: {engine.stats()} ---")
+            engine.close()
+        if resolver is not None:
+            print(f"--- 实体归一: {resolver.stats()} ---")
+            for name, canonical, similarity in resolver.fuzzy_merges[:20]:
+                print(f"  ~ {name} -> {canonical}（相似度 {similarity}）")
+        if loader is not None:
+            print(f"--- 写库统计: {loader.stats()} ---")
+
+    if errors:
+        name, error = errors[0]
+        raise _StageFailed(f"阶段 {name} 失败，已提交的进度保存在 {checkpoint_path}: {error}") from error
+
+    checkpoint["finished"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    print(f"✅ 入库流程完成，耗时 {time.perf_counter() - start:.1f}s")
+    return checkpoint
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="流式、可断点续跑的入库流程")
+    parser.add_argument("input", help="输入文本（如 data.txt / data_simplified.txt）")
+    parser.add_argument("--convert", action="store_true", help="先做繁体到简体转换（OpenCC t2s）")
+    parser.add_argument("--convert-workers", type=int, default=os.cpu_count() or 1, help="繁简转换的进程数")
+    parser.add_argument("--convert-config", default="t2s", help="OpenCC 转换配置")
+    parser.add_argument("--chunks-out", help="把结构化分块结果写入 jsonl（格式同 split_outputs_jsonl/）")
+    parser.add_argument("--checkpoint", help="检查点路径，默认 <input>.checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="忽略已有检查点，从头开始")
+    parser.add_argument("--no-graph", action="store_true", help="只分块，不做提取和写库")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=10, help="每次调用 chain.batch 的块数")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="LLM 初始并发数，提取阶段会按延迟和限流自动调整")
+    parser.add_argument("--rule-threshold", type=float, default=0.9,
+                        help="规则分块置信度阈值，达到阈值的预分块不调用 LLM（大于 1 时全部交给 LLM）")
+    parser.add_argument("--extract-mode", choices=EXTRACTION_MODES, default="interleaved",
+                        help="interleaved: 两条提取链共享并发；merged: 每块一次调用同时提取方志和诗词")
+    parser.add_argument("--commit-every", type=int, default=20, help="每次提交（写库 + 检查点）的预分块数")
+    parser.add_argument("--graph-batch-size", type=int, default=1000, help="每个 Neo4j 写事务包含的记录数")
+    parser.add_argument("--graph-workers", type=int, default=1, help="并行写入 Neo4j 的会话数")
+    parser.add_argument("--aliases", default=DEFAULT_ALIAS_PATH, help="湖泊别名词典（JSON）")
+    parser.add_argument("--no-resolve", action="store_true", help="写库前不做湖泊名称归一")
+    parser.add_argument("--llm-cache", default="llm_cache.db", help="LLM 响应缓存路径，传空字符串关闭")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+    from adapter import get_graph, get_llm
+
+    llm = get_llm()
+    if args.llm_cache:
+        from llm_cache import DiskLLMCache, with_cache
+        llm = with_cache(llm, DiskLLMCache(args.llm_cache))
+    graph = None if args.no_graph else get_graph()
+
+    run_pipeline(
+        args.input, llm, graph,
+        chunks_out=args.chunks_out,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+        convert=args.convert,
+        extract_enabled=not args.no_graph,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        max_concurrency=args.max_concurrency,
+        commit_every=args.commit_every,
+        extract_mode=args.extract_mode,
+        rule_threshold=args.rule_threshold,
+        convert_workers=args.convert_workers,
+        convert_config=args.convert_config,
+        graph_batch_size=args.graph_batch_size,
+        graph_workers=args.graph_workers,
+        alias_path=None if args.no_resolve else args.aliases,
+    )
+
+
+if __name__ == "__main__":
+    main()
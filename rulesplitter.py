@@ -0,0 +1,130 @@
+"""
+基于规则的结构化分块：在调用 LLM 之前处理结构明显的预分块。
+
+《永乐大典》方志文本的结构大多一眼可辨：卷首行（永乐大典卷之…）、湖名标题（巢湖）、
+书名 / 篇名行（《合肥志》）、整齐的五言 / 七言诗句、以“。”断句的散文。
+RuleStructuralTextSplitter 逐行打分并按与 LLMStructuralTextSplitter 相同的规则分块：
+散文一段一块，湖名 / 书名标题归入其后的正文，诗歌连同标题和作者一块，卷首单独成块。
+每个预分块得到一个置信度（按字符加权的逐行置信度），低于阈值的预分块仍交给 LLM。
+
+用法:
+    rules = RuleStructuralTextSplitter()
+    chunks, confidence = rules.split_with_confidence(text)
+"""
+import re
+from typing import Any, List, Tuple
+
+from langchain_text_splitters import TextSplitter
+
+VOLUME = "volume"    # 永乐大典卷之…
+HEADING = "heading"  # 湖名等短标题，归入其后的正文
+TITLE = "title"      # 书名 / 篇名 / 作者行，归入其后的正文
+POEM = "poem"        # 整齐的诗句
+PROSE = "prose"      # 散文
+UNKNOWN = "unknown"
+
+_VOLUME = re.compile(r"^永乐大典卷之")
+_CJK = r"㐀-鿿\U00020000-\U0002ffff"
+_SENTENCE_PUNCT = re.compile(r"[。，；：？！、]")
+_BOOK_TITLE = re.compile(rf"^(?:[{_CJK}]{{1,6}}\s*)?(?:《[^》]+》\s*)+$")
+_AUTHOR = re.compile(rf"^(?:右)?[{_CJK}（）]{{1,12}}(?:诗|词|赋|作|歌|记)。?$")
+_CLAUSE = re.compile(r"[^，。？！；]+[，。？！；]")
+_LINE = re.compile(r"[^\s](?:[^\n]*[^\s])?")  # 去掉首尾空白后的非空行
+_INTRO = re.compile(r"(?:有诗|诗曰|诗云|其诗曰|其词曰)[。：]?$")
+
+
+def _poem_confidence(line: str) -> float:
+    """诗句：由 4~7 字的小句组成、句长整齐、以“，”“。”交替断句"""
+    clauses = _CLAUSE.findall(line)
+    if len(clauses) < 2 or "".join(clauses) != line:
+        return 0.0
+    lengths = [len(re.sub(r"[（）()]", "", c)) - 1 for c in clauses]
+    if any(n < 4 or n > 7 for n in lengths):
+        return 0.0
+    commas = sum(1 for c in clauses if c.endswith("，"))
+    if len(set(lengths)) == 1 and lengths[0] in (5, 7):
+        if commas * 2 >= len(clauses) - 1:
+            return 0.95
+        # 通篇用“。”断句的五言 / 七言，句数足够多时同样可以确定
+        if len(clauses) >= 4:
+            return 0.85
+    # 长短句（词）或句长不齐：像诗，但不够确定
+    return 0.5
+
+
+def classify_line(line: str) -> Tuple[str, float]:
+    """返回 (行类型, 置信度)"""
+    if _VOLUME.match(line):
+        return VOLUME, 1.0
+    if _BOOK_TITLE.match(line):
+        return TITLE, 0.9
+    if _AUTHOR.match(line):
+        return TITLE, 0.8
+    if not _SENTENCE_PUNCT.search(line):
+        # 没有标点的短行是湖名或书名；稍长的可能是诗题，更长的多半是被截断的正文
+        if len(line) <= 6:
+            return HEADING, 0.95
+        return (TITLE, 0.6) if len(line) <= 20 else (UNKNOWN, 0.3)
+    poem = _poem_confidence(line)
+    if poem > 0:
+        return POEM, poem
+    if _INTRO.search(line):
+        # “……有诗”之类的引语，与其后的诗作为一块
+        return TITLE, 0.8
+    if "。" in line:
+        return PROSE, 0.9
+    return UNKNOWN, 0.4
+
+
+class RuleStructuralTextSplitter(TextSplitter):
+    """确定性的结构分块器，不调用 LLM；split_with_confidence 同时给出整块的置信度"""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+
+    def split_with_confidence(self, text: str) -> Tuple[List[str], float]:
+        """返回 (块列表, 置信度)。每个块都是原文的连续片段，便于按位置拼接"""
+        chunks: List[str] = []
+        pending: List[Tuple[int, int]] = []  # 尚未归属的标题 / 作者行（原文中的起止位置）
+        poem: List[Tuple[int, int]] = []
+        weighted = 0.0
+        total = 0
+
+        def emit(spans: List[Tuple[int, int]]):
+            if spans:
+                chunks.append(text[spans[0][0]:spans[-1][1]])
+
+        def flush_poem():
+            if poem:
+                emit(pending + poem)
+                pending.clear()
+                poem.clear()
+
+        def flush_pending():
+            emit(pending)
+            pending.clear()
+
+        for match in _LINE.finditer(text):
+            line = match.group(0)
+            span = match.span()
+            kind, confidence = classify_line(line)
+            weighted += confidence * len(line)
+            total += len(line)
+            if kind == POEM:
+                poem.append(span)
+                continue
+            flush_poem()
+            if kind in (HEADING, TITLE):
+                pending.append(span)
+            elif kind == VOLUME:
+                flush_pending()
+                emit([span])
+            else:
+                emit(pending + [span])
+                pending.clear()
+        flush_poem()
+        flush_pending()
+        return chunks, (weighted / total if total else 1.0)
+
+    def split_text(self, text: str) -> List[str]:
+        return self.split_with_confidence(text)[0]
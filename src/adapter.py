@@ -1,35 +1,123 @@
-from langchain_openai import ChatOpenAI
-from langchain_neo4j import Neo4jGraph
 from dotenv import load_dotenv
-from pydantic import SecretStr
+from datetime import datetime
+import json
 import os
+import threading
+from logger import get_logger
 
 load_dotenv()  # 加载环境变量
+log = get_logger("adapter")
 base_url = os.getenv("BASE_URL")
-api_key = SecretStr(os.getenv("API_KEY"))  # type: ignore
 username = os.getenv("NEO4J_USERNAME")
-password = SecretStr(os.getenv("NEO4J_PASSWORD")) # type: ignore
 neo4j_url = os.getenv("NEO4J_URL")
 model_name = str(os.getenv("MODEL_NAME"))
 
-llm = ChatOpenAI(
-    model=model_name, 
-    temperature=0.2,  # 设置温度以控制输出的随机性
-    base_url=base_url,
-    api_key=api_key.get_secret_value(),  # type: ignore
-    streaming=True,  # 启用流式输出
+# Neo4j Schema 快照：启动时直接读取，避免每次启动都连库做 Schema 内省
+SCHEMA_SNAPSHOT_PATH = os.getenv(
+    "NEO4J_SCHEMA_SNAPSHOT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "neo4j_schema.json")
 )
 
-graph = Neo4jGraph(
-    url=neo4j_url,
-    username=username,
-    password=password.get_secret_value()
-)
+# LLM、图数据库连接都在首次使用时才创建，导入本模块不会发起任何网络请求
+_llm = None
+_graph = None
+_embeddings = None
+_lock = threading.Lock()
+
+def get_llm():
+    """按需创建聊天模型"""
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                from langchain_openai import ChatOpenAI
+                from pydantic import SecretStr
+                api_key = SecretStr(os.getenv("API_KEY"))  # type: ignore
+                _llm = ChatOpenAI(
+                    model=model_name,
+                    temperature=0.2,  # 设置温度以控制输出的随机性
+                    base_url=base_url,
+                    api_key=api_key.get_secret_value(),  # type: ignore
+                    streaming=True,  # 启用流式输出
+                )
+    return _llm
+
+def get_graph():
+    """按需连接 Neo4j；Schema 优先从本地快照加载，没有快照时内省一次并保存"""
+    global _graph
+    if _graph is None:
+        with _lock:
+            if _graph is None:
+                from langchain_neo4j import Neo4jGraph
+                from pydantic import SecretStr
+                password = SecretStr(os.getenv("NEO4J_PASSWORD"))  # type: ignore
+                graph = Neo4jGraph(
+                    url=neo4j_url,
+                    username=username,
+                    password=password.get_secret_value(),
+                    refresh_schema=False
+                )
+                if not load_schema_snapshot(graph):
+                    refresh_schema(graph)
+                _graph = graph
+    return _graph
+
+def load_schema_snapshot(graph) -> bool:
+    """把快照中的 Schema 填入图对象，快照不存在或损坏时返回 False"""
+    try:
+        with open(SCHEMA_SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        graph.structured_schema = snapshot["structured_schema"]
+        graph.schema = snapshot["schema"]
+        log.info("✅ 已从快照加载 Neo4j Schema", path=SCHEMA_SNAPSHOT_PATH, saved_at=snapshot.get("saved_at", ""))
+        return True
+    except FileNotFoundError:
+        return False
+    except (IOError, ValueError, KeyError) as e:
+        log.warning("⚠️ Schema 快照不可用，将重新内省", error=str(e))
+        return False
+
+def refresh_schema(graph=None):
+    """重新内省 Neo4j Schema 并写入快照（图谱结构变化后调用）"""
+    graph = graph or get_graph()
+    graph.refresh_schema()
+    snapshot = {
+        "saved_at": datetime.now().isoformat(),
+        "schema": graph.schema,
+        "structured_schema": graph.structured_schema
+    }
+    tmp_path = SCHEMA_SNAPSHOT_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, SCHEMA_SNAPSHOT_PATH)
+    log.info("✅ Neo4j Schema 已刷新并保存快照", path=SCHEMA_SNAPSHOT_PATH)
+    return graph
+
+def use_backends(llm=None, graph=None):
+    """替换 LLM / 图数据库实例（基准测试中注入本地替身时使用）"""
+    global _llm, _graph
+    with _lock:
+        if llm is not None:
+            _llm = llm
+        if graph is not None:
+            _graph = graph
+
+def get_embeddings():
+    """按需创建向量模型，仅在启用语义缓存等功能时使用"""
+    global _embeddings
+    if _embeddings is None:
+        from langchain_openai import OpenAIEmbeddings
+        _embeddings = OpenAIEmbeddings(
+            model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+            base_url=base_url,
+            api_key=os.getenv("API_KEY"),
+        )
+    return _embeddings
 
 if __name__ == "__main__":
    #check llm connection
-   res = llm.invoke("Hello, world!")
+   res = get_llm().invoke("Hello, world!")
    print(res.content)
    #check graph connection
-   res = graph.query("MATCH (n) RETURN n LIMIT 1")
-   print(res)
\ No newline at end of file
+   res = get_graph().query("MATCH (n) RETURN n LIMIT 1")
+   print(res)
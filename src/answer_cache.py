@@ -0,0 +1,181 @@
+"""
+问答结果缓存：位于 run_agent / run_agent_stream 之前，相同问题直接复用上一次的答案。
+
+- 以归一化后的问题文本为键，可选基于向量相似度的语义匹配
+- TTL 过期 + LRU 淘汰，条目数有上限
+- 图谱重新入库后整体失效（手动调用 invalidate，或由指纹函数自动检测）；自动检测到变化时
+  另外调用 on_change，让依赖图谱内容的其他缓存（Cypher 计划、实体词典）一起失效
+"""
+import math
+import operator
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from logger import get_logger
+
+log = get_logger("answer_cache")
+
+# 问题末尾常见的标点和语气符号，不影响语义
+_TRAILING_PUNCT = re.compile(r"[\s？?。！!．.，,、；;：:～~…]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """归一化问题文本：全半角统一、去空白、去末尾标点、英文小写"""
+    text = unicodedata.normalize("NFKC", query)
+    text = _WHITESPACE.sub("", text)
+    text = _TRAILING_PUNCT.sub("", text)
+    return text.lower()
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "vector")
+
+    def __init__(self, value: Any, expires_at: float, vector: Optional[List[float]]):
+        self.value = value
+        self.expires_at = expires_at
+        self.vector = vector
+
+
+class AnswerCache:
+    """线程安全的 TTL + LRU 答案缓存"""
+
+    def __init__(self,
+                 max_entries: int = 512,
+                 ttl_seconds: float = 3600,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 similarity_threshold: float = 0.95,
+                 fingerprint_fn: Optional[Callable[[], Any]] = None,
+                 fingerprint_interval: float = 60,
+                 on_change: Optional[Callable[[], None]] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.fingerprint_fn = fingerprint_fn
+        self.fingerprint_interval = fingerprint_interval
+        self.on_change = on_change
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint_lock = threading.Lock()  # 同一时间只有一个请求查询指纹
+        self._fingerprint: Any = None
+        self._fingerprint_checked_at = 0.0
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _embed(self, key: str) -> Optional[List[float]]:
+        if self.embed_fn is None:
+            return None
+        try:
+            return _unit(self.embed_fn(key))
+        except Exception as e:
+            log.warning("⚠️ 问题向量化失败，退回精确匹配", error=str(e))
+            return None
+
+    def _check_fingerprint(self):
+        """
+        定期比对图谱指纹，发现重新入库时清空缓存并调用 on_change。
+        指纹查询访问 Neo4j，到期时只由一个请求执行；其他并发请求不等待，继续使用当前缓存。
+        """
+        if self.fingerprint_fn is None:
+            return
+        if time.monotonic() - self._fingerprint_checked_at < self.fingerprint_interval:
+            return
+        if not self._fingerprint_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if now - self._fingerprint_checked_at < self.fingerprint_interval:
+                return  # 等锁期间已由其他请求检查过
+            self._fingerprint_checked_at = now
+            try:
+                fingerprint = self.fingerprint_fn()
+            except Exception as e:
+                log.warning("⚠️ 获取图谱指纹失败", error=str(e))
+                return
+            changed = self._fingerprint is not None and fingerprint != self._fingerprint
+            self._fingerprint = fingerprint
+            if not changed:
+                return
+            log.info("🔄 检测到图谱数据变化，答案缓存已失效")
+            self.invalidate()
+            if self.on_change is not None:
+                try:
+                    self.on_change()
+                except Exception as e:
+                    log.warning("⚠️ 图谱变化后的失效回调失败", error=str(e))
+        finally:
+            self._fingerprint_lock.release()
+
+    def get(self, query: str) -> Optional[Any]:
+        """查找缓存；精确命中优先，其次是语义相似命中"""
+        self._check_fingerprint()
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+                del self._entries[key]
+            if self.embed_fn is None or not self._entries:
+                self._stats["misses"] += 1
+                return None
+
+        # 向量化可能是一次远程调用，放在锁外执行
+        vector = self._embed(key)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for candidate_key, candidate in self._entries.items():
+                if candidate.vector is None or candidate.expires_at <= now:
+                    continue
+                score = sum(map(operator.mul, vector, candidate.vector)) if vector else 0.0
+                if score >= best_score:
+                    best_key, best_score = candidate_key, score
+            if best_key is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["semantic_hits"] += 1
+            return self._entries[best_key].value
+
+    def put(self, query: str, value: Any):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        key = normalize_query(query)
+        vector = self._embed(key)
+        with self._lock:
+            self._entries[key] = _Entry(value, time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self):
+        """清空所有缓存条目（图谱重新入库后调用）"""
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["semantic_hits"] + self._stats["misses"]
+            hit_rate = (self._stats["hits"] + self._stats["semantic_hits"]) / lookups if lookups else 0.0
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "semantic": self.embed_fn is not None,
+                "hit_rate": round(hit_rate, 4),
+            }
@@ -1,17 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, AsyncGenerator
+from typing import Dict, Any, AsyncGenerator, Optional
 import uvicorn
+import argparse
 import os
 import json
+import signal
 import asyncio
+import threading
 from datetime import datetime
-from graph_agent import run_agent, run_agent_stream
+from session_store import clamp_page, create_session_store
+from logger import get_logger
+from metrics import registry
+from serving import admission, agent_executor, shared_generation, GRACEFUL_TIMEOUT
+from graph_agent import run_agent, run_agent_stream, run_blocking, warmup_agent, refresh_graph_schema, reload_graph_schema, answer_cache, cypher_cache, intent_router, inflight_agent, inflight_streams, search_service_stats
 
 app = FastAPI(title="知识图谱问答系统", description="基于LangGraph的智能问答API")
+log = get_logger("app")
 
 # 配置CORS，允许前端跨域访问
 app.add_middleware(
@@ -26,10 +34,9 @@ app.add_middleware(
 static_dir = os.path.join(os.path.dirname(__file__), "..", "knowledge-mining-visualization", "dist")
 if os.path.exists(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
-    print(f"✅ 静态文件目录已挂载: {static_dir}")
+    log.info("✅ 静态文件目录已挂载", path=static_dir)
 else:
-    print(f"⚠️  静态文件目录不存在: {static_dir}")
-    print("请先运行 npm run build 构建前端项目")
+    log.warning("⚠️  静态文件目录不存在，请先运行 npm run build 构建前端项目", path=static_dir)
 
 # 请求模型
 class QueryRequest(BaseModel):
@@ -48,8 +55,84 @@ class QueryResponse(BaseModel):
     message: str
     timestamp: str
 
-# 简单的会话存储（生产环境建议使用Redis等）
-chat_sessions = {}
+# 会话存储：默认进程内 LRU（有会话数/消息数上限和空闲过期），SESSION_STORE=sqlite 时持久化并可跨 worker 共享
+session_store = create_session_store()
+
+@app.on_event("startup")
+async def startup_event():
+    """在后台线程预热工作流、图谱连接和实体词典，不阻塞服务开始响应 /api/health 等接口"""
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, warmup_agent)
+    if threading.current_thread() is threading.main_thread():
+        install_drain_handler(loop)
+
+def install_drain_handler(loop: asyncio.AbstractEventLoop):
+    """
+    接管 SIGTERM：先进入排空状态，此时服务仍在接受连接，新请求得到 503 和 Retry-After（负载均衡可转发到其他实例），
+    进行中的请求结束或等待 GRACEFUL_TIMEOUT 秒后，再交给 uvicorn 原有的处理函数关闭服务；再次收到 SIGTERM 时立即关闭。
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def forward(signum, frame):
+        if callable(previous):
+            previous(signum, frame)
+
+    async def drain_then_exit(signum, frame):
+        drained = await admission.wait_idle(GRACEFUL_TIMEOUT)
+        log.info("🛑 排空结束，开始关闭", drained=drained, in_flight=admission.in_flight)
+        forward(signum, frame)
+
+    def on_sigterm(signum, frame):
+        if admission.draining:
+            forward(signum, frame)
+            return
+        admission.start_draining()
+        log.info("🛑 收到 SIGTERM，进入排空状态", in_flight=admission.in_flight)
+        loop.call_soon_threadsafe(lambda: loop.create_task(drain_then_exit(signum, frame)))
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """拒绝残留请求，在事件循环中限时等待进行中的请求结束，然后关闭执行器（不阻塞等待其中的线程）"""
+    admission.start_draining()
+    if not await admission.wait_idle(GRACEFUL_TIMEOUT):
+        log.warning("⚠️ 关闭时仍有请求未完成", in_flight=admission.in_flight)
+    agent_executor.shutdown(wait=False, cancel_futures=True)
+
+def _apply_shared_invalidation():
+    """其他 worker 清空了缓存或刷新了 Schema 时，在本 worker 执行同样的失效；需要访问 Neo4j 的部分放到后台线程"""
+    changed = shared_generation.poll()
+    if not changed:
+        return
+    loop = asyncio.get_running_loop()
+    if "cache" in changed:
+        answer_cache.invalidate()
+        cypher_cache.invalidate()
+        loop.run_in_executor(None, _reload_intent_router)
+    if "schema" in changed:
+        loop.run_in_executor(None, _reload_schema)
+    log.info("🔄 已同步其他 worker 的缓存失效", kinds=changed)
+
+def _reload_intent_router():
+    try:
+        intent_router.load(force=True)
+    except Exception as e:
+        log.warning("⚠️ 实体词典重新载入失败", error=str(e))
+
+def _reload_schema():
+    try:
+        reload_graph_schema()
+    except Exception as e:
+        log.warning("⚠️ Schema 快照重新载入失败", error=str(e))
+
+def _busy_response() -> HTTPException:
+    """背压：队列已满返回 429，排空中返回 503，均带 Retry-After"""
+    if admission.draining:
+        return HTTPException(status_code=503, detail="服务正在关闭，请稍后重试",
+                             headers={"Retry-After": str(admission.retry_after)})
+    return HTTPException(status_code=429, detail="服务繁忙，请稍后重试",
+                         headers={"Retry-After": str(admission.retry_after)})
 
 @app.get("/")
 async def root():
@@ -66,47 +149,30 @@ async def root():
             "endpoints": {
                 "chat": "/api/chat",
                 "health": "/api/health",
+                "metrics": "/api/metrics",
                 "history": "/api/chat/history/{session_id}"
             }
         }
 
-# 处理前端路由，所有非API路径都返回index.html
-@app.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
-    """处理前端路由"""
-    # 如果是API路径，不处理
-    if full_path.startswith("api/"):
-        raise HTTPException(status_code=404, detail="API endpoint not found")
-    
-    # 检查是否为静态资源
-    file_path = os.path.join(static_dir, full_path)
-    if os.path.isfile(file_path):
-        return FileResponse(file_path)
-    
-    # 否则返回index.html（用于SPA路由）
-    index_file = os.path.join(static_dir, "index.html")
-    if os.path.exists(index_file):
-        return FileResponse(index_file)
-    else:
-        raise HTTPException(status_code=404, detail="Frontend files not found")
-
 @app.post("/api/chat", response_model=QueryResponse)
 async def chat_endpoint(request: QueryRequest):
     """聊天接口"""
+    if not admission.try_acquire():
+        raise _busy_response()
+    _apply_shared_invalidation()
     try:
         # 记录用户消息
         session_id = request.session_id
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = []
         
         user_message = ChatMessage(
             message=request.query,
             timestamp=datetime.now().isoformat(),
             type="user"
         )
-        chat_sessions[session_id].append(user_message)
-          # 调用图谱代理
-        result = run_agent(request.query)
+        # 会话存储可能是 SQLite（跨 worker 争用写锁时会等待），读写都放到线程池，不占用事件循环
+        await run_blocking(session_store.append, session_id, user_message.model_dump())
+        # 调用图谱代理：同步执行，放入本 worker 的有界执行器，避免阻塞事件循环
+        result = await asyncio.get_running_loop().run_in_executor(agent_executor, run_agent, request.query)
         
         # 记录助手回复
         assistant_message = ChatMessage(
@@ -114,13 +180,15 @@ async def chat_endpoint(request: QueryRequest):
             timestamp=datetime.now().isoformat(),
             type="assistant"
         )
-        chat_sessions[session_id].append(assistant_message)
+        await run_blocking(session_store.append, session_id, assistant_message.model_dump())
           # 确保返回的数据包含工作流步骤
         response_data = {
             "final_answer": result.get("final_answer", "抱歉，我无法回答这个问题。"),
             "messages": result.get("workflow_steps", []),  # 工作流步骤
             "search_result": result.get("search_result", ""),
-            "graph_result": result.get("graph_result", "")
+            "search_snippets": result.get("search_snippets", []),
+            "graph_result": result.get("graph_result", ""),
+            "route": result.get("route", "both")
         }
         
         return QueryResponse(
@@ -137,17 +205,32 @@ async def chat_endpoint(request: QueryRequest):
             message=f"查询失败: {str(e)}",
             timestamp=datetime.now().isoformat()
         )
+    finally:
+        admission.release()
 
 @app.post("/api/chat/stream")
 async def chat_stream_endpoint(request: QueryRequest):
     """流式聊天接口，返回事件流(SSE)"""
+    # 整个流的生命周期内占用一个准入名额
+    if not admission.try_acquire():
+        raise _busy_response()
+    _apply_shared_invalidation()
+    
     async def event_generator():
         try:
+            user_message = ChatMessage(message=request.query, timestamp=datetime.now().isoformat(), type="user")
+            await run_blocking(session_store.append, request.session_id, user_message.model_dump())
             async for chunk in run_agent_stream(request.query):
                 # SSE格式: data: xxx\n\n
                 yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if chunk.get("type") == "complete":
+                    assistant_message = ChatMessage(message=chunk.get("final_answer", ""),
+                                                    timestamp=datetime.now().isoformat(), type="assistant")
+                    await run_blocking(session_store.append, request.session_id, assistant_message.model_dump())
         except Exception as e:
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)}, ensure_ascii=False)}\n\n"
+        finally:
+            admission.release()
     
     return StreamingResponse(
         event_generator(), 
@@ -162,12 +245,17 @@ async def chat_stream_endpoint(request: QueryRequest):
     )
 
 @app.get("/api/chat/history/{session_id}")
-async def get_chat_history(session_id: str):
-    """获取聊天历史"""
-    if session_id in chat_sessions:
+async def get_chat_history(session_id: str, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=0)):
+    """获取聊天历史，支持 offset/limit 分页（负数返回 422）"""
+    offset, limit = clamp_page(offset, limit)
+    messages, total = await run_blocking(session_store.history, session_id, offset=offset, limit=limit)
+    if total:
         return {
             "success": True,
-            "data": chat_sessions[session_id],
+            "data": messages,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
             "message": "获取历史成功"
         }
     else:
@@ -180,8 +268,7 @@ async def get_chat_history(session_id: str):
 @app.delete("/api/chat/history/{session_id}")
 async def clear_chat_history(session_id: str):
     """清除聊天历史"""
-    if session_id in chat_sessions:
-        del chat_sessions[session_id]
+    await run_blocking(session_store.clear, session_id)
     
     return {
         "success": True,
@@ -194,19 +281,128 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "service": "知识图谱问答系统"
+        "service": "知识图谱问答系统",
+        "load": admission.stats()
+    }
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """答案缓存、Cypher 计划缓存、请求合并与搜索服务统计"""
+    return {
+        "success": True,
+        "data": {
+            "answers": answer_cache.stats(),
+            "cypher_plans": cypher_cache.stats(),
+            "intent_router": intent_router.stats(),
+            "single_flight": {"agent": inflight_agent.stats(), "stream": inflight_streams.stats()},
+            "search": search_service_stats()
+        },
+        "message": "获取缓存统计成功"
+    }
+
+# /api/metrics 中与直方图一起输出的仪表：读取已有的统计，不在请求路径上额外计数
+registry.gauge("agent_in_flight", "本 worker 正在处理与排队的请求数", lambda: admission.in_flight)
+registry.gauge("agent_rejected_total", "本 worker 因背压拒绝的请求数", lambda: admission.rejected, kind="counter")
+registry.gauge("answer_cache_hits_total", "答案缓存命中次数", lambda: answer_cache.stats()["hits"], kind="counter")
+registry.gauge("answer_cache_misses_total", "答案缓存未命中次数", lambda: answer_cache.stats()["misses"], kind="counter")
+registry.gauge("cypher_cache_hits_total", "Cypher 计划缓存命中次数", lambda: cypher_cache.stats()["hits"], kind="counter")
+registry.gauge("search_cache_hits_total", "搜索结果缓存命中次数", lambda: search_service_stats().get("cache_hits", 0), kind="counter")
+registry.gauge("search_timeouts_total", "搜索超过截止时间的次数", lambda: search_service_stats().get("timeouts", 0), kind="counter")
+registry.gauge("intent_router_routed_total", "意图路由命中次数", lambda: intent_router.stats()["routed"], kind="counter")
+
+@app.get("/api/metrics")
+async def metrics_endpoint():
+    """Prometheus 文本格式的分阶段耗时、LLM 调用 / token 计数、首 token 延迟与缓存统计"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache():
+    """
+    清空答案缓存与 Cypher 计划缓存并重新载入实体词典（图谱重新入库后调用）。
+    本 worker 立即生效；其他 worker 通过共享的失效代数文件在处理下一个聊天请求前同步。
+    """
+    answer_cache.invalidate()
+    cypher_cache.invalidate()
+    shared_generation.bump("cache")
+    await asyncio.get_running_loop().run_in_executor(None, _reload_intent_router)
+    return {
+        "success": True,
+        "message": "缓存已清空",
+        "pid": os.getpid()
     }
 
+@app.post("/api/schema/refresh")
+async def refresh_schema_endpoint():
+    """重新内省 Neo4j Schema 并更新本地快照（图谱结构变化后调用）；其他 worker 在处理下一个聊天请求前从快照重新载入"""
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, refresh_graph_schema)
+        shared_generation.bump("schema")
+        return {
+            "success": True,
+            "message": "Schema 已刷新",
+            "pid": os.getpid()
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Schema 刷新失败: {str(e)}",
+            "pid": os.getpid()
+        }
+
+# 前端路由必须最后注册：通配路径会吞掉其后定义的 GET 接口
+# 处理前端路由，所有非API路径都返回index.html
+@app.get("/{full_path:path}")
+async def serve_frontend(full_path: str):
+    """处理前端路由"""
+    # 如果是API路径，不处理
+    if full_path.startswith("api/"):
+        raise HTTPException(status_code=404, detail="API endpoint not found")
+    
+    # 检查是否为静态资源
+    file_path = os.path.join(static_dir, full_path)
+    if os.path.isfile(file_path):
+        return FileResponse(file_path)
+    
+    # 否则返回index.html（用于SPA路由）
+    index_file = os.path.join(static_dir, "index.html")
+    if os.path.exists(index_file):
+        return FileResponse(index_file)
+    else:
+        raise HTTPException(status_code=404, detail="Frontend files not found")
+
+def parse_args():
+    """命令行参数，未指定时读取同名环境变量"""
+    parser = argparse.ArgumentParser(description="知识图谱问答系统服务")
+    parser.add_argument("--host", default=os.getenv("APP_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("APP_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("APP_WORKERS", "1")), help="worker 进程数")
+    parser.add_argument("--executor-workers", type=int, help="每个 worker 执行阻塞代理调用的线程数（AGENT_EXECUTOR_WORKERS）")
+    parser.add_argument("--max-queue", type=int, help="每个 worker 允许排队的请求数，超出返回 429（AGENT_MAX_QUEUE）")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT, help="关闭时等待进行中请求的秒数")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    print("🚀 启动知识图谱问答系统...")
-    print("🔗 服务器地址: http://localhost:8000")
-    print("📖 API 文档: http://localhost:8000/docs")
-    print("🌐 Web 界面: http://localhost:8000")
-    print("💡 如需开发模式，请运行 dev_mode.bat")
+    args = parse_args()
+    
+    # worker 进程会重新导入 app 模块，配置通过环境变量传递
+    if args.executor_workers is not None:
+        os.environ["AGENT_EXECUTOR_WORKERS"] = str(args.executor_workers)
+    if args.max_queue is not None:
+        os.environ["AGENT_MAX_QUEUE"] = str(args.max_queue)
+    if args.workers > 1 and os.getenv("SESSION_STORE", "memory") != "sqlite":
+        # 进程内会话存储无法在 worker 之间共享，多 worker 时切换为 SQLite
+        log.warning("⚠️ 多 worker 模式下会话存储自动切换为 sqlite")
+        os.environ["SESSION_STORE"] = "sqlite"
+    
+    log.info("🚀 启动知识图谱问答系统", url=f"http://localhost:{args.port}", docs=f"http://localhost:{args.port}/docs",
+             workers=args.workers)
+    log.info("💡 如需开发模式，请运行 dev_mode.bat")
     
     uvicorn.run(
         "app:app", 
-        host="0.0.0.0", 
-        port=8000,
+        host=args.host, 
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,  # 关闭时等待 SSE 流排空
         reload=False  # 生产模式关闭热重载
-    )
\ No newline at end of file
+    )
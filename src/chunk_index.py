@@ -0,0 +1,281 @@
+"""
+原文片段检索：对 split_outputs_jsonl 中切分好的方志片段建立字符 n-gram 倒排索引，BM25 排序。
+
+古汉语不做分词，直接以单字 + 相邻二字作为检索词。索引离线构建，查询时通过 mmap 读取，
+除 meta.json 外都不载入进程内存，多个 worker 共享同一份页缓存：
+- meta.json      文档数、平均长度、来源文件等元信息
+- terms.bin      按 UTF-8 字节序排好的检索词（UTF-8 拼接），偏移表 term_offsets.bin 为 uint64；查询时二分查找
+- vocab.bin      与检索词一一对应的 uint64 (倒排表起始位置, 文档频率)
+- postings.bin   倒排表，uint32 交替存放 (文档号, 词频)
+- texts.bin      片段原文（UTF-8），texts 偏移表 offsets.bin 为 uint64，每个文档两段：标题、正文
+- docs.bin       每个文档 uint32 (来源文件序号, 行号, 检索长度)
+
+构建: python chunk_index.py build ../split_outputs_jsonl/*.jsonl -o chunk_index
+查询: python chunk_index.py query chunk_index "巢湖在哪里"
+"""
+import argparse
+import array
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MAX_TITLE_CHARS = 6  # 不超过该长度且不含句读的片段视为标题（如“巢湖”“《合肥志》”），附在后续正文上而不单独建索引
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 汉字（含扩展区）、字母和数字构成检索词，其余字符作为分隔
+_TOKEN_RUN = re.compile(r"[0-9A-Za-z㐀-鿿豈-﫿\U00020000-\U0003134f]+")
+# 现代汉语提问中的虚词与问句用语，在古籍原文中不携带检索信息，查询时先去掉
+_QUERY_STOPWORDS = re.compile(r"有哪些|哪些|哪里|在哪|什么|怎么|如何|记载|提到|提及|描写|关于|请问|是否|吗|呢|的|了")
+_SENTENCE_PUNCT = re.compile(r"[。，；！？]")
+_TITLE_STRIP = re.compile(r"^[\s《》〈〉【】]+|[\s《》〈〉【】]+$")
+
+
+def tokenize(text: str) -> List[str]:
+    """字符 unigram + bigram，bigram 不跨越标点"""
+    terms: List[str] = []
+    for run in _TOKEN_RUN.findall(unicodedata.normalize("NFKC", text).lower()):
+        terms.extend(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def query_terms(query: str) -> List[str]:
+    """问题的检索词：去掉问句虚词后取 unigram + bigram"""
+    return tokenize(_QUERY_STOPWORDS.sub(" ", query))
+
+
+def _read_chunks(paths: Iterable[str]) -> Iterable[Tuple[int, int, str]]:
+    for file_no, path in enumerate(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f):
+                line = line.strip()
+                if line:
+                    yield file_no, line_no, json.loads(line).get("page_content", "")
+
+
+def build_index(paths: List[str], output_dir: str) -> Dict[str, Any]:
+    """从 jsonl 片段文件构建索引目录；不同文件中内容相同的片段只保留一份"""
+    os.makedirs(output_dir, exist_ok=True)
+    postings: Dict[str, List[int]] = {}
+    offsets = array.array("Q", [0])
+    docs = array.array("I")
+    seen = set()
+    total_length = 0
+    skipped_duplicates = 0
+
+    with open(os.path.join(output_dir, "texts.bin"), "wb") as texts:
+        position = 0
+        title = ""
+        in_title_run = False
+        current_file = -1
+        for file_no, line_no, content in _read_chunks(paths):
+            if file_no != current_file:
+                current_file, title, in_title_run = file_no, "", False
+            content = content.strip()
+            if not content:
+                continue
+            if len(content) <= MAX_TITLE_CHARS and not _SENTENCE_PUNCT.search(content):
+                # 连续的标题片段合并为一个标题，直到出现下一段正文
+                stripped = _TITLE_STRIP.sub("", content)
+                title = f"{title} {stripped}" if in_title_run else stripped
+                in_title_run = True
+                continue
+            in_title_run = False
+
+            digest = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+            if digest in seen:
+                skipped_duplicates += 1
+                continue
+            seen.add(digest)
+
+            doc_id = len(docs) // 3
+            counts = Counter(tokenize(title) + tokenize(content))
+            length = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).extend((doc_id, tf))
+            docs.extend((file_no, line_no, length))
+            total_length += length
+
+            for part in (title, content):
+                data = part.encode("utf-8")
+                texts.write(data)
+                position += len(data)
+                offsets.append(position)
+
+    # 码点顺序与 UTF-8 字节序一致，查询时可以直接比较字节做二分查找
+    terms = sorted(postings)
+    vocab = array.array("Q")
+    term_offsets = array.array("Q", [0])
+    with open(os.path.join(output_dir, "postings.bin"), "wb") as f, \
+            open(os.path.join(output_dir, "terms.bin"), "wb") as terms_file:
+        position = term_position = 0
+        for term in terms:
+            entries = array.array("I", postings[term])
+            entries.tofile(f)
+            vocab.extend((position, len(entries) // 2))
+            position += len(entries)
+            data = term.encode("utf-8")
+            terms_file.write(data)
+            term_position += len(data)
+            term_offsets.append(term_position)
+
+    with open(os.path.join(output_dir, "offsets.bin"), "wb") as f:
+        offsets.tofile(f)
+    with open(os.path.join(output_dir, "docs.bin"), "wb") as f:
+        docs.tofile(f)
+    with open(os.path.join(output_dir, "vocab.bin"), "wb") as f:
+        vocab.tofile(f)
+    with open(os.path.join(output_dir, "term_offsets.bin"), "wb") as f:
+        term_offsets.tofile(f)
+
+    doc_count = len(docs) // 3
+    meta = {
+        "version": 1,
+        "files": [os.path.basename(path) for path in paths],
+        "doc_count": doc_count,
+        "term_count": len(terms),
+        "avg_length": total_length / doc_count if doc_count else 0.0,
+        "skipped_duplicates": skipped_duplicates,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(output_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+class ChunkIndex:
+    """只读的 BM25 索引，词表、倒排表与原文都通过 mmap 按需读取"""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.doc_count: int = self.meta["doc_count"]
+        self.avg_length: float = self.meta["avg_length"] or 1.0
+        self.term_count: int = self.meta["term_count"]
+
+        self._files = []
+        self._maps = []
+        self._terms = self._map("terms.bin", None)
+        self._term_offsets = self._map("term_offsets.bin", "Q")
+        self._vocab = self._map("vocab.bin", "Q")
+        self._postings = self._map("postings.bin", "I")
+        self._offsets = self._map("offsets.bin", "Q")
+        self._docs = self._map("docs.bin", "I")
+        self._texts = self._map("texts.bin", None)
+
+    def _map(self, name: str, fmt: Optional[str]):
+        f = open(os.path.join(self.index_dir, name), "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"").cast(fmt) if fmt else b""
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mm)
+        return memoryview(mm).cast(fmt) if fmt else mm
+
+    def lookup(self, term: str) -> Optional[Tuple[int, int]]:
+        """二分查找检索词，返回 (倒排表起始位置, 文档频率)"""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = self._terms[self._term_offsets[mid]:self._term_offsets[mid + 1]]
+            if candidate == key:
+                return self._vocab[mid * 2], self._vocab[mid * 2 + 1]
+            if candidate < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def close(self):
+        for view in (self._term_offsets, self._vocab, self._postings, self._offsets, self._docs):
+            if isinstance(view, memoryview):
+                view.release()
+        for mm in self._maps:
+            mm.close()
+        for f in self._files:
+            f.close()
+        self._maps, self._files = [], []
+
+    def _text(self, slot: int) -> str:
+        return bytes(self._texts[self._offsets[slot]:self._offsets[slot + 1]]).decode("utf-8")
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        file_no, line_no = self._docs[doc_id * 3], self._docs[doc_id * 3 + 1]
+        return {
+            "doc_id": doc_id,
+            "title": self._text(doc_id * 2),
+            "text": self._text(doc_id * 2 + 1),
+            "source": f"{self.meta['files'][file_no]}:{line_no + 1}",
+        }
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """返回 BM25 得分最高的 k 个片段"""
+        scores: Dict[int, float] = {}
+        for term, qtf in Counter(query_terms(query)).items():
+            entry = self.lookup(term)
+            if entry is None:
+                continue
+            start, df = entry
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            postings = self._postings[start:start + df * 2]
+            for i in range(0, df * 2, 2):
+                doc_id, tf = postings[i], postings[i + 1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._docs[doc_id * 3 + 2] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        results = []
+        for doc_id, score in top:
+            doc = self.document(doc_id)
+            doc["score"] = round(score, 4)
+            results.append(doc)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {key: self.meta[key] for key in ("doc_count", "term_count", "built_at")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="原文片段 n-gram 索引")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="从 jsonl 片段文件构建索引")
+    build.add_argument("inputs", nargs="+", help="processed_chunks*.jsonl 文件")
+    build.add_argument("-o", "--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunk_index"))
+
+    query = sub.add_parser("query", help="查询索引")
+    query.add_argument("index_dir")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        start = time.perf_counter()
+        meta = build_index(args.inputs, args.output)
+        print(f"✅ 索引构建完成: {args.output}")
+        print(f"   片段 {meta['doc_count']} 个，检索词 {meta['term_count']} 个，"
+              f"去重 {meta['skipped_duplicates']} 个，耗时 {time.perf_counter() - start:.2f}s")
+    else:
+        index = ChunkIndex(args.index_dir)
+        start = time.perf_counter()
+        results = index.search(args.text, k=args.k)
+        print(f"🔍 {len(results)} 条结果，耗时 {(time.perf_counter() - start) * 1000:.2f}ms")
+        for doc in results:
+            print(f"[{doc['score']:.2f}] {doc['title']} | {doc['text'][:80]} ({doc['source']})")
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
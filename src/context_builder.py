@@ -0,0 +1,177 @@
+"""
+融合提示词的上下文组装：按 token 预算挑选搜索 / 图谱 / 原文片段，而不是把各分支的结果整段拼进提示词。
+
+1. 切片：各来源的结果按行、再按句子切成不超过 SNIPPET_CHARS 字的片段（也可直接传入片段列表）
+2. 打分：问题检索词（与原文索引相同的 unigram + bigram）在片段中的覆盖率，加上来源权重，
+   同一来源中靠前的片段略微优先（搜索结果本身有排序）
+3. 去重：规范化后被已选片段包含、或检索词集合的 Jaccard 相似度达到 DUPLICATE_JACCARD 的片段丢弃
+4. 预算：先保证每个有内容的来源至少有一个片段，再按分数贪心填满预算；放不下的片段截断到剩余预算
+5. 输出：每个来源内按原顺序拼接，来源没有内容时为“无”
+
+token 数默认按字符类别估算（CJK 每字 1 个，字母数字约 4 个字符 1 个，标点 1 个），与常见中文模型的分词器
+误差在一成左右，单次估算是微秒级；SYNTHESIS_TOKENIZER=tiktoken:cl100k_base 时改用 tiktoken
+（编码文件需已缓存在本地，载入失败时退回估算）。
+"""
+import math
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from chunk_index import query_terms, tokenize
+from logger import get_logger
+
+log = get_logger("context_builder")
+
+SNIPPET_CHARS = 160
+DUPLICATE_JACCARD = 0.8
+MIN_TRUNCATED_TOKENS = 32  # 剩余预算少于该值时不再截断片段塞进去
+EMPTY_SECTION = "无"
+
+# 来源 -> 权重：图谱结果是结构化事实，原文片段有出处，搜索结果噪声最多
+SOURCE_WEIGHTS = {"graph_result": 0.3, "passage_result": 0.15, "search_result": 0.0}
+
+_CJK = re.compile(r"[㐀-鿿豈-﫿\U00020000-\U0003134f]")
+_ALNUM = re.compile(r"[0-9A-Za-z]+")
+_SENTENCE_END = re.compile(r"(?<=[。！？；!?;])")
+_NON_TOKEN = re.compile(r"[^0-9A-Za-z㐀-鿿豈-﫿\U00020000-\U0003134f]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符类别估算 token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    alnum = sum(len(word) for word in _ALNUM.findall(text))
+    other = len(text) - cjk - alnum - text.count(" ") - text.count("\n")
+    return cjk + math.ceil(alnum / 4) + max(other, 0)
+
+
+def make_token_counter(spec: str = "estimate") -> Callable[[str], int]:
+    """spec 为 estimate 或 tiktoken:<编码名>"""
+    if spec.startswith("tiktoken:"):
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding(spec.split(":", 1)[1])
+            return lambda text: len(encoding.encode(text, disallowed_special=())) if text else 0
+        except Exception as e:
+            log.warning("⚠️ tiktoken 编码载入失败，改用字符估算", spec=spec, error=str(e))
+    return estimate_tokens
+
+
+def split_snippets(text: str, max_chars: int = SNIPPET_CHARS) -> List[str]:
+    """按行切分，过长的行再按句子合并成不超过 max_chars 的片段；同一结果中重复出现的句子只保留第一次"""
+    snippets: List[str] = []
+    seen = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if len(line) <= max_chars:
+            if line:
+                snippets.append(line)
+            continue
+        current = ""
+        for sentence in _SENTENCE_END.split(line):
+            key = _NON_TOKEN.sub("", sentence)
+            if key in seen:
+                continue
+            seen.add(key)
+            if current and len(current) + len(sentence) > max_chars:
+                snippets.append(current)
+                current = ""
+            current += sentence
+        if current:
+            snippets.append(current)
+    return snippets
+
+
+class ContextBuilder:
+    """按 token 预算组装融合提示词的上下文；无状态，可在多个线程 / 协程间共享"""
+
+    def __init__(self, budget: int = 1500, counter: Optional[Callable[[str], int]] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        self.budget = budget
+        self.count = counter or estimate_tokens
+        self.weights = weights or SOURCE_WEIGHTS
+
+    def _truncate(self, text: str, tokens: int, limit: int) -> str:
+        cut = max(1, len(text) * limit // tokens)
+        while cut > 1 and self.count(text[:cut]) + 1 > limit:
+            cut = cut * 9 // 10
+        return text[:cut] + "…"
+
+    def build(self, query: str, sources: Dict[str, Union[str, Sequence[str], None]]) -> Tuple[Dict[str, str], Dict[str, int]]:
+        """
+        sources: 来源名 -> 结果字符串或片段列表。
+        返回 (来源名 -> 组装后的文本, 统计)，统计含 original_tokens / tokens / snippets / duplicates / truncated。
+        """
+        terms = set(query_terms(query))
+        candidates = []  # (分数, 来源, 序号, 文本, token 数, bigram 集合, 去掉标点后的文本)
+        original_tokens = 0
+        for source, value in sources.items():
+            if not value:
+                continue
+            snippets = split_snippets(value) if isinstance(value, str) else [s.strip() for s in value if s and s.strip()]
+            weight = self.weights.get(source, 0.0)
+            for order, text in enumerate(snippets):
+                tokens = self.count(text)
+                original_tokens += tokens
+                grams = set(tokenize(text))
+                coverage = len(terms & grams) / len(terms) if terms else 0.0
+                candidates.append((coverage + weight - 0.02 * order, source, order, text, tokens, grams,
+                                   _NON_TOKEN.sub("", text)))
+        candidates.sort(key=lambda c: (-c[0], c[2]))
+
+        selected: List[tuple] = []
+        stats = {"original_tokens": original_tokens, "tokens": 0, "snippets": 0, "duplicates": 0, "truncated": 0}
+        remaining = self.budget
+
+        def is_duplicate(candidate) -> bool:
+            grams, key = candidate[5], candidate[6]
+            for chosen in selected:
+                if key in chosen[6]:
+                    return True
+                shared = len(grams & chosen[5])
+                if shared and shared / (len(grams) + len(chosen[5]) - shared) >= DUPLICATE_JACCARD:
+                    return True
+            return False
+
+        def take(candidate) -> bool:
+            nonlocal remaining
+            score, source, order, text, tokens, grams, key = candidate
+            if tokens > remaining:
+                if remaining < MIN_TRUNCATED_TOKENS:
+                    return False
+                text = self._truncate(text, tokens, remaining)
+                tokens = self.count(text)
+                stats["truncated"] += 1
+            selected.append((score, source, order, text, tokens, grams, key))
+            remaining -= tokens
+            return True
+
+        # 第一轮：每个来源分数最高的片段；第二轮：全局按分数填满预算
+        seen_sources, rest = set(), []
+        for candidate in candidates:
+            if candidate[1] in seen_sources:
+                rest.append(candidate)
+                continue
+            if is_duplicate(candidate):
+                stats["duplicates"] += 1
+                continue
+            seen_sources.add(candidate[1])
+            if not take(candidate):
+                rest.append(candidate)
+        for candidate in rest:
+            if remaining < MIN_TRUNCATED_TOKENS:
+                break
+            if is_duplicate(candidate):
+                stats["duplicates"] += 1
+                continue
+            take(candidate)
+
+        sections = {source: EMPTY_SECTION for source in sources}
+        grouped: Dict[str, List[tuple]] = {}
+        for chosen in selected:
+            grouped.setdefault(chosen[1], []).append(chosen)
+        for source, chosen in grouped.items():
+            sections[source] = "\n".join(c[3] for c in sorted(chosen, key=lambda c: c[2]))
+        stats["tokens"] = self.budget - remaining
+        stats["snippets"] = len(selected)
+        return sections, stats
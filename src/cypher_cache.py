@@ -0,0 +1,63 @@
+"""
+Cypher 计划缓存：按归一化问题缓存 GraphCypherQAChain 生成的 Cypher 语句。
+
+命中时跳过 Cypher 生成这次 LLM 调用，直接在 Neo4j 上执行缓存的语句；
+缓存语句执行结果为空（或执行出错）时记录并移除该计划，下次重新生成。
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from answer_cache import normalize_query
+
+
+class CypherPlanCache:
+    """线程安全的 LRU Cypher 计划缓存，只保存执行后有结果的语句"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._plans: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "empty_plans": 0, "evictions": 0}
+
+    def get(self, question: str) -> Optional[str]:
+        key = normalize_query(question)
+        with self._lock:
+            cypher = self._plans.get(key)
+            if cypher is None:
+                self._stats["misses"] += 1
+                return None
+            self._plans.move_to_end(key)
+            self._stats["hits"] += 1
+            return cypher
+
+    def put(self, question: str, cypher: str):
+        key = normalize_query(question)
+        with self._lock:
+            self._plans[key] = cypher
+            self._plans.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def mark_empty(self, question: str):
+        """缓存计划返回空结果或执行失败：移除该计划，使其被重新生成"""
+        key = normalize_query(question)
+        with self._lock:
+            if self._plans.pop(key, None) is not None:
+                self._stats["empty_plans"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._plans),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
@@ -1,178 +1,668 @@
-from typing import TypedDict, Annotated
-from langchain_neo4j import GraphCypherQAChain
-from langchain_community.tools import DuckDuckGoSearchRun
+from typing import TypedDict, Annotated, Any, Callable, Dict, Optional
 from langchain_core.prompts import PromptTemplate
 from langchain.schema import HumanMessage
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from adapter import llm, graph
+from adapter import get_llm, get_graph, load_schema_snapshot, refresh_schema
+from answer_cache import AnswerCache, normalize_query
+from cypher_cache import CypherPlanCache
+from intent_router import IntentRouter
+from query_classifier import QueryClassifier, ROUTE_BOTH, ROUTE_GRAPH, ROUTE_SEARCH
+from chunk_index import ChunkIndex
+from context_builder import ContextBuilder, make_token_counter
+from search_service import ChunkIndexBackend, DuckDuckGoBackend, HttpSearchBackend, SearchCache, SearchService, ToolSearchBackend, format_snippet, format_snippets
+from single_flight import SingleFlight, StreamFlight
+from logger import get_logger
+from metrics import CONTEXT_TOKENS, FIRST_TOKEN_SECONDS, NODE_SECONDS, REQUEST_SECONDS, ROUTES, STEP_SECONDS, llm_config, step_timer, timed_node
 import re
+import os
+import time
 import asyncio
+import functools
+import operator
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import AsyncGenerator
 from datetime import datetime
 
+log = get_logger("graph_agent")
+
 # 定义状态类型
 class AgentState(TypedDict):
     messages: Annotated[list, add_messages]
     query: str
     search_result: str
+    search_snippets: list  # 结构化搜索结果：[{title, text, url, source}]
     graph_result: str
+    passage_result: str
     final_answer: str
-    workflow_steps: list  # 专门用于存储工作流步骤
+    route: str  # 查询分类结果：search / graph / both
+    workflow_steps: Annotated[list, operator.add]  # 专门用于存储工作流步骤，并行分支的步骤按完成顺序合并
+
+# 初始化工具：搜索工具和图谱问答链在首次使用时才创建，导入本模块不连接任何外部服务
+_search_tool = None
+_graph_chain = None
+_tools_lock = threading.Lock()
+
+def get_search_tool():
+    """按需创建搜索工具"""
+    global _search_tool
+    if _search_tool is None:
+        with _tools_lock:
+            if _search_tool is None:
+                from langchain_community.tools import DuckDuckGoSearchRun
+                _search_tool = DuckDuckGoSearchRun()
+    return _search_tool
+
+def use_search_tool(tool):
+    """替换搜索工具（基准测试中注入本地替身时使用）"""
+    global _search_tool
+    _search_tool = tool
+
+def get_graph_chain():
+    """按需创建 GraphCypherQAChain（Schema 来自 adapter 的本地快照）"""
+    global _graph_chain
+    if _graph_chain is None:
+        with _tools_lock:
+            if _graph_chain is None:
+                from langchain_neo4j import GraphCypherQAChain
+                _graph_chain = GraphCypherQAChain.from_llm(
+                    graph=get_graph(), llm=get_llm(), verbose=True, allow_dangerous_requests=True
+                )
+    return _graph_chain
+
+def refresh_graph_schema():
+    """重新内省 Neo4j Schema、更新快照，并让图谱问答链按新 Schema 重建"""
+    global _graph_chain
+    refresh_schema()
+    with _tools_lock:
+        _graph_chain = None
+    cypher_cache.invalidate()
+
+def reload_graph_schema():
+    """其他 worker 刷新 Schema 后调用：从本地快照重新载入，并让图谱问答链按新 Schema 重建"""
+    global _graph_chain
+    load_schema_snapshot(get_graph())
+    with _tools_lock:
+        _graph_chain = None
+    cypher_cache.invalidate()
+
+# 有界线程池：只承载没有原生异步 API 的阻塞调用（DuckDuckGo 搜索、Neo4j 驱动），
+# 避免这些调用占住事件循环，同时限制线程数量
+BLOCKING_WORKERS = int(os.getenv("AGENT_BLOCKING_WORKERS", "16"))
+_blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="agent-blocking")
 
-# 初始化工具
-search_tool = DuckDuckGoSearchRun()
-graph_chain = GraphCypherQAChain.from_llm(
-    graph=graph, llm=llm, verbose=True, allow_dangerous_requests=True
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在有界线程池中执行阻塞函数并等待结果"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_blocking_executor, functools.partial(func, *args, **kwargs))
+
+# 问答结果缓存：相同（或语义相近）的问题直接复用答案，跳过搜索、Cypher 生成与融合
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))  # 0 表示只做精确匹配
+
+def _embed_query(text: str) -> list:
+    from adapter import get_embeddings
+    return get_embeddings().embed_query(text)
+
+# 两个计数各在独立的子查询中，都能直接读取计数存储；图谱为空或没有关系时也总是返回一行。
+# IngestMeta.generation 由 graph_loader 每次写入后递增，节点数与关系数不变的重新入库也能发现
+GRAPH_FINGERPRINT_QUERY = """
+CALL { MATCH (n) RETURN count(n) AS nodes }
+CALL { MATCH ()-[r]->() RETURN count(r) AS rels }
+OPTIONAL MATCH (m:IngestMeta {id: "ingestion"})
+RETURN nodes, rels, m.generation AS generation
+"""
+
+def _graph_fingerprint():
+    """图谱节点数、关系数与入库代数，重新入库后会变化"""
+    rows = get_graph().query(GRAPH_FINGERPRINT_QUERY)
+    return tuple(rows[0].values()) if rows else None
+
+def _on_graph_changed():
+    """答案缓存检测到图谱重新入库：与手动失效一样，Cypher 计划和实体词典也按新图谱重建"""
+    cypher_cache.invalidate()
+    intent_router.load(force=True)
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    embed_fn=_embed_query if ANSWER_CACHE_SIMILARITY > 0 else None,
+    similarity_threshold=ANSWER_CACHE_SIMILARITY or 0.95,
+    fingerprint_fn=_graph_fingerprint,
+    fingerprint_interval=float(os.getenv("ANSWER_CACHE_FINGERPRINT_INTERVAL", "60")),
+    on_change=_on_graph_changed,
 )
 
+# Cypher 计划缓存：Cypher 生成是图谱路径上最大的固定 LLM 开销
+cypher_cache = CypherPlanCache(max_entries=int(os.getenv("CYPHER_CACHE_SIZE", "1024")))
+
+# 意图路由：常见的湖泊/方志/诗词问题走预编译 Cypher，完全不调用 LLM
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "1") == "1"
+def _graph_query(query: str, params: Optional[dict] = None) -> list:
+    return get_graph().query(query, params or {})
+
+intent_router = IntentRouter(_graph_query)
+
+# 查询分类：只需要搜索或只需要图谱的问题跳过另一个分支（规则优先，LLM 兜底）
+QUERY_ROUTING_ENABLED = os.getenv("QUERY_ROUTING_ENABLED", "1") == "1"
+def _find_entities(question: str) -> list:
+    """分类用的图谱实体识别，复用意图路由的实体词典；词典载入失败时只靠关键词分类"""
+    if not intent_router.loaded:
+        try:
+            intent_router.load()
+        except Exception as e:
+            log.warning("⚠️ 实体词典载入失败，查询分类只使用关键词", error=str(e))
+            return []
+    return intent_router.dictionary.find(question)
+
+query_classifier = QueryClassifier(_find_entities)
+
+# 请求合并：相同问题同时到达时只执行一次流程（缓存未命中时的惊群问题）
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+inflight_agent = SingleFlight()
+inflight_streams = StreamFlight()
+
+def _is_cacheable(workflow_steps: list) -> bool:
+    """只缓存所有步骤都成功的答案，失败或降级的结果下次应重新尝试"""
+    return bool(workflow_steps) and all(step.get("status") == "completed" for step in workflow_steps)
+
+def _cache_entry(query: str, result: dict) -> dict:
+    return {
+        "query": query,
+        "final_answer": result.get("final_answer", ""),
+        "workflow_steps": list(result.get("workflow_steps", [])),
+        "search_result": result.get("search_result", ""),
+        "search_snippets": list(result.get("search_snippets", [])),
+        "graph_result": result.get("graph_result", ""),
+        "passage_result": result.get("passage_result", ""),
+        "route": result.get("route", ROUTE_BOTH),
+    }
+
+# 0. 查询分类节点
+def _classify_llm(prompt: str) -> str:
+    try:
+        return str(get_llm().invoke([HumanMessage(content=prompt)], config=llm_config("classify")).content)
+    except Exception as e:
+        log.warning("查询分类 LLM 调用失败，按 both 处理", error=str(e))
+        return ""
+
+async def _aclassify_llm(prompt: str) -> str:
+    try:
+        return str((await get_llm().ainvoke([HumanMessage(content=prompt)], config=llm_config("classify"))).content)
+    except Exception as e:
+        log.warning("查询分类 LLM 调用失败，按 both 处理", error=str(e))
+        return ""
+
+def _route_update(query: str, route: str, method: str) -> dict:
+    ROUTES.inc(route=route, method=method)
+    log.info("🧭 查询分类", query=query, route=route, method=method)
+    return {"route": route}
+
+@timed_node("classify_query")
+def classify_query(state):
+    """判断问题需要搜索、图谱还是两者都要"""
+    query = state["query"]
+    if not QUERY_ROUTING_ENABLED:
+        return {"route": ROUTE_BOTH}
+    with step_timer("classify"):
+        route, method = query_classifier.classify(query, _classify_llm)
+    return _route_update(query, route, method)
+
+@timed_node("classify_query")
+async def aclassify_query(state):
+    """查询分类节点的异步版本：首次调用载入实体词典（访问 Neo4j）放入线程池"""
+    query = state["query"]
+    if not QUERY_ROUTING_ENABLED:
+        return {"route": ROUTE_BOTH}
+    with step_timer("classify"):
+        if not intent_router.loaded:
+            await run_blocking(_find_entities, query)
+        route, method = await query_classifier.aclassify(query, _aclassify_llm)
+    return _route_update(query, route, method)
+
+def route_branches(state) -> list:
+    """条件边：按分类结果选择要执行的分支，原文检索是本地查询，总是执行"""
+    route = state.get("route") or ROUTE_BOTH
+    branches = ["retrieve_passages"]
+    if route != ROUTE_GRAPH:
+        branches.append("search_engine")
+    if route != ROUTE_SEARCH:
+        branches.append("query_knowledge_graph")
+    return branches
+
 # 1. 搜索引擎节点
+# 搜索子系统：按 SEARCH_BACKENDS 的顺序对冲多个后端，超过 SEARCH_DEADLINE 秒放弃，结果按问题持久化缓存
+SEARCH_BACKENDS = os.getenv("SEARCH_BACKENDS", "duckduckgo")  # 逗号分隔：duckduckgo / chunks / http
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "8"))
+SEARCH_HEDGE_DELAY = float(os.getenv("SEARCH_HEDGE_DELAY", "1.0"))  # 0 表示所有后端同时发出
+SEARCH_BACKEND_TIMEOUT = float(os.getenv("SEARCH_BACKEND_TIMEOUT", str(SEARCH_DEADLINE)))  # 单次后端调用的超时
+SEARCH_MAX_IN_FLIGHT = int(os.getenv("SEARCH_MAX_IN_FLIGHT", "8"))  # 每个后端的在途调用上限，已满时跳过该后端
+SEARCH_HTTP_URL = os.getenv("SEARCH_HTTP_URL", "")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "86400"))  # 0 表示不缓存
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_cache.db"))
+_search_service = None
+
+def _make_search_backend(name: str):
+    if name == "duckduckgo":
+        if _search_tool is not None:
+            # 通过 use_search_tool 注入的工具（本地替身等）
+            return ToolSearchBackend(get_search_tool, timeout=SEARCH_BACKEND_TIMEOUT)
+        return DuckDuckGoBackend(timeout=SEARCH_BACKEND_TIMEOUT)
+    if name == "chunks":
+        return ChunkIndexBackend(get_chunk_index, k=PASSAGE_TOP_K)
+    if name == "http":
+        if not SEARCH_HTTP_URL:
+            raise ValueError("SEARCH_BACKENDS 包含 http 时需要设置 SEARCH_HTTP_URL")
+        return HttpSearchBackend(SEARCH_HTTP_URL, timeout=SEARCH_BACKEND_TIMEOUT)
+    raise ValueError(f"未知的搜索后端: {name}")
+
+def get_search_service() -> SearchService:
+    """按需创建搜索服务（首次搜索时才打开缓存文件）"""
+    global _search_service
+    if _search_service is None:
+        with _tools_lock:
+            if _search_service is None:
+                cache = SearchCache(SEARCH_CACHE_PATH, ttl_seconds=SEARCH_CACHE_TTL) if SEARCH_CACHE_TTL > 0 else None
+                _search_service = SearchService(
+                    [_make_search_backend(name.strip()) for name in SEARCH_BACKENDS.split(",") if name.strip()],
+                    cache=cache, deadline=SEARCH_DEADLINE, hedge_delay=SEARCH_HEDGE_DELAY,
+                    max_in_flight=SEARCH_MAX_IN_FLIGHT,
+                )
+    return _search_service
+
+def search_service_stats() -> dict:
+    """搜索服务统计；配置有误（如 http 后端缺少 SEARCH_HTTP_URL）时报告 unconfigured 而不是抛出异常"""
+    try:
+        return {"status": "ok", **get_search_service().stats()}
+    except ValueError as e:
+        return {"status": "unconfigured", "error": str(e)}
+
+def use_search_service(service: Optional[SearchService]):
+    """替换搜索服务；传入 None 时下次搜索按当前配置重新创建"""
+    global _search_service
+    _search_service = service
+
+def _search_update(search_query: str, snippets: Optional[list] = None, error: Optional[Exception] = None) -> dict:
+    """构建搜索节点的状态更新（同步/异步节点共用）"""
+    if error is not None:
+        # 添加错误步骤信息
+        step_message = {
+            "step": 1,
+            "name": "搜索引擎查询",
+            "status": "error",
+            "description": f"搜索失败: {error}",
+            "result": "",
+            "icon": "❌"
+        }
+        return {
+            "search_result": f"搜索失败: {error}",
+            "workflow_steps": [step_message]
+        }
+
+    search_result = format_snippets(snippets)
+    # 添加步骤信息到工作流步骤中；搜索无结果也是正常完成的步骤
+    step_message = {
+        "step": 1,
+        "name": "搜索引擎查询",
+        "status": "completed",
+        "description": f"正在搜索: {search_query}" if snippets else f"未搜索到结果: {search_query}",
+        "result": search_result[:300] + "..." if len(search_result) > 300 else search_result,
+        "icon": "🔍"
+    }
+    return {
+        "search_result": search_result,
+        "search_snippets": snippets,
+        "workflow_steps": [step_message]  # 由 reducer 追加，支持并行分支同时写入
+    }
+
+@timed_node("search_engine")
 def search_engine(state):  # 移除类型注解，兼容 dict
     """使用搜索引擎获取背景信息"""
     query = state["query"]
     
     # 构建搜索查询
     search_query = f"{query}"
-    print(f"🔍 步骤1: 搜索引擎查询 - {search_query}")
+    log.info("🔍 步骤1: 搜索引擎查询", query=search_query)
     
     try:
-        search_result = search_tool.run(search_query)
-        print(f"✅ 搜索完成: {search_result[:200]}...")
-          # 添加步骤信息到工作流步骤中
-        step_message = {
-            "step": 1,
-            "name": "搜索引擎查询",
-            "status": "completed",
-            "description": f"正在搜索: {search_query}",
-            "result": search_result[:300] + "..." if len(search_result) > 300 else search_result,
-            "icon": "🔍"
-        }
+        with step_timer("search"):
+            snippets = get_search_service().search(search_query)
+        log.info("✅ 搜索完成", snippets=len(snippets))
+        return _search_update(search_query, snippets)
         
-        workflow_steps = state.get("workflow_steps", [])
-        workflow_steps.append(step_message)
-        
-        return {
-            "search_result": search_result,
-            "workflow_steps": workflow_steps
-        }
+    except Exception as e:
+        log.error("❌ 搜索错误", error=str(e))
+        return _search_update(search_query, error=e)
+
+@timed_node("search_engine")
+async def asearch_engine(state):
+    """搜索引擎节点的异步版本：各后端在搜索服务自己的线程池中执行，事件循环直接等待其结果"""
+    query = state["query"]
+    search_query = f"{query}"
+    log.info("🔍 步骤1: 搜索引擎查询", query=search_query)
+    
+    try:
+        with step_timer("search"):
+            snippets = await get_search_service().asearch(search_query)
+        log.info("✅ 搜索完成", snippets=len(snippets))
+        return _search_update(search_query, snippets)
         
     except Exception as e:
-        print(f"❌ 搜索错误: {e}")
-          # 添加错误步骤信息
+        log.error("❌ 搜索错误", error=str(e))
+        return _search_update(search_query, error=e)
+
+# 2. 知识图谱问答节点
+def _graph_answer_is_weak(graph_result: str) -> bool:
+    """图谱结果为空或不满意时需要优化查询"""
+    return not graph_result or "I don't know" in graph_result or len(graph_result.strip()) < 10
+
+def _graph_update(query: str, graph_result: str = "", error: Optional[Exception] = None) -> dict:
+    """构建图谱节点的状态更新（同步/异步节点共用）"""
+    if error is not None:
         step_message = {
-            "step": 1,
-            "name": "搜索引擎查询",
+            "step": 2,
+            "name": "知识图谱查询",
             "status": "error",
-            "description": f"搜索失败: {e}",
+            "description": f"图谱查询失败: {error}",
             "result": "",
             "icon": "❌"
         }
-        
-        workflow_steps = state.get("workflow_steps", [])
-        workflow_steps.append(step_message)
-        
         return {
-            "search_result": f"搜索失败: {e}",
-            "workflow_steps": workflow_steps
+            "graph_result": f"查询失败: {error}",
+            "workflow_steps": [step_message]
         }
 
-# 2. 知识图谱问答节点
+    # 添加步骤信息
+    step_message = {
+        "step": 2,
+        "name": "知识图谱查询",
+        "status": "completed",
+        "description": f"查询知识图谱: {query}",
+        "result": graph_result,
+        "icon": "🧠"
+    }
+    return {
+        "graph_result": graph_result,
+        "workflow_steps": [step_message]
+    }
+
+def _cypher_generation_args(chain, question: str) -> dict:
+    return {"question": question, "schema": chain.graph_schema, "query": question}
+
+def _clean_cypher(generated: str) -> str:
+    """去掉反引号包裹并做关系方向校正；校正器认为 Cypher 不合法时返回空串"""
+    from langchain_neo4j.chains.graph_qa.cypher import extract_cypher
+    chain = get_graph_chain()
+    generated_cypher = extract_cypher(generated)
+    if chain.cypher_query_corrector:
+        generated_cypher = chain.cypher_query_corrector(generated_cypher)
+    return generated_cypher
+
+def _run_cached_plan(question: str) -> tuple:
+    """执行缓存的 Cypher 计划；返回 (cypher, context)，未命中或结果为空时 cypher 为 None"""
+    cypher = cypher_cache.get(question)
+    if cypher is None:
+        return None, []
+    try:
+        with step_timer("neo4j_query"):
+            context = get_graph().query(cypher)[: get_graph_chain().top_k]
+    except Exception as e:
+        log.warning("⚠️ 缓存的 Cypher 执行失败，将重新生成", cypher=cypher, error=str(e))
+        context = []
+    if not context:
+        cypher_cache.mark_empty(question)
+        return None, []
+    log.info("⚡ 命中 Cypher 计划缓存", cypher=cypher)
+    return cypher, context
+
+def invoke_graph_chain(question: str) -> dict:
+    """
+    GraphCypherQAChain 的同步执行：先查 Cypher 计划缓存，命中则跳过 Cypher 生成，
+    否则生成 Cypher 并在有结果时写入缓存。
+    """
+    chain = get_graph_chain()
+    cypher, context = _run_cached_plan(question)
+    if cypher is None:
+        with step_timer("cypher_generation"):
+            generated = chain.cypher_generation_chain.invoke(_cypher_generation_args(chain, question),
+                                                             config=llm_config("cypher_generation"))
+        cypher = _clean_cypher(generated)
+        log.info("Generated Cypher", cypher=cypher)
+        context = []
+        if cypher:
+            with step_timer("neo4j_query"):
+                context = get_graph().query(cypher)[: chain.top_k]
+        if context:
+            cypher_cache.put(question, cypher)
+    
+    with step_timer("graph_qa"):
+        result = chain.qa_chain.invoke({"question": question, "context": context}, config=llm_config("graph_qa"))
+    return {"result": result, "cypher": cypher, "context": context}
+
+@timed_node("query_knowledge_graph")
 def query_knowledge_graph(state):  # 移除类型注解，兼容 dict
     """基于知识图谱回答问题"""
     query = state["query"]
-    search_result = state.get("search_result", "")
     
-    print(f"🧠 步骤2: 知识图谱查询")
+    log.info("🧠 步骤2: 知识图谱查询", query=query)
     
     try:
-        # 使用GraphCypherQAChain查询
-        result = graph_chain.invoke({"query": query})
+        # 快速路径：命中常见意图时直接执行预编译 Cypher
+        fast = None
+        if INTENT_ROUTER_ENABLED:
+            with step_timer("intent_router"):
+                fast = intent_router.answer(query)
+        if fast is not None:
+            log.info("✅ 图谱查询完成", result=fast["result"], intent=fast["intent"])
+            return _graph_update(query, fast["result"])
+        
+        # 使用GraphCypherQAChain查询（带 Cypher 计划缓存）
+        result = invoke_graph_chain(query)
         graph_result = result["result"]
         
-        print(f"✅ 图谱查询完成: {graph_result}")
+        log.info("✅ 图谱查询完成", result=graph_result)
         
         # 如果结果为空或不满意，尝试优化查询
-        if not graph_result or "I don't know" in graph_result or len(graph_result.strip()) < 10:
-            print(f"🔄 步骤2.1: 优化查询语句")
+        if _graph_answer_is_weak(graph_result):
+            log.info("🔄 步骤2.1: 优化查询语句")
             # 提取关键词重新构建查询
             optimized_query = optimize_graph_query(query)
-            print(f"优化后查询: {optimized_query}")
+            log.info("优化后查询", query=optimized_query)
             
-            result = graph_chain.invoke({"query": optimized_query})
+            result = invoke_graph_chain(optimized_query)
             graph_result = result["result"]
+            _remember_optimized_plan(query, result)
         
-        # 添加步骤信息
-        step_message = {
-            "step": 2,
-            "name": "知识图谱查询",
-            "status": "completed",
-            "description": f"查询知识图谱: {query}",
-            "result": graph_result,
-            "icon": "🧠"
-        }
+        return _graph_update(query, graph_result)
         
-        workflow_steps = state.get("workflow_steps", [])
-        workflow_steps.append(step_message)
+    except Exception as e:
+        log.error("❌ 图谱查询错误", error=str(e))
+        return _graph_update(query, error=e)
+
+def _remember_optimized_plan(query: str, result: dict):
+    """优化后的查询拿到了结果：把它的计划也挂到原问题上，下次原问题直接命中，省去优化这一轮 LLM 调用"""
+    if result["context"] and not _graph_answer_is_weak(result["result"]):
+        cypher_cache.put(query, result["cypher"])
+
+async def ainvoke_graph_chain(question: str) -> dict:
+    """
+    GraphCypherQAChain 的异步执行：Cypher 生成与答案生成走 LLM 原生 ainvoke，
+    只有 Neo4j 查询放入有界线程池（链自带的 ainvoke 会把整条链丢进默认线程池）。
+    """
+    # 首次调用会连接 Neo4j 并构建链，放入线程池避免阻塞事件循环
+    chain = await run_blocking(get_graph_chain)
+    cypher, context = await run_blocking(_run_cached_plan, question)
+    if cypher is None:
+        with step_timer("cypher_generation"):
+            generated = await chain.cypher_generation_chain.ainvoke(_cypher_generation_args(chain, question),
+                                                                    config=llm_config("cypher_generation"))
+        cypher = _clean_cypher(generated)
+        log.info("Generated Cypher", cypher=cypher)
+        if cypher:
+            with step_timer("neo4j_query"):
+                context = (await run_blocking(get_graph().query, cypher))[: chain.top_k]
+        if context:
+            cypher_cache.put(question, cypher)
+    
+    with step_timer("graph_qa"):
+        result = await chain.qa_chain.ainvoke({"question": question, "context": context}, config=llm_config("graph_qa"))
+    return {"result": result, "cypher": cypher, "context": context}
+
+@timed_node("query_knowledge_graph")
+async def aquery_knowledge_graph(state):
+    """知识图谱节点的异步版本"""
+    query = state["query"]
+    
+    log.info("🧠 步骤2: 知识图谱查询", query=query)
+    
+    try:
+        fast = None
+        if INTENT_ROUTER_ENABLED:
+            with step_timer("intent_router"):
+                fast = await run_blocking(intent_router.answer, query)
+        if fast is not None:
+            log.info("✅ 图谱查询完成", result=fast["result"], intent=fast["intent"])
+            return _graph_update(query, fast["result"])
         
-        return {
-            "graph_result": graph_result,
-            "workflow_steps": workflow_steps
-        }
+        result = await ainvoke_graph_chain(query)
+        graph_result = result["result"]
         
-    except Exception as e:
-        print(f"❌ 图谱查询错误: {e}")
+        log.info("✅ 图谱查询完成", result=graph_result)
+        
+        if _graph_answer_is_weak(graph_result):
+            log.info("🔄 步骤2.1: 优化查询语句")
+            optimized_query = await aoptimize_graph_query(query)
+            log.info("优化后查询", query=optimized_query)
+            
+            result = await ainvoke_graph_chain(optimized_query)
+            graph_result = result["result"]
+            _remember_optimized_plan(query, result)
         
+        return _graph_update(query, graph_result)
+        
+    except Exception as e:
+        log.error("❌ 图谱查询错误", error=str(e))
+        return _graph_update(query, error=e)
+
+# 3. 原文检索节点：从离线构建的方志片段索引中取出最相关的原文，毫秒级、不依赖外部服务
+CHUNK_INDEX_PATH = os.getenv("CHUNK_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunk_index"))
+PASSAGE_TOP_K = int(os.getenv("PASSAGE_TOP_K", "5"))
+_chunk_index = None
+_chunk_index_missing = False
+
+def get_chunk_index() -> Optional[ChunkIndex]:
+    """按需打开原文索引；索引未构建时返回 None，原文检索分支随之跳过"""
+    global _chunk_index, _chunk_index_missing
+    if _chunk_index is None and not _chunk_index_missing:
+        with _tools_lock:
+            if _chunk_index is None and not _chunk_index_missing:
+                if os.path.exists(os.path.join(CHUNK_INDEX_PATH, "meta.json")):
+                    _chunk_index = ChunkIndex(CHUNK_INDEX_PATH)
+                    log.info("✅ 原文索引已载入", docs=_chunk_index.doc_count)
+                else:
+                    _chunk_index_missing = True
+                    log.warning("⚠️ 未找到原文索引，跳过原文检索（运行 chunk_index.py build 构建）", path=CHUNK_INDEX_PATH)
+    return _chunk_index
+
+def _format_passages(passages: list) -> str:
+    return "\n".join(
+        f"[{i}] {doc['title']}：{doc['text']}（{doc['source']}）" if doc["title"] else f"[{i}] {doc['text']}（{doc['source']}）"
+        for i, doc in enumerate(passages, 1)
+    )
+
+@timed_node("retrieve_passages")
+def retrieve_passages(state):
+    """检索与问题最相关的原文片段"""
+    query = state["query"]
+    index = get_chunk_index()
+    if index is None:
+        return {"passage_result": ""}
+    
+    log.info("📜 步骤4: 原文检索", query=query)
+    try:
+        passages = index.search(query, k=PASSAGE_TOP_K)
+        passage_result = _format_passages(passages)
+        log.info("✅ 原文检索完成", passages=len(passages))
         step_message = {
-            "step": 2,
-            "name": "知识图谱查询",
+            "step": 4,
+            "name": "原文检索",
+            "status": "completed",
+            "description": f"检索到 {len(passages)} 个相关原文片段",
+            "result": passage_result[:300] + "..." if len(passage_result) > 300 else passage_result,
+            "icon": "📜"
+        }
+    except Exception as e:
+        log.error("❌ 原文检索错误", error=str(e))
+        passage_result = ""
+        step_message = {
+            "step": 4,
+            "name": "原文检索",
             "status": "error",
-            "description": f"图谱查询失败: {e}",
+            "description": f"原文检索失败: {e}",
             "result": "",
             "icon": "❌"
         }
-        
-        workflow_steps = state.get("workflow_steps", [])
-        workflow_steps.append(step_message)
-        
-        return {
-            "graph_result": f"查询失败: {e}",
-            "workflow_steps": workflow_steps
-        }
+    return {
+        "passage_result": passage_result,
+        "workflow_steps": [step_message]
+    }
+
+async def aretrieve_passages(state):
+    """原文检索节点的异步版本：索引查询是纯 CPU 计算且耗时很短，直接在事件循环中执行"""
+    return retrieve_passages(state)
+
+# 4. 结果融合
+# 融合提示词模板只构建一次；各来源的结果先按 token 预算组装（打分、去重、截断）再填入
+SYNTHESIS_PROMPT = PromptTemplate.from_template("""请基于以下信息，为用户问题提供一个全面、准确的答案：
+
+用户问题: {query}
+
+搜索引擎结果:
+{search_result}
+
+知识图谱结果:
+{graph_result}
+
+方志原文片段:
+{passage_result}
+
+请综合分析上述信息，提供一个简洁明确的答案。如果各来源的信息有冲突，请指出并说明。
+如果某个来源没有相关信息，请只使用其他来源的信息；引用原文片段时请注明出处。""")
+
+SYNTHESIS_TOKEN_BUDGET = int(os.getenv("SYNTHESIS_TOKEN_BUDGET", "1500"))  # 上下文部分的预算，不含模板与问题
+context_builder = ContextBuilder(budget=SYNTHESIS_TOKEN_BUDGET,
+                                 counter=make_token_counter(os.getenv("SYNTHESIS_TOKENIZER", "estimate")))
 
-# 3. 结果融合节点（同步）
+def build_synthesis_prompt(state) -> str:
+    """同步与流式融合共用：按预算组装上下文并填入缓存的模板"""
+    query = state["query"]
+    snippets = state.get("search_snippets")
+    sections, stats = context_builder.build(query, {
+        # 有结构化结果时逐条作为片段参与打分，保持搜索后端给出的排序
+        "search_result": [format_snippet(s) for s in snippets] if snippets else state.get("search_result", ""),
+        "graph_result": state.get("graph_result", ""),
+        "passage_result": state.get("passage_result", ""),
+    })
+    CONTEXT_TOKENS.observe(stats["original_tokens"], kind="raw")
+    CONTEXT_TOKENS.observe(stats["tokens"], kind="budgeted")
+    log.debug("融合上下文", **stats)
+    return SYNTHESIS_PROMPT.format(query=query, **sections)
+
+@timed_node("synthesize_answer")
 def synthesize_answer(state: AgentState):
     """融合搜索结果和图谱结果，生成最终答案"""
-    query = state["query"]
     search_result = state.get("search_result", "")
     graph_result = state.get("graph_result", "")
     
-    print(f"🔄 步骤3: 结果融合与生成答案")
-      # 使用LLM融合两个结果
-    synthesis_prompt = PromptTemplate.from_template("""
-        请基于以下信息，为用户问题提供一个全面、准确的答案：
-
-        用户问题: {query}
-
-        搜索引擎结果:
-        {search_result}
-
-        知识图谱结果:
-        {graph_result}
-
-        请综合分析上述信息，提供一个简洁明确的答案。如果两个来源的信息有冲突，请指出并说明。
-        如果某个来源没有相关信息，请只使用另一个来源的信息。
-        """)
+    log.info("🔄 步骤3: 结果融合与生成答案")
     
     try:
-        formatted_prompt = synthesis_prompt.format(
-            query=query,
-            search_result=search_result,
-            graph_result=graph_result
-        )
-        response = llm.invoke([HumanMessage(content=formatted_prompt)])
+        formatted_prompt = build_synthesis_prompt(state)
+        with step_timer("synthesis_llm"):
+            response = get_llm().invoke([HumanMessage(content=formatted_prompt)], config=llm_config("synthesis"))
         
         final_answer = response.content
-        print(f"✅ 融合完成: {final_answer}")
+        log.info("✅ 融合完成", answer=final_answer)
           # 添加步骤信息
         step_message = {
             "step": 3,
@@ -183,16 +673,13 @@ def synthesize_answer(state: AgentState):
             "icon": "🔄"
         }
         
-        workflow_steps = state.get("workflow_steps", [])
-        workflow_steps.append(step_message)
-        
         return {
             "final_answer": final_answer,
-            "workflow_steps": workflow_steps
+            "workflow_steps": [step_message]
         }
         
     except Exception as e:
-        print(f"❌ 结果融合错误: {e}")
+        log.error("❌ 结果融合错误", error=str(e))
         # 降级处理：如果融合失败，优先使用图谱结果，其次是搜索结果
         fallback_answer = ""
         if graph_result and "查询失败" not in graph_result:
@@ -210,12 +697,9 @@ def synthesize_answer(state: AgentState):
             "icon": "⚠️"
         }
         
-        workflow_steps = state.get("workflow_steps", [])
-        workflow_steps.append(step_message)
-        
         return {
             "final_answer": fallback_answer,
-            "workflow_steps": workflow_steps
+            "workflow_steps": [step_message]
         }
 
 
@@ -226,37 +710,21 @@ async def stream_synthesis(state: AgentState) -> AsyncGenerator[dict, None]:
     流式处理的辅助函数：融合结果并生成最终答案。
     它是一个异步生成器，不作为图节点，专门由 run_agent_stream 调用。
     """
-    query = state["query"]
     search_result = state.get("search_result", "")
     graph_result = state.get("graph_result", "")
 
-    synthesis_prompt = PromptTemplate.from_template("""
-        请基于以下信息，为用户问题提供一个全面、准确的答案：
-
-        用户问题: {query}
-
-        搜索引擎结果:
-        {search_result}
-
-        知识图谱结果:
-        {graph_result}
-
-        请综合分析上述信息，提供一个简洁明确的答案。如果两个来源的信息有冲突，请指出并说明。
-        如果某个来源没有相关信息，请只使用另一个来源的信息。
-        """)
-    
-    formatted_prompt = synthesis_prompt.format(
-        query=query,
-        search_result=search_result,
-        graph_result=graph_result
-    )
+    formatted_prompt = build_synthesis_prompt(state)
 
     accumulated_answer = ""
+    start = time.perf_counter()
+    status = "completed"
     try:
         # 使用 astream 实现流式响应
-        async for chunk in llm.astream([HumanMessage(content=formatted_prompt)]):
+        async for chunk in get_llm().astream([HumanMessage(content=formatted_prompt)], config=llm_config("synthesis")):
             content = chunk.content
             if isinstance(content, str) and content:
+                if not accumulated_answer:
+                    FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, scope="synthesis")
                 accumulated_answer += content
                 yield {
                     "type": "answer_chunk",
@@ -264,6 +732,7 @@ async def stream_synthesis(state: AgentState) -> AsyncGenerator[dict, None]:
                     "is_final": False
                 }
         
+        STEP_SECONDS.observe(time.perf_counter() - start, step="synthesis_llm")
         # 标记流结束
         yield { "type": "answer_chunk", "content": "", "is_final": True }
 
@@ -288,7 +757,8 @@ async def stream_synthesis(state: AgentState) -> AsyncGenerator[dict, None]:
         }
 
     except Exception as e:
-        print(f"❌ 流式结果融合错误: {e}")
+        log.error("❌ 流式结果融合错误", error=str(e))
+        status = "fallback"
         fallback_answer = graph_result or search_result or "抱歉，无法获取相关信息，请稍后重试。"
         
         yield { "type": "answer_chunk", "content": fallback_answer, "is_final": True }
@@ -309,11 +779,11 @@ async def stream_synthesis(state: AgentState) -> AsyncGenerator[dict, None]:
             "final_answer": fallback_answer,
             "workflow_steps": workflow_steps
         }
+    finally:
+        NODE_SECONDS.observe(time.perf_counter() - start, node="stream_synthesis", status=status)
 
 
-def optimize_graph_query(original_query: str) -> str:
-    """使用few-shot示例优化图谱查询语句"""    
-    optimization_prompt = PromptTemplate.from_template("""
+OPTIMIZATION_PROMPT = PromptTemplate.from_template("""
         你是一个知识图谱查询优化专家。请根据以下示例，将用户的原始查询转换为更适合知识图谱查询的格式。
         示例：
         原始查询：有哪些诗词提到了湖泊？
@@ -326,114 +796,341 @@ def optimize_graph_query(original_query: str) -> str:
         原始查询：{original_query}
         优化查询：
         """)
+
+def _parse_optimized_query(response, original_query: str) -> str:
+    """从LLM响应中取出优化后的查询，结果过短时退回原查询"""
+    # 正确获取响应内容
+    optimized_query = ""
+    if hasattr(response, 'content') and response.content:
+        optimized_query = str(response.content).strip()
+    else:
+        optimized_query = str(response).strip()
     
+    # 如果优化结果为空或太短，返回原查询
+    if len(optimized_query) < 3:
+        return original_query
+        
+    return optimized_query
+
+def optimize_graph_query(original_query: str) -> str:
+    """使用few-shot示例优化图谱查询语句"""    
     try:
-        formatted_prompt = optimization_prompt.format(original_query=original_query)
-        response = llm.invoke([HumanMessage(content=formatted_prompt)])
-          # 正确获取响应内容
-        optimized_query = ""
-        if hasattr(response, 'content') and response.content:
-            optimized_query = str(response.content).strip()
-        else:
-            optimized_query = str(response).strip()
-        
-        # 如果优化结果为空或太短，返回原查询
-        if len(optimized_query) < 3:
-            return original_query
-            
-        return optimized_query
+        formatted_prompt = OPTIMIZATION_PROMPT.format(original_query=original_query)
+        with step_timer("optimize_query"):
+            response = get_llm().invoke([HumanMessage(content=formatted_prompt)], config=llm_config("optimize_query"))
+        return _parse_optimized_query(response, original_query)
         
     except Exception as e:
-        print(f"查询优化错误: {e}")
+        log.warning("查询优化错误", error=str(e))
         return original_query
 
-# 4. 构建工作流图
-def create_workflow():
-    """创建LangGraph工作流"""
+async def aoptimize_graph_query(original_query: str) -> str:
+    """optimize_graph_query 的异步版本"""
+    try:
+        formatted_prompt = OPTIMIZATION_PROMPT.format(original_query=original_query)
+        with step_timer("optimize_query"):
+            response = await get_llm().ainvoke([HumanMessage(content=formatted_prompt)], config=llm_config("optimize_query"))
+        return _parse_optimized_query(response, original_query)
+        
+    except Exception as e:
+        log.warning("查询优化错误", error=str(e))
+        return original_query
+
+# 5. 构建工作流图
+def build_workflow() -> StateGraph:
+    """构建未编译的LangGraph工作流（默认变体）"""
     workflow = StateGraph(AgentState)
     
     # 添加节点
+    workflow.add_node("classify_query", classify_query)
     workflow.add_node("search_engine", search_engine)
     workflow.add_node("query_knowledge_graph", query_knowledge_graph)
+    workflow.add_node("retrieve_passages", retrieve_passages)
     workflow.add_node("synthesize_answer", synthesize_answer)
     
-    # 设置入口点
-    workflow.set_entry_point("search_engine")
+    # 先分类，再按分类结果扇出：选中的分支互不依赖，并行执行
+    workflow.add_edge(START, "classify_query")
+    workflow.add_conditional_edges("classify_query", route_branches,
+                                   ["search_engine", "query_knowledge_graph", "retrieve_passages"])
     
-    # 添加顺序边：搜索 -> 图谱查询 -> 结果融合 -> 结束
-    workflow.add_edge("search_engine", "query_knowledge_graph")
-    workflow.add_edge("query_knowledge_graph", "synthesize_answer")
+    # 扇入：被选中的分支在同一步中并行执行，全部完成后进入结果融合 -> 结束
+    # （不能用 add_edge([...], ...) 等待固定的分支集合，被跳过的分支永远不会完成）
+    for branch in ("search_engine", "query_knowledge_graph", "retrieve_passages"):
+        workflow.add_edge(branch, "synthesize_answer")
     workflow.add_edge("synthesize_answer", END)
     
-    return workflow.compile()
+    return workflow
+
+def create_workflow():
+    """创建LangGraph工作流（每次调用都会重新构建并编译，请求路径请使用 get_workflow）"""
+    return build_workflow().compile()
+
+# 编译后工作流注册表：每个变体在进程内只编译一次，之后所有请求复用
+DEFAULT_WORKFLOW = "default"
+_workflow_builders: Dict[str, Callable[[], StateGraph]] = {DEFAULT_WORKFLOW: build_workflow}
+_compiled_workflows: Dict[str, Any] = {}
+_active_workflow = DEFAULT_WORKFLOW
+_workflow_lock = threading.Lock()
+
+def register_workflow(name: str, builder: Callable[[], StateGraph], activate: bool = False):
+    """注册一个工作流变体并立即编译；同名变体会被原子替换（热切换）"""
+    global _active_workflow
+    compiled = builder().compile()  # 在锁外编译，避免阻塞正在取用工作流的请求
+    with _workflow_lock:
+        _workflow_builders[name] = builder
+        _compiled_workflows[name] = compiled
+        if activate:
+            _active_workflow = name
+    return compiled
+
+def set_active_workflow(name: str):
+    """切换默认使用的工作流变体"""
+    global _active_workflow
+    if name not in _workflow_builders:
+        raise KeyError(f"未注册的工作流: {name}")
+    get_workflow(name)
+    with _workflow_lock:
+        _active_workflow = name
+
+def get_workflow(name: Optional[str] = None):
+    """获取已编译的工作流；首次访问时编译并缓存"""
+    name = name or _active_workflow
+    compiled = _compiled_workflows.get(name)
+    if compiled is not None:
+        return compiled
+    with _workflow_lock:
+        compiled = _compiled_workflows.get(name)
+        if compiled is None:
+            if name not in _workflow_builders:
+                raise KeyError(f"未注册的工作流: {name}")
+            compiled = _workflow_builders[name]().compile()
+            _compiled_workflows[name] = compiled
+        return compiled
+
+def warmup_workflows():
+    """预编译所有已注册的工作流变体，供服务启动时调用"""
+    for name in list(_workflow_builders):
+        get_workflow(name)
+    log.info("✅ 工作流已预编译", workflows=", ".join(_compiled_workflows))
+
+def warmup_agent():
+    """预热：编译工作流、连接 Neo4j 并构建图谱问答链、载入实体词典与原文索引、校验搜索配置；任一步失败都只记录，首次查询时会重试"""
+    warmup_workflows()
+    for name, warm in (("图谱问答链", get_graph_chain), ("实体词典", intent_router.load), ("原文索引", get_chunk_index),
+                       ("搜索服务", get_search_service)):
+        try:
+            warm()
+        except Exception as e:
+            log.warning(f"⚠️ {name}预热失败，将在首次查询时重试", error=str(e))
 
 # 主执行函数
-def run_agent(query: str):
+def run_agent(query: str, workflow: Optional[str] = None, use_cache: bool = True):
     """运行智能问答代理"""
-    app = create_workflow()
+    start = time.perf_counter()
+    if use_cache:
+        cached = answer_cache.get(query)
+        if cached is not None:
+            log.info("⚡ 命中答案缓存", query=query)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, mode="sync", cached="true")
+            return dict(cached)
+    
+    try:
+        if SINGLE_FLIGHT_ENABLED:
+            # 共享同一个结果对象，返回浅拷贝避免调用方互相影响
+            key = (normalize_query(query), workflow)
+            return dict(inflight_agent.do(key, lambda: _execute_agent(query, workflow, use_cache)))
+        return _execute_agent(query, workflow, use_cache)
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, mode="sync", cached="false")
+
+def _execute_agent(query: str, workflow: Optional[str], use_cache: bool):
+    app = get_workflow(workflow)
     
     initial_state = {
         "messages": [],
         "query": query,
         "search_result": "",
+        "search_snippets": [],
         "graph_result": "",
+        "passage_result": "",
         "final_answer": "",
+        "route": "",
         "workflow_steps": []
     }
     
-    print(f"\n=== 开始处理查询: {query} ===")
+    log.info("=== 开始处理查询 ===", query=query)
     
     # 运行工作流
     result = app.invoke(initial_state)
     
-    print(f"\n=== 最终答案 ===")
-    print(result["final_answer"])
+    log.info("=== 最终答案 ===", answer=result["final_answer"])
+    
+    if use_cache and _is_cacheable(result.get("workflow_steps", [])):
+        answer_cache.put(query, _cache_entry(query, result))
     
     return result
 
+# 流式事件构造：实时执行与缓存回放共用，保证客户端看到的事件序列一致
+def _branch_processing_events(query: str, with_passages: bool = False, route: str = ROUTE_BOTH) -> list:
+    events = []
+    if route != ROUTE_GRAPH:
+        events.append({ "type": "step", "step": 1, "name": "搜索引擎查询", "status": "processing", "description": f"正在搜索: {query}", "icon": "🔍" })
+    if route != ROUTE_SEARCH:
+        events.append({ "type": "step", "step": 2, "name": "知识图谱查询", "status": "processing", "description": "查询知识图谱数据库...", "icon": "🧠" })
+    if with_passages:
+        # 原文检索沿用步骤号 4，已有的步骤 3（生成答案）保持不变
+        events.append({ "type": "step", "step": 4, "name": "原文检索", "status": "processing", "description": "检索方志原文片段...", "icon": "📜" })
+    return events
+
+def _branch_completed_event(step: int, state: dict) -> dict:
+    if step == 1:
+        return { "type": "step", "step": 1, "name": "搜索引擎查询", "status": "completed", "description": "搜索完成", "result": state["search_result"][:200] + "...", "icon": "✅" }
+    if step == 2:
+        return { "type": "step", "step": 2, "name": "知识图谱查询", "status": "completed", "description": "图谱查询完成", "result": state["graph_result"][:200] + "...", "icon": "✅" }
+    return { "type": "step", "step": 4, "name": "原文检索", "status": "completed", "description": "原文检索完成", "result": state["passage_result"][:200] + "...", "icon": "✅" }
+
+def _synthesis_event(status: str) -> dict:
+    if status == "processing":
+        return { "type": "step", "step": 3, "name": "生成答案", "status": "processing", "description": "正在生成最终答案...", "icon": "✨" }
+    return { "type": "step", "step": 3, "name": "生成答案", "status": "completed", "description": "答案生成完成", "icon": "✅" }
+
+def _complete_event(state: dict) -> dict:
+    return {
+        "type": "complete",
+        "final_answer": state["final_answer"],
+        "workflow_steps": state["workflow_steps"],
+        "search_result": state["search_result"],
+        "search_snippets": state.get("search_snippets", []),
+        "graph_result": state["graph_result"],
+        "passage_result": state.get("passage_result", ""),
+        "route": state.get("route") or ROUTE_BOTH
+    }
+
+REPLAY_CHUNK_SIZE = 16  # 回放缓存答案时每个 answer_chunk 的字符数
+
+async def _replay_cached_answer(query: str, cached: dict) -> AsyncGenerator[dict, None]:
+    """把缓存的答案按实时执行的事件序列回放，answer_chunk 分块推送"""
+    with_passages = bool(cached.get("passage_result"))
+    route = cached.get("route") or ROUTE_BOTH
+    for event in _branch_processing_events(query, with_passages, route):
+        yield event
+    if route != ROUTE_GRAPH:
+        yield _branch_completed_event(1, cached)
+    if route != ROUTE_SEARCH:
+        yield _branch_completed_event(2, cached)
+    if with_passages:
+        yield _branch_completed_event(4, cached)
+    yield _synthesis_event("processing")
+    answer = cached["final_answer"]
+    for i in range(0, len(answer), REPLAY_CHUNK_SIZE):
+        yield { "type": "answer_chunk", "content": answer[i:i + REPLAY_CHUNK_SIZE], "is_final": False }
+    yield { "type": "answer_chunk", "content": "", "is_final": True }
+    yield _synthesis_event("completed")
+    yield _complete_event(cached)
+
 # 流式执行函数 (重构)
-async def run_agent_stream(query: str) -> AsyncGenerator[dict, None]:
-    """运行智能问答代理 - 流式版本"""
+async def run_agent_stream(query: str, use_cache: bool = True) -> AsyncGenerator[dict, None]:
+    """运行智能问答代理 - 流式版本；记录首个答案块延迟（TTFT）与请求总耗时"""
+    start = time.perf_counter()
+    info = {"cached": False}
+    first_token = False
+    try:
+        async for event in _agent_stream_events(query, use_cache, info):
+            if not first_token and event.get("type") == "answer_chunk" and event.get("content"):
+                first_token = True
+                FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, scope="request")
+            yield event
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream", cached=str(info["cached"]).lower())
+
+async def _agent_stream_events(query: str, use_cache: bool, info: dict) -> AsyncGenerator[dict, None]:
+    log.info("=== 开始处理查询 (流式) ===", query=query)
+    
+    # 发送开始信号
+    yield {
+        "type": "start",
+        "message": "开始处理您的问题...",
+        "timestamp": datetime.now().isoformat()
+    }
+    
+    try:
+        # 缓存查找可能触发向量化或图谱指纹查询，同样放入线程池
+        cached = await run_blocking(answer_cache.get, query) if use_cache else None
+        if cached is not None:
+            log.info("⚡ 命中答案缓存", query=query)
+            info["cached"] = True
+            async for event in _replay_cached_answer(query, cached):
+                yield event
+            return
+    except Exception as e:
+        log.error("处理查询时出错", error=str(e))
+        yield {
+            "type": "error",
+            "message": f"处理失败: {str(e)}",
+            "timestamp": datetime.now().isoformat()
+        }
+        return
+    
+    if not SINGLE_FLIGHT_ENABLED:
+        async for event in _stream_pipeline(query, use_cache):
+            yield event
+        return
+    
+    # 相同问题正在执行时直接订阅它的事件流；中途加入也能收到完整的事件序列
+    async for event in inflight_streams.subscribe(normalize_query(query), lambda: _stream_pipeline(query, use_cache)):
+        yield event
+
+async def _stream_pipeline(query: str, use_cache: bool) -> AsyncGenerator[dict, None]:
+    """实际执行的流式流程（开始信号之后的全部事件），可被多个订阅者共享"""
     
     initial_state: AgentState = {
         "messages": [],
         "query": query,
         "search_result": "",
+        "search_snippets": [],
         "graph_result": "",
+        "passage_result": "",
         "final_answer": "",
+        "route": "",
         "workflow_steps": []
     }
     
-    print(f"\n=== 开始处理查询 (流式): {query} ====")
-    
-    # 发送开始信号
-    yield {
-        "type": "start",
-        "message": "开始处理您的问题...",
-        "timestamp": datetime.now().isoformat()
-    }
-    
     try:
         current_state = initial_state
         
-        # 步骤1: 搜索引擎
-        yield { "type": "step", "step": 1, "name": "搜索引擎查询", "status": "processing", "description": f"正在搜索: {query}", "icon": "🔍" }
-        await asyncio.sleep(0.1)
-        search_result_update = search_engine(current_state)
-        current_state["search_result"] = search_result_update["search_result"]
-        current_state["workflow_steps"] = search_result_update["workflow_steps"]
-        yield { "type": "step", "step": 1, "name": "搜索引擎查询", "status": "completed", "description": "搜索完成", "result": current_state["search_result"][:200] + "...", "icon": "✅" }
-        
-        # 步骤2: 知识图谱查询
-        yield { "type": "step", "step": 2, "name": "知识图谱查询", "status": "processing", "description": "查询知识图谱数据库...", "icon": "🧠" }
-        await asyncio.sleep(0.1)
-        graph_result_update = query_knowledge_graph(current_state)
-        current_state["graph_result"] = graph_result_update["graph_result"]
-        current_state["workflow_steps"] = graph_result_update["workflow_steps"]
-        yield { "type": "step", "step": 2, "name": "知识图谱查询", "status": "completed", "description": "图谱查询完成", "result": current_state["graph_result"][:200] + "...", "icon": "✅" }
+        # 先分类，只执行需要的分支
+        current_state.update(await aclassify_query(current_state))
+        route = current_state["route"]
+        
+        # 步骤1、步骤2 与原文检索并行：各分支互不依赖，哪个分支先完成就先推送哪个
+        with_passages = await run_blocking(get_chunk_index) is not None
+        for event in _branch_processing_events(query, with_passages, route):
+            yield event
+        
+        # 各分支都是协程，阻塞部分在有界线程池中执行，不会卡住其他 SSE 客户端
+        branches = {}
+        if route != ROUTE_GRAPH:
+            branches[asyncio.create_task(asearch_engine(dict(current_state)))] = 1
+        if route != ROUTE_SEARCH:
+            branches[asyncio.create_task(aquery_knowledge_graph(dict(current_state)))] = 2
+        if with_passages:
+            branches[asyncio.create_task(aretrieve_passages(dict(current_state)))] = 4
+        pending = set(branches)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    update = task.result()
+                    current_state["workflow_steps"].extend(update.get("workflow_steps", []))
+                    current_state.update({k: v for k, v in update.items() if k != "workflow_steps"})
+                    yield _branch_completed_event(branches[task], current_state)
+        finally:
+            # 客户端断开时生成器被关闭，取消尚未完成的分支
+            for task in pending:
+                task.cancel()
         
         # 步骤3: 生成最终答案 (流式)
-        yield { "type": "step", "step": 3, "name": "生成答案", "status": "processing", "description": "正在生成最终答案...", "icon": "✨" }
+        yield _synthesis_event("processing")
         
         final_data_received = False
         async for result in stream_synthesis(current_state):
@@ -447,19 +1144,16 @@ async def run_agent_stream(query: str) -> AsyncGenerator[dict, None]:
         if not final_data_received:
              raise Exception("流式合成未能生成最终数据。")
 
-        yield { "type": "step", "step": 3, "name": "生成答案", "status": "completed", "description": "答案生成完成", "icon": "✅" }
+        yield _synthesis_event("completed")
+        
+        if use_cache and _is_cacheable(current_state["workflow_steps"]):
+            await run_blocking(answer_cache.put, query, _cache_entry(query, current_state))
         
         # 发送完成信号
-        yield {
-            "type": "complete",
-            "final_answer": current_state["final_answer"],
-            "workflow_steps": current_state["workflow_steps"],
-            "search_result": current_state["search_result"],
-            "graph_result": current_state["graph_result"]
-        }
+        yield _complete_event(current_state)
         
     except Exception as e:
-        print(f"处理查询时出错: {e}")
+        log.error("处理查询时出错", error=str(e))
         yield {
             "type": "error",
             "message": f"处理失败: {str(e)}",
@@ -0,0 +1,248 @@
+"""
+基于图谱 Schema 的意图路由：常见的湖泊/方志/诗词问题直接执行预编译的参数化 Cypher，不调用 LLM。
+
+图谱 Schema 固定为 Lake / Gazetteer / Poem 三类节点和
+MENTIONED_IN_GAZETTEER / MENTIONED_IN_POEM 两类关系（由 knowledgeMining.ipynb 写入）。
+启动时从 Neo4j 载入全部实体名称构成内存词典，按最长匹配识别问题中的实体，
+再结合关键词判断意图；无法匹配的问题返回 None，由调用方退回 GraphCypherQAChain。
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logger import get_logger
+
+log = get_logger("intent_router")
+
+ENTITY_QUERY = """
+MATCH (l:Lake) RETURN 'Lake' AS label, l.name AS name
+UNION ALL
+MATCH (g:Gazetteer) RETURN 'Gazetteer' AS label, g.source AS name
+UNION ALL
+MATCH (p:Poem) RETURN 'Poem' AS label, p.name AS name
+"""
+
+# 入库时实体归一写入的湖泊别名（entity_resolution.py），问题中出现别名时按规范名查询
+ALIAS_QUERY = "MATCH (l:Lake) WHERE l.aliases IS NOT NULL UNWIND l.aliases AS alias RETURN alias, l.name AS name"
+
+MIN_ENTITY_LENGTH = 2  # 单字实体（如"湖"）歧义太大，不参与匹配
+MAX_ENTITY_LENGTH = 40
+
+_POEM_WORDS = re.compile(r"诗|词|吟|赋|歌")
+_LOCATION_WORDS = re.compile(r"在哪|哪里|何处|位于|位置|在什么地方|所在")
+_GAZETTEER_WORDS = re.compile(r"方志|志书|记载|史料|文献")
+_LAKE_WORDS = re.compile(r"湖")
+_LIST_WORDS = re.compile(r"哪些|什么|有无|有没有|列出|多少")
+
+
+def _title(name: str) -> str:
+    """加书名号（图谱中的名称可能已带书名号）"""
+    return f"《{name.strip('《》')}》"
+
+
+def _lake_location_answer(params, rows):
+    parts = [f"{r['lake']}位于{r['location']}" for r in rows if r.get("location")]
+    return "；".join(parts) + "。" if parts else ""
+
+
+def _poems_of_lake_answer(params, rows):
+    names = "、".join(_title(r["poem"]) for r in rows)
+    return f"提到{params['lake']}的诗词有：{names}。"
+
+
+def _gazetteers_of_lake_answer(params, rows):
+    parts = [f"{_title(r['source'])}：{r['content']}" if r.get("content") else _title(r["source"]) for r in rows]
+    return f"记载{params['lake']}的方志有：" + "；".join(parts)
+
+
+def _lakes_in_gazetteer_answer(params, rows):
+    parts = [f"{r['lake']}（{r['location']}）" if r.get("location") else r["lake"] for r in rows]
+    return _title(params["source"]) + "记载的湖泊有：" + "、".join(parts) + "。"
+
+
+def _lakes_in_poem_answer(params, rows):
+    return _title(params["poem"]) + "提到的湖泊有：" + "、".join(r["lake"] for r in rows) + "。"
+
+
+def _poems_with_lakes_answer(params, rows):
+    parts = [f"{_title(r['poem'])}（{'、'.join(r['lakes'])}）" for r in rows]
+    return "提到湖泊的诗词有：" + "；".join(parts) + "。"
+
+
+def _gazetteers_with_lakes_answer(params, rows):
+    parts = [f"{_title(r['source'])}（{'、'.join(r['lakes'])}）" for r in rows]
+    return "记载湖泊的方志有：" + "；".join(parts) + "。"
+
+
+# 意图名称 -> (参数化 Cypher, 结果格式化函数)
+INTENTS: Dict[str, tuple] = {
+    "lake_location": (
+        "MATCH (l:Lake {name: $lake}) RETURN l.name AS lake, l.location AS location",
+        _lake_location_answer,
+    ),
+    "poems_of_lake": (
+        "MATCH (l:Lake {name: $lake})-[:MENTIONED_IN_POEM]->(p:Poem) "
+        "RETURN p.name AS poem LIMIT $limit",
+        _poems_of_lake_answer,
+    ),
+    "gazetteers_of_lake": (
+        "MATCH (l:Lake {name: $lake})-[:MENTIONED_IN_GAZETTEER]->(g:Gazetteer) "
+        "RETURN g.source AS source, g.content AS content LIMIT $limit",
+        _gazetteers_of_lake_answer,
+    ),
+    "lakes_in_gazetteer": (
+        "MATCH (l:Lake)-[:MENTIONED_IN_GAZETTEER]->(g:Gazetteer {source: $source}) "
+        "RETURN l.name AS lake, l.location AS location LIMIT $limit",
+        _lakes_in_gazetteer_answer,
+    ),
+    "lakes_in_poem": (
+        "MATCH (l:Lake)-[:MENTIONED_IN_POEM]->(p:Poem {name: $poem}) RETURN l.name AS lake LIMIT $limit",
+        _lakes_in_poem_answer,
+    ),
+    "poems_with_lakes": (
+        "MATCH (l:Lake)-[:MENTIONED_IN_POEM]->(p:Poem) "
+        "RETURN p.name AS poem, collect(l.name) AS lakes LIMIT $limit",
+        _poems_with_lakes_answer,
+    ),
+    "gazetteers_with_lakes": (
+        "MATCH (l:Lake)-[:MENTIONED_IN_GAZETTEER]->(g:Gazetteer) "
+        "RETURN g.source AS source, collect(l.name) AS lakes LIMIT $limit",
+        _gazetteers_with_lakes_answer,
+    ),
+}
+
+
+class EntityDictionary:
+    """实体名称词典：名称 -> 标签集合，支持在问题中做最长匹配"""
+
+    def __init__(self):
+        self.entities: Dict[str, set] = {}
+        self.originals: Dict[Tuple[str, str], str] = {}  # (标签, 匹配用名称) -> 图谱中的原始名称
+        self.aliases: Dict[str, str] = {}  # 别名 -> 规范名
+        self.max_length = 0
+
+    def add(self, label: str, name: Optional[str], canonical: Optional[str] = None):
+        if not name:
+            return
+        key = name.strip().strip("《》")  # 问题中书名号可有可无；查询时仍使用图谱中的原始名称
+        if MIN_ENTITY_LENGTH <= len(key) <= MAX_ENTITY_LENGTH:
+            self.entities.setdefault(key, set()).add(label)
+            self.originals.setdefault((label, key), name)
+            self.max_length = max(self.max_length, len(key))
+            if canonical and canonical != key:
+                self.aliases.setdefault(key, canonical)
+
+    def canonical(self, name: str, label: str = "Lake") -> str:
+        """把 find 匹配到的名称还原为查询参数：湖泊别名换成规范名，其余还原为图谱中的原始名称"""
+        if label == "Lake" and name in self.aliases:
+            return self.aliases[name]
+        return self.originals.get((label, name), name)
+
+    def __len__(self):
+        return len(self.entities)
+
+    def find(self, text: str) -> List[tuple]:
+        """从左到右做最长匹配，返回互不重叠的 (名称, 标签集合) 列表"""
+        found = []
+        i = 0
+        while i < len(text):
+            for length in range(min(self.max_length, len(text) - i), MIN_ENTITY_LENGTH - 1, -1):
+                labels = self.entities.get(text[i:i + length])
+                if labels:
+                    found.append((text[i:i + length], labels))
+                    i += length
+                    break
+            else:
+                i += 1
+        return found
+
+
+class IntentRouter:
+    """把常见问题路由到预编译 Cypher 的快速路径"""
+
+    def __init__(self, query_fn: Callable[..., List[Dict[str, Any]]], limit: int = 25):
+        self.query_fn = query_fn
+        self.limit = limit
+        self.dictionary = EntityDictionary()
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # 载入词典时 _lock 会被长时间持有，计数使用单独的锁
+        self._stats = {"routed": 0, "fallback": 0, "empty": 0}
+
+    def load(self, force: bool = False):
+        """从 Neo4j 载入实体词典（启动时调用；图谱重新入库后可 force 重新载入）"""
+        with self._lock:
+            if self.loaded and not force:
+                return
+            dictionary = EntityDictionary()
+            for row in self.query_fn(ENTITY_QUERY):
+                dictionary.add(row["label"], row["name"])
+            for row in self.query_fn(ALIAS_QUERY):
+                dictionary.add("Lake", row.get("alias"), row.get("name"))
+            self.dictionary = dictionary
+            self.loaded = True
+        log.info("✅ 实体词典已载入", entities=len(dictionary), aliases=len(dictionary.aliases))
+
+    def route(self, question: str) -> Optional[tuple]:
+        """识别意图，返回 (意图名称, 参数) 或 None"""
+        matches = self.dictionary.find(question)
+        first = {}
+        for name, labels in matches:
+            for label in labels:
+                first.setdefault(label, name)
+
+        canonical = self.dictionary.canonical
+        if "Poem" in first and _LAKE_WORDS.search(question.replace(first["Poem"], "")):
+            return "lakes_in_poem", {"poem": canonical(first["Poem"], "Poem")}
+        if "Lake" in first:
+            rest = question.replace(first["Lake"], "")
+            if _POEM_WORDS.search(rest):
+                return "poems_of_lake", {"lake": canonical(first["Lake"])}
+            if _LOCATION_WORDS.search(rest):
+                return "lake_location", {"lake": canonical(first["Lake"])}
+            if _GAZETTEER_WORDS.search(rest):
+                return "gazetteers_of_lake", {"lake": canonical(first["Lake"])}
+        if "Gazetteer" in first and _LAKE_WORDS.search(question.replace(first["Gazetteer"], "")):
+            return "lakes_in_gazetteer", {"source": canonical(first["Gazetteer"], "Gazetteer")}
+        if not matches and _LAKE_WORDS.search(question) and _LIST_WORDS.search(question):
+            if _POEM_WORDS.search(question):
+                return "poems_with_lakes", {}
+            if _GAZETTEER_WORDS.search(question) or "志" in question:
+                return "gazetteers_with_lakes", {}
+        return None
+
+    def answer(self, question: str) -> Optional[Dict[str, Any]]:
+        """快速路径：命中意图且有结果时返回 {"result", "cypher", "context", "intent"}，否则返回 None"""
+        if not self.loaded:
+            try:
+                self.load()
+            except Exception as e:
+                log.warning("⚠️ 实体词典载入失败，意图路由不可用", error=str(e))
+                return None
+
+        routed = self.route(question)
+        if routed is None:
+            self._count("fallback")
+            return None
+
+        intent, params = routed
+        cypher, formatter = INTENTS[intent]
+        params = {**params, "limit": self.limit}
+        rows = self.query_fn(cypher, params)
+        answer = formatter(params, rows) if rows else ""
+        if not answer:
+            self._count("empty")
+            return None
+
+        self._count("routed")
+        log.info("⚡ 意图路由命中", intent=intent, params=params)
+        return {"result": answer, "cypher": cypher, "context": rows, "intent": intent}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            counts = dict(self._stats)
+        return {**counts, "entities": len(self.dictionary), "loaded": self.loaded}
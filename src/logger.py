@@ -0,0 +1,162 @@
+"""
+结构化日志：替代问答路径上的 print。
+
+每条日志是一条消息加若干键值字段：
+    log = get_logger("graph_agent")
+    log.info("✅ 搜索完成", chars=len(result), seconds=0.42)
+LOG_FORMAT=text（默认）输出 “时间 级别 模块 消息 key=value ...”，LOG_FORMAT=json 每行输出一个 JSON 对象，
+便于日志系统按字段检索。级别由 LOG_LEVEL 控制（默认 INFO）。
+
+热路径上的开销：
+- 级别判断是一次整数比较，被关闭的级别在任何对象构造之前就返回
+- 开启的级别只把 (时间, 级别, 模块, 消息, 字段, 异常) 元组放入队列；字段就是 **fields 收到的字典，不再复制，
+  也不构造 logging.LogRecord
+- LOG_ASYNC=1（默认）时格式化与写 stdout 在后台线程中完成，请求线程不会因终端或管道写入变慢而被拖住；
+  LOG_ASYNC=0 时在调用线程中同步写出
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Optional, TextIO, Tuple
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1") == "1"
+MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "200"))  # 长文本字段（搜索结果、答案）截断后输出
+
+_ROOT = "kg"
+_LEVEL_NAMES = {logging.DEBUG: "DEBUG", logging.INFO: "INFO", logging.WARNING: "WARNING", logging.ERROR: "ERROR"}
+
+Entry = Tuple[float, int, str, str, dict, Any]  # (时间, 级别, 模块, 消息, 字段, exc_info)
+
+
+def _clip(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_FIELD_CHARS:
+        return value[:MAX_FIELD_CHARS] + "..."
+    return value
+
+
+def format_entry(entry: Entry, fmt: str = "text") -> str:
+    created, level, name, message, fields, exc_info = entry
+    level_name = _LEVEL_NAMES.get(level, str(level))
+    if fmt == "json":
+        payload = {"ts": round(created, 3), "level": level_name, "logger": name, "event": message}
+        payload.update((k, _clip(v)) for k, v in fields.items())
+        if exc_info:
+            payload["exc"] = "".join(traceback.format_exception(*exc_info)).rstrip()
+        return json.dumps(payload, ensure_ascii=False, default=str)
+    timestamp = time.strftime("%H:%M:%S", time.localtime(created))
+    parts = [f"{timestamp} {level_name:<5} {name} {message}"]
+    parts.extend(f"{k}={_clip(v)!r}" if isinstance(v, str) else f"{k}={v}" for k, v in fields.items())
+    line = " ".join(parts)
+    if exc_info:
+        line += "\n" + "".join(traceback.format_exception(*exc_info)).rstrip()
+    return line
+
+
+class _Writer:
+    """把日志条目格式化后写到流；异步模式下由后台线程批量写出，每批刷新一次"""
+
+    def __init__(self, stream: TextIO, fmt: str, asynchronous: bool):
+        self.stream = stream
+        self.fmt = fmt
+        self._queue: Optional["queue.SimpleQueue[Optional[Entry]]"] = None
+        self._lock = threading.Lock()
+        if asynchronous:
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)  # 退出前写完队列中剩余的日志
+
+    def emit(self, entry: Entry):
+        if self._queue is not None:
+            self._queue.put(entry)
+            return
+        with self._lock:
+            self._write(entry)
+            self.stream.flush()
+
+    def _write(self, entry: Entry):
+        try:
+            self.stream.write(format_entry(entry, self.fmt) + "\n")
+        except Exception:
+            pass  # 日志写出失败不影响请求
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            while entry is not None:
+                self._write(entry)
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                self.stream.flush()
+            except Exception:
+                pass
+            if entry is None:
+                return
+
+    def stop(self):
+        if self._queue is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+_writer: Optional[_Writer] = None
+_threshold = logging.getLevelName(LOG_LEVEL) if isinstance(logging.getLevelName(LOG_LEVEL), int) else logging.INFO
+
+
+class StructuredLogger:
+    """log.info(消息, **字段)；名称为 kg.<模块>"""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def debug(self, message: str, **fields: Any):
+        if logging.DEBUG >= _threshold:
+            _writer.emit((time.time(), logging.DEBUG, self.name, message, fields, None))
+
+    def info(self, message: str, **fields: Any):
+        if logging.INFO >= _threshold:
+            _writer.emit((time.time(), logging.INFO, self.name, message, fields, None))
+
+    def warning(self, message: str, **fields: Any):
+        if logging.WARNING >= _threshold:
+            _writer.emit((time.time(), logging.WARNING, self.name, message, fields, None))
+
+    def error(self, message: str, exc_info: bool = False, **fields: Any):
+        if logging.ERROR >= _threshold:
+            _writer.emit((time.time(), logging.ERROR, self.name, message, fields, sys.exc_info() if exc_info else None))
+
+
+def _configure() -> _Writer:
+    global _writer
+    if _writer is None:
+        _writer = _Writer(sys.stdout, LOG_FORMAT, LOG_ASYNC)
+    return _writer
+
+
+def set_stream(stream: TextIO):
+    """重定向日志输出（基准测试中写入内存时使用）"""
+    _configure().stream = stream
+
+
+def set_level(level: str):
+    """运行时调整级别，如 set_level("WARNING")"""
+    global _threshold
+    _threshold = logging.getLevelName(level.upper())
+
+
+def get_logger(name: str) -> StructuredLogger:
+    _configure()
+    return StructuredLogger(f"{_ROOT}.{name}")
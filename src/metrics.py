@@ -0,0 +1,247 @@
+"""
+问答路径的分阶段耗时与 LLM 调用计数，以 Prometheus 文本格式在 /api/metrics 暴露。
+
+- agent_node_seconds{node,status}: 工作流各节点（搜索、图谱查询、原文检索、结果融合）的耗时
+- agent_step_seconds{step}: 节点内部的子步骤（DuckDuckGo、意图路由、Cypher 生成、Neo4j 执行、
+  图谱答案生成、查询优化、融合 LLM）
+- agent_llm_calls_total{stage} / agent_llm_tokens_total{stage,kind}: 由 LangChain 回调统计，
+  token 数取自模型返回的 usage（接口不返回用量时只计调用次数）
+- agent_first_token_seconds{scope}: 流式接口的首个答案块延迟（request: 从收到请求算起；synthesis: 从融合 LLM 开始算起）
+- agent_request_seconds{mode,cached}: 整个请求的耗时
+- agent_synthesis_context_tokens{kind}: 融合提示词上下文的 token 数（raw: 各分支结果原样拼接；budgeted: 按预算组装后）
+- agent_route_total{route,method}: 查询分类结果（search / graph / both）及判定方式（rule / llm / default）
+
+指标保存在进程内；多 worker 部署时每个 worker 各自计数，抓取端需按实例区分。
+直方图的桶是固定的，observe 只做一次二分查找和加法，可以放在每个请求的热路径上。
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_str(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{k}="{v}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = tuple(str(labels.get(k, "")) for k in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(tuple(str(labels.get(k, "")) for k in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_label_str(self.labelnames, key)} {_format_value(v)}" for key, v in items)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # 标签值 -> [各桶计数..., 总和, 总数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(str(labels.get(k, "")) for k in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1  # 只记落入的桶，输出时再累加
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(tuple(str(labels.get(k, "")) for k in self.labelnames))
+        return series[-1] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _label_str(self.labelnames, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series[-2]!r}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """读取时才求值的指标（准入并发、缓存命中数等已有统计）；kind 为 gauge 或 counter（单调递增的计数）"""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.fn())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float], kind: str = "gauge") -> Gauge:
+        with self._lock:
+            self._metrics[name] = Gauge(name, help, fn, kind)  # 同名仪表以最后注册的取值函数为准
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+NODE_SECONDS = registry.histogram("agent_node_seconds", "工作流节点耗时（秒）", ["node", "status"])
+STEP_SECONDS = registry.histogram("agent_step_seconds", "节点内部子步骤耗时（秒）", ["step"])
+LLM_CALLS = registry.counter("agent_llm_calls_total", "LLM 调用次数", ["stage"])
+LLM_TOKENS = registry.counter("agent_llm_tokens_total", "LLM 消耗的 token 数", ["stage", "kind"])
+FIRST_TOKEN_SECONDS = registry.histogram("agent_first_token_seconds", "流式接口首个答案块的延迟（秒）", ["scope"])
+REQUEST_SECONDS = registry.histogram("agent_request_seconds", "问答请求总耗时（秒）", ["mode", "cached"])
+CONTEXT_TOKENS = registry.histogram("agent_synthesis_context_tokens", "融合提示词上下文的 token 数", ["kind"],
+                                    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 5000, 10000, 20000))
+ROUTES = registry.counter("agent_route_total", "查询分类结果", ["route", "method"])
+
+
+@contextmanager
+def step_timer(step: str) -> Iterator[None]:
+    """记录一个子步骤的耗时（异常时同样记录）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STEP_SECONDS.observe(time.perf_counter() - start, step=step)
+
+
+def _node_status(update: Any) -> str:
+    """节点自行捕获异常并在 workflow_steps 中标注状态（completed / error / fallback）"""
+    steps = update.get("workflow_steps") if isinstance(update, dict) else None
+    return steps[-1].get("status", "completed") if steps else "completed"
+
+
+def timed_node(node: str) -> Callable:
+    """装饰工作流节点（同步或异步），按节点名和结果状态记录耗时"""
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any):
+                start = time.perf_counter()
+                status = "exception"
+                try:
+                    update = await fn(*args, **kwargs)
+                    status = _node_status(update)
+                    return update
+                finally:
+                    NODE_SECONDS.observe(time.perf_counter() - start, node=node, status=status)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any):
+            start = time.perf_counter()
+            status = "exception"
+            try:
+                update = fn(*args, **kwargs)
+                status = _node_status(update)
+                return update
+            finally:
+                NODE_SECONDS.observe(time.perf_counter() - start, node=node, status=status)
+        return wrapper
+    return decorator
+
+
+def _usage(response: Any) -> Optional[Tuple[int, int]]:
+    """从 LLMResult 中取 (输入 token, 输出 token)；兼容 usage_metadata 与 OpenAI 的 token_usage"""
+    for generations in response.generations or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """按阶段统计 LLM 调用次数与 token 用量"""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def on_llm_end(self, response: Any, **kwargs: Any):
+        LLM_CALLS.inc(stage=self.stage)
+        usage = _usage(response)
+        if usage is not None:
+            LLM_TOKENS.inc(usage[0], stage=self.stage, kind="prompt")
+            LLM_TOKENS.inc(usage[1], stage=self.stage, kind="completion")
+
+
+_llm_configs: Dict[str, Dict[str, Any]] = {}
+
+
+def llm_config(stage: str) -> Dict[str, Any]:
+    """传给 invoke / ainvoke / astream 的 config，回调对象按阶段复用"""
+    config = _llm_configs.get(stage)
+    if config is None:
+        config = _llm_configs.setdefault(stage, {"callbacks": [LLMMetricsCallback(stage)]})
+    return config
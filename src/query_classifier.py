@@ -0,0 +1,106 @@
+"""
+查询分类：决定一个问题需要走哪些分支（搜索引擎 / 知识图谱 / 两者）。
+
+- search: 地名推理、现代行政区划与实时信息（"安东县所在的省份"、"巢湖今天的天气"），图谱中没有
+- graph: 图谱中的湖泊 / 方志 / 诗词问题（"合肥志上记载有哪些湖？"），网络搜索只会带来噪声
+- both: 两类信号都有（"巢湖在哪里"：图谱有方志中的古代位置，搜索有今天的位置），或无法判断
+
+先用关键词和实体词典（intent_router 载入的图谱实体）做规则判断，微秒级；
+规则判断不了的问题才交给 LLM，LLM 也失败时退回 both，保证不会比分类之前少拿信息。
+原文检索在本地执行、代价很低，不参与分类，总是执行。
+"""
+import re
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+ROUTE_SEARCH = "search"
+ROUTE_GRAPH = "graph"
+ROUTE_BOTH = "both"
+ROUTES = (ROUTE_SEARCH, ROUTE_GRAPH, ROUTE_BOTH)
+
+_GRAPH_WORDS = re.compile(r"方志|志书|府志|县志|州志|记载|史料|文献|诗|词|吟|赋|提到|提及")
+_LAKE_LIST_WORDS = re.compile(r"湖.*(哪些|有哪|多少|列出)|(哪些|有哪|多少|列出).*湖")
+_LOCATION_WORDS = re.compile(r"在哪(?!些)|哪里|何处|位于|位置|在什么地方")
+_ADMIN_WORDS = re.compile(r"省|市|县|州|府|区|镇|乡|村")
+_ADMIN_REASONING_WORDS = re.compile(r"所在|属于|隶属|归属|管辖|哪个省|哪个市|哪个县|今属|今天|现在|现今|现属|改名|更名|旧称|古称")
+_REALTIME_WORDS = re.compile(r"天气|气温|门票|交通|怎么去|景点|旅游|开放时间|最新|新闻|人口|面积|GDP|经济|今年|近年|目前")
+_BACKGROUND_WORDS = re.compile(r"谁|作者|何人|哪位|生平|朝代|简介|介绍|历史")  # 图谱只有实体间的记载 / 提及关系
+
+CLASSIFY_PROMPT = """你是问答系统的查询分类器。系统有两个信息来源：
+- graph: 古代方志与诗词中的湖泊知识图谱（湖泊、方志、诗词及其记载与提及关系）
+- search: 互联网搜索（现代地理、行政区划、实时信息）
+请判断回答下面的问题需要哪个来源，只输出 search、graph 或 both 之一，不要输出其他内容。
+
+问题: {query}
+分类:"""
+
+
+def parse_route(text: str) -> Optional[str]:
+    """从 LLM 输出中取出分类；同时出现多个时按 both 处理"""
+    found = {route for route in ROUTES if route in text.lower()}
+    if len(found) == 1:
+        return found.pop()
+    return ROUTE_BOTH if found else None
+
+
+class QueryClassifier:
+    """
+    规则优先、LLM 兜底的查询分类器。
+    entities_fn(question) 返回问题中识别出的图谱实体（intent_router 的 EntityDictionary.find），
+    实体词典不可用时可以返回空列表，此时只依靠关键词。
+    """
+
+    def __init__(self, entities_fn: Callable[[str], List[tuple]]):
+        self.entities_fn = entities_fn
+
+    def rule(self, question: str) -> Optional[str]:
+        """规则分类；两类信号都没有时返回 None，交给 LLM"""
+        entities = self.entities_fn(question)
+        rest = question
+        for name, _ in entities:
+            rest = rest.replace(name, "")
+
+        realtime = bool(_REALTIME_WORDS.search(rest))
+        # 实时信息问题（"巢湖今天的天气"、"西湖门票多少钱"）即使提到图谱中的湖泊也只需要搜索
+        graph = bool(_GRAPH_WORDS.search(rest)) or (not realtime and (
+            bool(entities) or bool(_LAKE_LIST_WORDS.search(question))))
+        search = realtime or bool(_BACKGROUND_WORDS.search(rest)) or (
+            bool(_ADMIN_WORDS.search(rest)) and bool(_ADMIN_REASONING_WORDS.search(rest)))
+        if _LOCATION_WORDS.search(rest):
+            # 问位置：图谱里只有方志中的古代位置，同时需要搜索给出今天的位置
+            search = True
+            graph = graph or "湖" in question
+
+        if graph and search:
+            return ROUTE_BOTH
+        if graph:
+            return ROUTE_GRAPH
+        if search:
+            return ROUTE_SEARCH
+        return None
+
+    @staticmethod
+    def prompt(question: str) -> str:
+        return CLASSIFY_PROMPT.format(query=question)
+
+    def classify(self, question: str, llm_fn: Optional[Callable[[str], str]] = None) -> Tuple[str, str]:
+        """返回 (分类, 判定方式)，判定方式为 rule / llm / default"""
+        route = self.rule(question)
+        if route is not None:
+            return route, "rule"
+        if llm_fn is not None:
+            route = parse_route(llm_fn(self.prompt(question)))
+            if route is not None:
+                return route, "llm"
+        return ROUTE_BOTH, "default"
+
+    async def aclassify(self, question: str,
+                        allm_fn: Optional[Callable[[str], Awaitable[str]]] = None) -> Tuple[str, str]:
+        """classify 的异步版本（LLM 兜底走原生 ainvoke）"""
+        route = self.rule(question)
+        if route is not None:
+            return route, "rule"
+        if allm_fn is not None:
+            route = parse_route(await allm_fn(self.prompt(question)))
+            if route is not None:
+                return route, "llm"
+        return ROUTE_BOTH, "default"
@@ -0,0 +1,441 @@
+"""
+网络搜索子系统：多后端对冲请求、硬性截止时间、持久化 TTL 缓存，结果统一为结构化片段。
+
+- 片段: {"title", "text", "url", "source"}，source 为产生该片段的后端名
+- 后端: duckduckgo（直接使用 ddgs 的 DDGS 客户端，取带标题 / 链接的结构化结果；注入 LangChain 搜索工具或
+  替身时改为按句切分工具返回的文本）、chunks（本地方志片段索引）、http（返回 JSON 的 HTTP 搜索接口）
+- 对冲: 按配置顺序先请求第一个后端，hedge_delay 秒内没有可用结果（或它已失败）就加发下一个，
+  哪个后端先返回可用结果就用哪个；hedge_delay <= 0 时所有后端同时发出
+- 截止时间: 超过 deadline 秒仍没有可用结果时放弃并抛出 SearchError；所有后端都正常返回但没有结果时
+  返回空列表（搜索无结果不是错误）
+- 后端调用: 在线程池中执行，线程无法中断，因此每个后端自身带超时（DDGS / httpx 的 timeout），
+  超过截止时间或对冲落选的调用最多再跑一个后端超时就会结束；每个后端的在途调用数有上限，
+  已满的后端直接跳过而不是排队，线程池按上限之和配置，不会因为挂起的调用堵住后续搜索
+- 缓存: 以归一化问题为键存入 SQLite，过期时间 ttl 秒，进程重启后仍然有效；空结果不缓存
+
+用法:
+    service = SearchService([DuckDuckGoBackend(timeout=5)], cache=SearchCache("search_cache.db"))
+    snippets = service.search("巢湖在哪里")
+"""
+import asyncio
+import json
+import math
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from answer_cache import normalize_query
+from context_builder import split_snippets
+from logger import get_logger
+from metrics import registry, step_timer
+
+log = get_logger("search_service")
+
+SEARCH_BACKEND_RESULTS = registry.counter("agent_search_backend_total", "搜索后端调用结果", ["backend", "outcome"])
+
+
+class SearchError(Exception):
+    """所有后端都失败或超过截止时间"""
+
+
+def make_snippet(text: str, title: str = "", url: str = "", source: str = "") -> Dict[str, str]:
+    return {"title": (title or "").strip(), "text": (text or "").strip(), "url": url or "", "source": source}
+
+
+def format_snippet(snippet: Dict[str, str]) -> str:
+    return f"{snippet['title']}：{snippet['text']}" if snippet.get("title") else snippet["text"]
+
+
+def format_snippets(snippets: Sequence[Dict[str, str]]) -> str:
+    """拼成带编号的文本（工作流步骤展示与兼容旧的 search_result 字段）"""
+    lines = []
+    for i, snippet in enumerate(snippets, 1):
+        line = f"[{i}] {format_snippet(snippet)}"
+        if snippet.get("url"):
+            line += f"（{snippet['url']}）"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class DuckDuckGoBackend:
+    """
+    DuckDuckGo 文本搜索。直接使用 ddgs 的公开接口（DDGS(timeout=...).text），
+    不经过 LangChain 的封装，超时由 DDGS 客户端自身执行；每次调用创建独立的客户端，可在多个线程中并发使用。
+    """
+
+    name = "duckduckgo"
+
+    def __init__(self, max_results: int = 5, timeout: float = 5.0, region: str = "wt-wt",
+                 safesearch: str = "moderate", timelimit: Optional[str] = None, backend: str = "auto"):
+        self.max_results = max_results
+        self.timeout = timeout
+        self.region = region
+        self.safesearch = safesearch
+        self.timelimit = timelimit
+        self.backend = backend
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        from ddgs import DDGS
+        with DDGS(timeout=max(1, math.ceil(self.timeout))) as ddgs:
+            rows = ddgs.text(query, region=self.region, safesearch=self.safesearch, timelimit=self.timelimit,
+                             max_results=self.max_results, backend=self.backend) or []
+        return [make_snippet(r.get("body", ""), r.get("title", ""), r.get("href", ""), self.name)
+                for r in rows if r.get("body")]
+
+
+class ToolSearchBackend:
+    """只返回一整段文本的 LangChain 搜索工具（DuckDuckGoSearchRun 或同接口的替身），按句切成片段"""
+
+    name = "duckduckgo"
+    NO_RESULT = "No good DuckDuckGo Search Result was found"
+
+    def __init__(self, tool_fn: Callable[[], Any], max_results: int = 5, timeout: float = 5.0):
+        self.tool_fn = tool_fn
+        self.max_results = max_results
+        self.timeout = timeout  # 工具自身不支持超时，只用于说明；截止时间由 SearchService 执行
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        text = self.tool_fn().run(query)
+        if not text or text == self.NO_RESULT:
+            return []
+        return [make_snippet(part, source=self.name) for part in split_snippets(text)][: self.max_results * 2]
+
+
+class ChunkIndexBackend:
+    """本地方志片段索引（chunk_index.py 构建），未构建时返回空结果"""
+
+    name = "chunks"
+
+    def __init__(self, index_fn: Callable[[], Any], k: int = 5):
+        self.index_fn = index_fn
+        self.k = k
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        index = self.index_fn()
+        if index is None:
+            return []
+        return [make_snippet(doc["text"], doc.get("title", ""), doc.get("source", ""), self.name)
+                for doc in index.search(query, k=self.k)]
+
+
+class HttpSearchBackend:
+    """
+    返回 JSON 的 HTTP 搜索接口：GET url?q=问题&n=条数，
+    响应为列表或 {"results": [...]}，每项含 title、snippet / text / content、url / link。
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: float = 5.0, max_results: int = 5):
+        self.url = url
+        self.timeout = timeout
+        self.max_results = max_results
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def _get_client(self):
+        """复用连接池的 httpx.Client（可在多个线程间共享）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    self._client = httpx.Client(timeout=self.timeout)
+        return self._client
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        response = self._get_client().get(self.url, params={"q": query, "n": self.max_results})
+        response.raise_for_status()
+        data = response.json()
+        rows = data.get("results", []) if isinstance(data, dict) else data
+        snippets = []
+        for row in rows[: self.max_results]:
+            text = row.get("snippet") or row.get("text") or row.get("content") or ""
+            if text:
+                snippets.append(make_snippet(text, row.get("title", ""), row.get("url") or row.get("link", ""), self.name))
+        return snippets
+
+
+class SearchCache:
+    """持久化的搜索结果缓存（SQLite），每个线程持有独立连接"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS search_cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_search_cache_created ON search_cache (created_at);
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 86400, max_entries: int = 50000, cleanup_every: int = 200):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.cleanup_every = cleanup_every  # 每写入这么多条清理一次过期与超量条目
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0}
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, query: str) -> Optional[List[Dict[str, str]]]:
+        row = self._conn().execute("SELECT value, expires_at FROM search_cache WHERE key = ?",
+                                   (normalize_query(query),)).fetchone()
+        with self._lock:
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            if row[1] < time.time():
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, query: str, snippets: List[Dict[str, str]]):
+        if not snippets:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO search_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                     (normalize_query(query), json.dumps(snippets, ensure_ascii=False), now, now + self.ttl_seconds))
+        with self._lock:
+            self._stats["writes"] += 1
+            cleanup = self._stats["writes"] % self.cleanup_every == 0
+        if cleanup:
+            self._cleanup(conn, now)
+
+    def _cleanup(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (now,))
+        count = conn.execute("SELECT count(*) FROM search_cache").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute("DELETE FROM search_cache WHERE key IN "
+                         "(SELECT key FROM search_cache ORDER BY created_at LIMIT ?)", (count - self.max_entries,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM search_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._conn().execute("SELECT count(*) FROM search_cache").fetchone()[0]
+        with self._lock:
+            return {**self._stats, "entries": entries, "path": self.path, "ttl": self.ttl_seconds}
+
+
+class _Attempt:
+    """一次搜索中各后端调用的调度状态，同步与异步版本共用"""
+
+    def __init__(self, service: "SearchService", query: str):
+        self.service = service
+        self.query = query
+        now = time.monotonic()
+        self.deadline_at = now + service.deadline
+        self.next_launch_at = now
+        self.pending: Dict[Future, Any] = {}
+        self.next_backend = 0
+        self.hedged = False
+        self.errors: List[str] = []
+        self.partial: Optional[List[Dict[str, str]]] = None  # 正常返回但不足 min_snippets 条的结果
+
+    @property
+    def exhausted(self) -> bool:
+        return self.next_backend >= len(self.service.backends)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline_at
+
+    def launch_due(self):
+        """启动到期的后端：第一个后端、对冲时间已到，或当前没有在途调用（前一个已失败 / 无结果）"""
+        service = self.service
+        while not self.exhausted and (not self.pending or service.hedge_delay <= 0
+                                      or time.monotonic() >= self.next_launch_at):
+            backend = service.backends[self.next_backend]
+            self.next_backend += 1
+            future = service._submit(backend, self.query)
+            if future is None:
+                SEARCH_BACKEND_RESULTS.inc(backend=backend.name, outcome="busy")
+                self.errors.append(f"{backend.name}: 在途调用已满")
+                continue
+            if self.pending and not self.hedged:
+                self.hedged = True
+                service._count("hedged")
+            self.pending[future] = backend
+            self.next_launch_at = time.monotonic() + service.hedge_delay
+
+    def wait_timeout(self) -> float:
+        now = time.monotonic()
+        timeout = self.deadline_at - now
+        if not self.exhausted:
+            timeout = min(timeout, self.next_launch_at - now)
+        return max(timeout, 0.0)
+
+    def collect(self, future: Future) -> Optional[List[Dict[str, str]]]:
+        """处理一个已完成的调用，结果可用时返回片段列表"""
+        backend = self.pending.pop(future)
+        try:
+            snippets = future.result()
+        except Exception as e:
+            SEARCH_BACKEND_RESULTS.inc(backend=backend.name, outcome="error")
+            self.errors.append(f"{backend.name}: {e}")
+            log.warning("⚠️ 搜索后端失败", backend=backend.name, error=str(e))
+            return None
+        if len(snippets) < self.service.min_snippets:
+            SEARCH_BACKEND_RESULTS.inc(backend=backend.name, outcome="empty")
+            if self.partial is None or len(snippets) > len(self.partial):
+                self.partial = snippets
+            return None
+        SEARCH_BACKEND_RESULTS.inc(backend=backend.name, outcome="win")
+        return snippets
+
+    def abandon(self):
+        """落选或超时的调用仍在线程池中运行（受后端自身超时约束），结束后只记一次结果"""
+        for future, backend in self.pending.items():
+            future.add_done_callback(lambda f, name=backend.name: SEARCH_BACKEND_RESULTS.inc(backend=name, outcome="late"))
+
+
+class SearchService:
+    """按配置顺序对冲多个搜索后端，带截止时间、每个后端的在途调用上限与缓存"""
+
+    def __init__(self, backends: Sequence[Any], cache: Optional[SearchCache] = None, deadline: float = 8.0,
+                 hedge_delay: float = 1.0, min_snippets: int = 1, max_in_flight: int = 8):
+        if not backends:
+            raise ValueError("至少需要一个搜索后端")
+        self.backends = list(backends)
+        self.cache = cache
+        self.deadline = deadline
+        self.hedge_delay = hedge_delay
+        self.min_snippets = min_snippets
+        self.max_in_flight = max_in_flight
+        # 线程数等于各后端在途上限之和：提交的调用总能立即开始执行，不会排在挂起的调用后面
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight * len(self.backends), thread_name_prefix="search")
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "cache_hits": 0, "hedged": 0, "empty": 0, "timeouts": 0, "failures": 0}
+        self._wins: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {backend.name: 0 for backend in self.backends}
+
+    def _call(self, backend: Any, query: str) -> List[Dict[str, str]]:
+        with step_timer(f"search:{backend.name}"):
+            return backend.search(query)
+
+    def _submit(self, backend: Any, query: str) -> Optional[Future]:
+        """提交一次后端调用；该后端在途调用已满时返回 None"""
+        with self._lock:
+            if self._in_flight[backend.name] >= self.max_in_flight:
+                return None
+            self._in_flight[backend.name] += 1
+        future = self._executor.submit(self._call, backend, query)
+        future.add_done_callback(lambda f, name=backend.name: self._release(name))
+        return future
+
+    def _release(self, name: str):
+        with self._lock:
+            self._in_flight[name] -= 1
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _cached(self, query: str) -> Optional[List[Dict[str, str]]]:
+        self._count("requests")
+        if self.cache is None:
+            return None
+        cached = self.cache.get(query)
+        if cached is not None:
+            self._count("cache_hits")
+        return cached
+
+    def _won(self, query: str, backend_name: str, snippets: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        with self._lock:
+            self._wins[backend_name] = self._wins.get(backend_name, 0) + 1
+        if self.cache is not None:
+            self.cache.put(query, snippets)
+        return snippets
+
+    def _finish(self, attempt: _Attempt) -> List[Dict[str, str]]:
+        """没有可用结果：有后端正常返回（结果为空或不足）时返回这些结果，否则按超时 / 失败抛出 SearchError"""
+        if attempt.partial is not None:
+            self._count("empty")
+            return attempt.partial
+        if attempt.pending:
+            self._count("timeouts")
+            raise SearchError(f"搜索超时（{self.deadline:g}s）" + (f"，{'；'.join(attempt.errors)}" if attempt.errors else ""))
+        self._count("failures")
+        raise SearchError("；".join(attempt.errors) or "搜索失败")
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        """返回第一个可用后端的片段列表；搜索无结果时返回空列表，全部失败或超时抛出 SearchError"""
+        cached = self._cached(query)
+        if cached is not None:
+            return cached
+        attempt = _Attempt(self, query)
+        try:
+            while True:
+                attempt.launch_due()
+                if not attempt.pending or attempt.expired:
+                    break
+                done, _ = wait(list(attempt.pending), timeout=attempt.wait_timeout(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    backend = attempt.pending[future]
+                    snippets = attempt.collect(future)
+                    if snippets is not None:
+                        return self._won(query, backend.name, snippets)
+        finally:
+            attempt.abandon()
+        return self._finish(attempt)
+
+    async def asearch(self, query: str) -> List[Dict[str, str]]:
+        """
+        search 的异步版本：后端调用在服务自己的线程池中执行，事件循环只等待其结果。
+        缓存读写是 SQLite 操作，多个 worker 争用写锁时可能等待，同样放到线程中执行。
+        """
+        if self.cache is None:
+            cached = self._cached(query)
+        else:
+            cached = await asyncio.to_thread(self._cached, query)
+        if cached is not None:
+            return cached
+        attempt = _Attempt(self, query)
+        wrapped: Dict[Future, asyncio.Future] = {}
+        try:
+            while True:
+                attempt.launch_due()
+                if not attempt.pending or attempt.expired:
+                    break
+                for future in attempt.pending:
+                    if future not in wrapped:
+                        wrapped[future] = asyncio.wrap_future(future)
+                done, _ = await asyncio.wait([wrapped[f] for f in attempt.pending], timeout=attempt.wait_timeout(),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for future in [f for f in attempt.pending if wrapped[f] in done]:
+                    backend = attempt.pending[future]
+                    snippets = attempt.collect(future)
+                    if snippets is not None:
+                        if self.cache is None:
+                            return self._won(query, backend.name, snippets)
+                        return await asyncio.to_thread(self._won, query, backend.name, snippets)
+        finally:
+            for future in attempt.pending:
+                if future in wrapped:
+                    wrapped[future].cancel()  # 运行中的调用取消不了，只是不再等待它的结果
+            attempt.abandon()
+        return self._finish(attempt)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {**self._stats, "wins": dict(self._wins), "in_flight": dict(self._in_flight),
+                     "backends": [b.name for b in self.backends], "deadline": self.deadline,
+                     "hedge_delay": self.hedge_delay, "max_in_flight": self.max_in_flight}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
@@ -0,0 +1,128 @@
+"""
+生产服务模式的配置与并发控制：多 worker、每个 worker 的有界执行器以及背压。
+
+每个 uvicorn worker 是独立进程，各自持有一份本模块的状态：
+- agent_executor: 执行同步 run_agent 的有界线程池，避免阻塞事件循环
+- admission: 准入控制，正在处理 + 排队的请求超过上限时直接返回 429 和 Retry-After；
+  收到 SIGTERM 后进入排空状态，新请求返回 503 和 Retry-After，进行中的请求结束后再关闭
+- shared_generation: worker 之间共享的失效代数文件，一个 worker 清空缓存 / 刷新 Schema 后，
+  其他 worker 在处理下一个请求前发现代数变化并执行同样的失效
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+AGENT_EXECUTOR_WORKERS = int(os.getenv("AGENT_EXECUTOR_WORKERS", "8"))  # 每个 worker 同时执行的阻塞代理调用数
+AGENT_MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "32"))  # 执行器满载时允许排队的请求数
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "30"))  # 关闭时等待进行中的请求（含 SSE 流）完成的秒数
+SHARED_GENERATION_PATH = os.getenv("SHARED_GENERATION_PATH",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_generation.json"))
+
+
+class AdmissionController:
+    """
+    请求准入计数器。只在事件循环线程中使用，不需要加锁；
+    流式请求在整个流的生命周期内占用一个名额。
+    """
+
+    def __init__(self, max_in_flight: int, retry_after: int):
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+        self.draining = False
+        self._idle: Optional[asyncio.Event] = None
+
+    def try_acquire(self) -> bool:
+        if self.draining or self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        if self.in_flight == 0 and self._idle is not None:
+            self._idle.set()
+
+    def start_draining(self):
+        """进入排空状态：不再接受新请求，进行中的请求继续完成"""
+        self.draining = True
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """等待进行中的请求全部结束，超时返回 False"""
+        if self.in_flight == 0:
+            return True
+        self._idle = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._idle = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected": self.rejected,
+            "draining": self.draining,
+        }
+
+
+class SharedGeneration:
+    """
+    worker 之间共享的失效代数：{"cache": n, "schema": m} 形式的 JSON 文件。
+    bump 递增某类代数并原子替换文件；poll 先比较文件的 mtime 与大小（一次 stat，微秒级），
+    变化时才读取内容，返回代数变化了的类别。自己 bump 的类别不会再从 poll 返回。
+    两个 worker 同时 bump 时可能只递增一次，但文件总会变化，其他 worker 仍会执行失效。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stat = None
+        self._seen = self._read()
+
+    def _read(self) -> Dict[str, int]:
+        try:
+            st = os.stat(self.path)
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._stat = (st.st_mtime_ns, st.st_size)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def bump(self, kind: str):
+        current = self._read()
+        current[kind] = current.get(kind, 0) + 1
+        current["updated_at"] = time.time()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(current, f)
+        os.replace(tmp_path, self.path)
+        self._seen = self._read()
+
+    def poll(self) -> List[str]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        if (st.st_mtime_ns, st.st_size) == self._stat:
+            return []
+        current = self._read()
+        changed = [kind for kind, value in current.items()
+                   if kind != "updated_at" and value != self._seen.get(kind)]
+        self._seen = current
+        return changed
+
+
+agent_executor = ThreadPoolExecutor(max_workers=AGENT_EXECUTOR_WORKERS, thread_name_prefix="agent")
+admission = AdmissionController(AGENT_EXECUTOR_WORKERS + AGENT_MAX_QUEUE, RETRY_AFTER_SECONDS)
+shared_generation = SharedGeneration(SHARED_GENERATION_PATH)
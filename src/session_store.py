@@ -0,0 +1,249 @@
+"""
+会话历史存储：替代 app.py 中无上限增长的全局 chat_sessions 字典。
+
+- MemorySessionStore: 进程内 LRU，限制会话数、每个会话的消息数，并按空闲时间过期
+- SQLiteSessionStore: 基于 SQLite（WAL 模式）的持久化存储，可被多个 uvicorn worker 共享、重启不丢失
+
+两种实现的追加都是 O(1)，历史读取支持 offset/limit 分页。通过环境变量 SESSION_STORE 选择后端。
+"""
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def clamp_page(offset: int = 0, limit: Optional[int] = None) -> Tuple[int, Optional[int]]:
+    """分页参数下限为 0：负的 offset 视为 0，负的 limit 视为 0（None 表示不限）"""
+    return max(offset, 0), None if limit is None else max(limit, 0)
+
+
+class SessionStore(abc.ABC):
+    """会话存储接口"""
+
+    @abc.abstractmethod
+    def append(self, session_id: str, message: Dict[str, Any]):
+        ...
+
+    @abc.abstractmethod
+    def history(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """按时间顺序返回 (消息列表, 消息总数)；offset / limit 按 clamp_page 处理"""
+
+    @abc.abstractmethod
+    def clear(self, session_id: str):
+        ...
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class _Session:
+    __slots__ = ("messages", "last_active")
+
+    def __init__(self, max_messages: int):
+        self.messages: deque = deque(maxlen=max_messages)
+        self.last_active = time.monotonic()
+
+
+class MemorySessionStore(SessionStore):
+    """进程内 LRU 会话存储：会话按最近访问排序，超出数量上限或空闲过久的会话被淘汰"""
+
+    def __init__(self, max_sessions: int = 10000, max_messages: int = 200, idle_ttl: float = 86400):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def _evict(self, now: float):
+        # 最久未访问的会话在队首，只需从队首检查，均摊 O(1)
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.last_active <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self._evictions += 1
+
+    def _touch(self, session_id: str, now: float, create: bool) -> Optional[_Session]:
+        session = self._sessions.get(session_id)
+        if session is not None and now - session.last_active > self.idle_ttl:
+            del self._sessions[session_id]
+            self._evictions += 1
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[session_id] = _Session(self.max_messages)
+        session.last_active = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def append(self, session_id: str, message: Dict[str, Any]):
+        now = time.monotonic()
+        with self._lock:
+            self._touch(session_id, now, create=True).messages.append(message)
+            self._evict(now)
+
+    def history(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        offset, limit = clamp_page(offset, limit)
+        with self._lock:
+            session = self._touch(session_id, time.monotonic(), create=False)
+            if session is None:
+                return [], 0
+            messages = list(session.messages)
+        end = None if limit is None else offset + limit
+        return messages[offset:end], len(messages)
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "max_messages": self.max_messages,
+                "idle_ttl": self.idle_ttl,
+                "evictions": self._evictions,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite 会话存储。WAL 模式允许多个进程同时读、串行写，适合多 worker 部署；
+    每个线程持有独立连接。过期会话按 cleanup_interval 周期性清理。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        payload TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        last_active REAL NOT NULL,
+        message_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions (last_active);
+    """
+
+    def __init__(self, path: str, max_messages: int = 200, idle_ttl: float = 86400, cleanup_interval: float = 300):
+        self.path = path
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.cleanup_interval = cleanup_interval
+        self._local = threading.local()
+        self._last_cleanup = 0.0
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _cleanup(self, conn: sqlite3.Connection, now: float):
+        """删除空闲超时的会话（周期性执行，不在每次追加时做）"""
+        if now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+        cutoff = now - self.idle_ttl
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages WHERE session_id IN (SELECT session_id FROM sessions WHERE last_active < ?)", (cutoff,))
+            conn.execute("DELETE FROM sessions WHERE last_active < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def append(self, session_id: str, message: Dict[str, Any]):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO messages (session_id, payload) VALUES (?, ?)",
+                         (session_id, json.dumps(message, ensure_ascii=False)))
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_active, message_count) VALUES (?, ?, 1) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_active = excluded.last_active, "
+                "message_count = message_count + 1",
+                (session_id, now),
+            )
+            count = conn.execute("SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)).fetchone()[0]
+            if count > self.max_messages:
+                # 超出单会话上限时删掉最早的一条，保持追加为常数开销
+                conn.execute(
+                    "DELETE FROM messages WHERE id = (SELECT id FROM messages WHERE session_id = ? ORDER BY id LIMIT 1)",
+                    (session_id,),
+                )
+                conn.execute("UPDATE sessions SET message_count = message_count - 1 WHERE session_id = ?", (session_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._cleanup(conn, now)
+
+    def history(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        offset, limit = clamp_page(offset, limit)  # SQLite 把负的 LIMIT 当作不限，必须先截断
+        conn = self._conn()
+        row = conn.execute("SELECT last_active, message_count FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or time.time() - row[0] > self.idle_ttl:
+            return [], 0
+        rows = conn.execute(
+            "SELECT payload FROM messages WHERE session_id = ? ORDER BY id LIMIT ? OFFSET ?",
+            (session_id, -1 if limit is None else limit, offset),
+        ).fetchall()
+        return [json.loads(payload) for (payload,) in rows], row[1]
+
+    def clear(self, session_id: str):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        sessions = self._conn().execute("SELECT count(*) FROM sessions").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": sessions,
+            "max_messages": self.max_messages,
+            "idle_ttl": self.idle_ttl,
+        }
+
+
+def create_session_store() -> SessionStore:
+    """根据环境变量创建会话存储（默认进程内存储；多 worker 部署请使用 sqlite）"""
+    backend = os.getenv("SESSION_STORE", "memory")
+    max_messages = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+    idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "86400"))
+    if backend == "sqlite":
+        path = os.getenv("SESSION_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db"))
+        return SQLiteSessionStore(path, max_messages=max_messages, idle_ttl=idle_ttl)
+    if backend != "memory":
+        raise ValueError(f"未知的会话存储后端: {backend}")
+    return MemorySessionStore(
+        max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+        max_messages=max_messages,
+        idle_ttl=idle_ttl,
+    )
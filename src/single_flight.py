@@ -0,0 +1,147 @@
+"""
+请求合并（single-flight）：同一时刻相同的问题只执行一次问答流程，其余请求共享结果。
+
+- SingleFlight: 同步版本，供 run_agent 使用；后到的线程等待首个线程的结果
+- StreamFlight: 异步版本，供 run_agent_stream 使用；一个生产者任务执行流程，
+  事件广播给所有订阅者，中途加入的订阅者先回放已产生的事件再接收后续事件
+
+合并只在单个进程内生效，多 worker 部署时每个 worker 各自合并。
+"""
+import asyncio
+import threading
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Hashable, List
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None  # type: ignore
+
+
+class SingleFlight:
+    """相同 key 的并发调用只执行一次 fn，所有调用者拿到同一个结果（或同一个异常）"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._executions = 0
+        self._shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executions += 1
+            else:
+                self._shared += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "executions": self._executions, "shared": self._shared}
+
+
+class _Broadcast:
+    """一次共享执行：已产生的事件列表 + 通知订阅者有新事件的条件变量"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.finished = False
+        self.error: BaseException = None  # type: ignore
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task = None  # type: ignore
+
+
+class StreamFlight:
+    """
+    相同 key 的并发流式请求共享一个生产者任务。
+
+    事件在 events 中按顺序保存，每个订阅者维护自己的读取位置，
+    因此中途加入的订阅者会先回放全部已有事件。所有订阅者都断开后生产者任务被取消。
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Broadcast] = {}
+        self._executions = 0
+        self._shared = 0
+
+    async def _produce(self, key: Hashable, flight: _Broadcast, source: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for event in source():
+                async with flight.changed:
+                    flight.events.append(event)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            # 先移出登记表：此后到达的相同请求会重新执行，而不是订阅一个已结束的流
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.finished = True
+            async with flight.changed:
+                flight.changed.notify_all()
+
+    async def subscribe(self, key: Hashable, source: Callable[[], AsyncIterator[Any]]) -> AsyncGenerator[Any, None]:
+        """订阅 key 对应的共享流；没有进行中的执行时由 source 创建一个"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Broadcast()
+            flight.task = asyncio.create_task(self._produce(key, flight, source))
+            self._executions += 1
+        else:
+            self._shared += 1
+        flight.subscribers += 1
+
+        position = 0
+        try:
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: position < len(flight.events) or flight.finished)
+                    pending = flight.events[position:]
+                position += len(pending)
+                for event in pending:
+                    yield event
+                if flight.finished and position >= len(flight.events):
+                    break
+            if flight.error is not None and not isinstance(flight.error, asyncio.CancelledError):
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.finished:
+                # 所有客户端都已断开，不再为无人接收的流继续调用 LLM；
+                # 立即移出登记表，避免新请求订阅到这个正在取消的流
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "subscribers": sum(f.subscribers for f in self._flights.values()),
+            "executions": self._executions,
+            "shared": self._shared,
+        }
@@ -0,0 +1,30 @@
+"""
+测试公共配置：把仓库根目录（入库模块）、src/（服务模块）与 benchmarks/（本地替身）加入导入路径，
+持久化的文件（搜索缓存、失效代数、会话库）都放到临时目录，LLM / Neo4j / 搜索使用 benchmarks/fakes.py 的替身。
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+_TMP = tempfile.mkdtemp(prefix="kg-tests-")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("SEARCH_CACHE_TTL", "0")
+os.environ.setdefault("SHARED_GENERATION_PATH", os.path.join(_TMP, "cache_generation.json"))
+os.environ.setdefault("CHUNK_INDEX_PATH", os.path.join(_TMP, "chunk_index"))
+
+import pytest
+
+
+@pytest.fixture
+def agent():
+    """替身化的 graph_agent 模块；每个测试开始时清空进程内缓存"""
+    from fakes import install_fakes
+    graph_agent = install_fakes(llm_latency=0.0, tokens_per_second=100000.0, graph_latency=0.0, search_latency=0.0)
+    graph_agent.answer_cache.invalidate()
+    graph_agent.cypher_cache.invalidate()
+    return graph_agent
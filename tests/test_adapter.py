@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import adapter
+from fakes import FakeNeo4jGraph
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_graph_agent_creates_no_clients():
+    code = (
+        "import sys; sys.path[:0] = [{src!r}]\n"
+        "import adapter, graph_agent\n"
+        "assert adapter._llm is None and adapter._graph is None and graph_agent._graph_chain is None\n"
+        "assert not {{'neo4j', 'langchain_neo4j', 'langchain_openai'}} & set(sys.modules)\n"
+    ).format(src=os.path.join(ROOT, "src"))
+    env = {**os.environ, "LOG_LEVEL": "WARNING"}
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "neo4j_schema.json")
+    monkeypatch.setattr(adapter, "SCHEMA_SNAPSHOT_PATH", path)
+    return path
+
+
+def test_schema_snapshot_round_trip(snapshot_path):
+    source = FakeNeo4jGraph(latency=0)
+    adapter.refresh_schema(source)
+    restored = FakeNeo4jGraph(latency=0)
+    restored.schema, restored.structured_schema = "", {}
+    assert adapter.load_schema_snapshot(restored)
+    assert restored.schema == source.schema
+    assert restored.structured_schema == source.structured_schema
+
+
+def test_missing_or_corrupt_snapshot_is_not_loaded(snapshot_path):
+    graph = FakeNeo4jGraph(latency=0)
+    assert not adapter.load_schema_snapshot(graph)
+    with open(snapshot_path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert not adapter.load_schema_snapshot(graph)
+    with open(snapshot_path, "w", encoding="utf-8") as f:
+        json.dump({"schema": "x"}, f)
+    assert not adapter.load_schema_snapshot(graph)
@@ -0,0 +1,135 @@
+import threading
+import time
+import types
+
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_normalize_query_ignores_width_whitespace_and_trailing_punctuation():
+    assert normalize_query(" 巢湖 在哪里？ ") == normalize_query("巢湖在哪里") == normalize_query("巢湖在哪里?!")
+    assert normalize_query("ＡＢＣ湖") == "abc湖"
+
+
+def test_ttl_expiry(clock):
+    cache = AnswerCache(ttl_seconds=10)
+    cache.put("巢湖在哪里", "答案")
+    clock[0] += 9
+    assert cache.get("巢湖在哪里？") == "答案"
+    clock[0] += 2
+    assert cache.get("巢湖在哪里") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction_keeps_recently_used(clock):
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a 变为最近使用
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_fingerprint_change_invalidates(clock):
+    fingerprint = [(10, 5, 1)]
+    cache = AnswerCache(fingerprint_fn=lambda: fingerprint[0], fingerprint_interval=60)
+    cache.put("巢湖在哪里", "旧答案")
+    assert cache.get("巢湖在哪里") == "旧答案"  # 首次记录指纹
+    fingerprint[0] = (10, 5, 2)  # 节点数与关系数不变，入库代数变化
+    clock[0] += 30
+    assert cache.get("巢湖在哪里") == "旧答案"  # 检查间隔内不查询指纹
+    clock[0] += 31
+    assert cache.get("巢湖在哪里") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_fingerprint_errors_keep_cache(clock):
+    def broken():
+        raise RuntimeError("neo4j down")
+    cache = AnswerCache(fingerprint_fn=broken)
+    cache.put("q", "答案")
+    assert cache.get("q") == "答案"
+
+
+def test_fingerprint_change_calls_on_change_once(clock):
+    fingerprint, changes = [1], []
+    cache = AnswerCache(fingerprint_fn=lambda: fingerprint[0], fingerprint_interval=0,
+                        on_change=lambda: changes.append(fingerprint[0]))
+    cache.get("q")
+    cache.get("q")
+    assert changes == []
+    fingerprint[0] = 2
+    cache.get("q")
+    cache.get("q")
+    assert changes == [2]
+
+
+def test_concurrent_requests_query_fingerprint_once():
+    calls = []
+
+    def slow_fingerprint():
+        calls.append(1)
+        time.sleep(0.2)
+        return (1, 1, 1)
+
+    cache = AnswerCache(fingerprint_fn=slow_fingerprint, fingerprint_interval=60)
+    start = threading.Barrier(8)
+
+    def lookup():
+        start.wait()
+        cache.get("巢湖在哪里")
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_semantic_hit_above_threshold(clock):
+    vectors = {"巢湖在哪里": [1.0, 0.0], "巢湖位于哪里": [0.99, 0.05], "西湖门票": [0.0, 1.0]}
+    cache = AnswerCache(embed_fn=lambda text: vectors[text], similarity_threshold=0.95)
+    cache.put("巢湖在哪里", "答案")
+    assert cache.get("巢湖位于哪里") == "答案"
+    assert cache.get("西湖门票") is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_graph_fingerprint_returns_row_for_graph_without_relationships(agent):
+    class Graph:
+        def query(self, query, params=None):
+            self.last = query
+            return [{"nodes": 3, "rels": 0, "generation": None}]
+
+    import adapter
+    graph = Graph()
+    adapter.use_backends(graph=graph)
+    assert agent._graph_fingerprint() == (3, 0, None)
+    assert "CALL { MATCH (n) RETURN count(n) AS nodes }" in graph.last
+    assert "IngestMeta" in graph.last
+
+
+def test_graph_change_also_invalidates_cypher_plans_and_entity_dictionary(agent, monkeypatch):
+    fingerprint, reloads = [(10, 5, 1)], []
+    monkeypatch.setattr(agent.answer_cache, "fingerprint_fn", lambda: fingerprint[0])
+    monkeypatch.setattr(agent.answer_cache, "fingerprint_interval", 0)
+    monkeypatch.setattr(agent.answer_cache, "_fingerprint", None)
+    monkeypatch.setattr(agent.intent_router, "load", lambda force=False: reloads.append(force))
+    agent.answer_cache.get("巢湖在哪里")  # 记录当前指纹
+    agent.cypher_cache.put("巢湖在哪里", "MATCH (l:Lake) RETURN l")
+    fingerprint[0] = (10, 5, 2)
+    assert agent.answer_cache.get("巢湖在哪里") is None
+    assert agent.cypher_cache.get("巢湖在哪里") is None
+    assert reloads == [True]
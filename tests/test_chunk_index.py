@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from chunk_index import ChunkIndex, build_index, tokenize
+
+CHUNKS = [
+    "巢湖",
+    "《合肥志》",
+    "在合肥县东南六十里。亦名焦湖。周围四百里。",
+    "丹阳湖",
+    "在当涂县东南七十九里。周三百余里。",
+    "在合肥县东南六十里。亦名焦湖。周围四百里。",  # 与第一段正文重复
+    "西湖在钱塘县西。三面环山。",
+    "𠀀字在扩展区。abc湖。",  # 扩展区汉字与字母：检验词表按 UTF-8 字节序排序
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "chunks.jsonl"
+    path.write_text("".join(json.dumps({"page_content": c}, ensure_ascii=False) + "\n" for c in CHUNKS), encoding="utf-8")
+    meta = build_index([str(path)], str(tmp_path / "index"))
+    index = ChunkIndex(str(tmp_path / "index"))
+    yield meta, index
+    index.close()
+
+
+def test_tokenize_uses_unigrams_and_bigrams_within_runs():
+    assert tokenize("巢湖。西湖") == ["巢", "湖", "巢湖", "西", "湖", "西湖"]
+
+
+def test_titles_attach_to_following_text_and_duplicates_are_skipped(index):
+    meta, index = index
+    assert meta["doc_count"] == 4 and meta["skipped_duplicates"] == 1
+    assert index.document(0)["title"] == "巢湖 合肥志"
+    assert index.document(0)["source"] == "chunks.jsonl:3"
+
+
+def test_search_ranks_matching_passage_first(index):
+    _, index = index
+    results = index.search("巢湖在哪里", k=2)
+    assert results[0]["title"].startswith("巢湖")
+    assert index.search("当涂县有什么湖")[0]["text"].startswith("在当涂县")
+    assert index.search("长江") == []
+
+
+def test_vocabulary_is_binary_searched_from_mmap(index, tmp_path):
+    meta, index = index
+    assert not (tmp_path / "index" / "vocab.json").exists()
+    terms = sorted(set(tokenize("".join(CHUNKS))))
+    assert meta["term_count"] == len(terms)
+    for term in terms:
+        start, df = index.lookup(term)
+        assert df >= 1 and start % 2 == 0
+    assert index.lookup("湖")[1] == 4
+    assert index.lookup("长江") is None and index.lookup("") is None
+    assert index.search("𠀀字")[0]["text"].startswith("𠀀字")
+
+
+def test_empty_index(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_text("", encoding="utf-8")
+    build_index([str(path)], str(tmp_path / "index"))
+    index = ChunkIndex(str(tmp_path / "index"))
+    assert index.search("巢湖") == []
+    index.close()
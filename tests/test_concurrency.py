@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from concurrency import AdaptiveLimiter, AdaptiveRunner, is_rate_limit_error
+from fakes import FakeRateLimitError
+
+
+def test_rate_limit_detection():
+    assert is_rate_limit_error(FakeRateLimitError("x"))
+    assert is_rate_limit_error(RuntimeError("Error code: 429 - Too Many Requests"))
+    assert not is_rate_limit_error(ValueError("bad json"))
+
+
+def test_additive_increase_per_window():
+    limiter = AdaptiveLimiter(initial=4, max_limit=10)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(0.01)
+    assert limiter.limit == 4  # 每次成功加 1 / limit，约一个窗口（略多于 4 次）后加到 5
+    limiter.acquire()
+    limiter.release(0.01)
+    assert limiter.limit == 5
+
+
+def test_multiplicative_decrease_once_per_window():
+    limiter = AdaptiveLimiter(initial=16)
+    limiter.acquire()
+    limiter.release(1.0)  # 延迟均值 1s：1s 内的多次限流只减半一次
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(0.0, FakeRateLimitError("rate limit"))
+    assert limiter.limit == 8
+    assert limiter.stats()["rate_limited"] == 3
+
+
+def test_limit_never_drops_below_minimum_or_exceeds_maximum():
+    limiter = AdaptiveLimiter(initial=2, min_limit=1, max_limit=3)
+    for _ in range(5):
+        limiter._last_decrease = 0.0
+        limiter.acquire()
+        limiter.release(0.0, FakeRateLimitError("rate limit"))
+    assert limiter.limit == 1
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release(0.0)
+    assert limiter.limit == 3
+
+
+def test_in_flight_never_exceeds_limit():
+    limiter = AdaptiveLimiter(initial=3, max_limit=3)
+    runner = AdaptiveRunner(limiter)
+    runner.map(lambda _: time.sleep(0.02), range(12))
+    assert limiter.stats()["peak_in_flight"] == 3
+    runner.close()
+
+
+def test_runner_retries_then_returns_exception():
+    attempts = []
+
+    def flaky(item):
+        attempts.append(item)
+        if item == "bad" or attempts.count(item) < 2:
+            raise FakeRateLimitError("rate limit")
+        return item.upper()
+
+    runner = AdaptiveRunner(AdaptiveLimiter(initial=2), max_retries=2, retry_backoff=0.001)
+    results = runner.map(flaky, ["a", "bad"])
+    assert results[0] == "A"
+    assert isinstance(results[1], FakeRateLimitError)
+    assert runner.last_run["retries"] == 3 and runner.last_run["fallbacks"] == 1
+    runner.close()
+
+
+def test_non_retryable_errors_fall_back_immediately():
+    runner = AdaptiveRunner(max_retries=3, retry_if=is_rate_limit_error, retry_backoff=0.001)
+    calls = []
+    result = runner.call(lambda: calls.append(1) or (_ for _ in ()).throw(ValueError("bad json")))
+    assert isinstance(result, ValueError) and len(calls) == 1
+    runner.close()
+
+
+def test_waiters_resume_when_limit_grows():
+    limiter = AdaptiveLimiter(initial=1, max_limit=2)
+    limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+    limiter.release(0.0)
+    assert acquired.wait(1.0)
+    thread.join()
+
+
+def test_splitter_closes_only_its_own_runner():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from fakes import FakeChatModel
+    from llmsplitter import ConcurrentHierarchicalSplitter, LLMStructuralTextSplitter
+
+    def make(**kwargs):
+        return ConcurrentHierarchicalSplitter(RecursiveCharacterTextSplitter(chunk_size=50, chunk_overlap=10),
+                                              LLMStructuralTextSplitter(llm=FakeChatModel(latency=0, tokens_per_second=0)),
+                                              **kwargs)
+
+    with make(max_concurrency=2) as splitter:
+        assert splitter.split_text("巢湖。在合肥县东南。")
+        owned = splitter.runner
+    with pytest.raises(RuntimeError):  # 退出 with 后自己创建的线程池已关闭
+        owned.submit(lambda: None)
+
+    shared = AdaptiveRunner(AdaptiveLimiter(initial=2, max_limit=4))
+    with make(runner=shared) as splitter:
+        assert splitter.limiter is shared.limiter
+    assert shared.submit(lambda: 1).result() == 1
+    shared.close()
@@ -0,0 +1,94 @@
+import pytest
+
+from context_builder import EMPTY_SECTION, ContextBuilder, estimate_tokens, make_token_counter, split_snippets
+
+QUERY = "巢湖在哪里"
+
+
+def test_estimate_tokens_by_character_class():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("巢湖") == 2
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("巢湖 lake，") == 2 + 1 + 1
+
+
+def test_unknown_tokenizer_falls_back_to_estimate():
+    assert make_token_counter("estimate") is estimate_tokens
+    assert make_token_counter("tiktoken:no-such-encoding") is estimate_tokens
+
+
+def test_split_snippets_by_line_sentence_and_drops_repeats():
+    sentence = "巢湖位于安徽省中部。" * 3 + "湖面辽阔，" * 40 + "。"
+    snippets = split_snippets("第一行\n\n" + sentence, max_chars=40)
+    assert snippets[0] == "第一行"
+    assert sum(s.count("巢湖位于安徽省中部") for s in snippets) == 1
+    assert all(len(s) <= 40 for s in snippets[1:-1])
+
+
+def test_everything_fits_within_budget():
+    sections, stats = ContextBuilder(budget=1000).build(QUERY, {
+        "search_result": "巢湖位于安徽省合肥市。",
+        "graph_result": "巢湖 记载于 合肥志",
+        "passage_result": "",
+    })
+    assert sections == {"search_result": "巢湖位于安徽省合肥市。", "graph_result": "巢湖 记载于 合肥志",
+                        "passage_result": EMPTY_SECTION}
+    assert stats["tokens"] == stats["original_tokens"]
+    assert stats["truncated"] == stats["duplicates"] == 0
+
+
+def test_budget_caps_tokens_and_keeps_every_source():
+    search = [f"第{i}条：巢湖位于安徽省中部，是中国五大淡水湖之一，湖面面积约七百多平方公里。" for i in range(50)]
+    graph = "巢湖 记载于 合肥志\n巢湖 被提及于 诗词"
+    sections, stats = ContextBuilder(budget=200).build(QUERY, {"search_result": search, "graph_result": graph})
+    assert stats["original_tokens"] > 1000
+    assert stats["tokens"] <= 200
+    assert estimate_tokens(sections["search_result"]) + estimate_tokens(sections["graph_result"].replace("\n", "")) <= 200
+    assert "合肥志" in sections["graph_result"]
+    assert sections["search_result"] != EMPTY_SECTION
+
+
+def test_relevant_snippets_outrank_noise():
+    sections, _ = ContextBuilder(budget=40).build(QUERY, {
+        "search_result": ["今日股市行情平稳，成交量略有放大。", "巢湖在安徽省合肥市境内。"],
+    })
+    assert sections["search_result"] == "巢湖在安徽省合肥市境内。"
+
+
+def test_duplicates_are_dropped_but_supersets_kept():
+    sections, stats = ContextBuilder(budget=1000).build(QUERY, {
+        "search_result": ["巢湖位于安徽省中部。", "巢湖位于安徽省中部", "巢湖位于安徽省中部，是五大淡水湖之一。"],
+        "passage_result": "巢湖位于安徽省中部。",
+    })
+    assert stats["duplicates"] == 2
+    assert stats["snippets"] == 2
+    assert sections["passage_result"] == "巢湖位于安徽省中部。"
+    assert sections["search_result"] == "巢湖位于安徽省中部，是五大淡水湖之一。"  # 多出的信息不算重复
+
+
+def test_long_snippet_is_truncated_to_remaining_budget():
+    long = "巢湖" + "湖水清澈" * 200
+    sections, stats = ContextBuilder(budget=100).build(QUERY, {"search_result": [long]})
+    assert stats["truncated"] == 1
+    assert sections["search_result"].endswith("…")
+    assert stats["tokens"] <= 100
+
+
+@pytest.mark.parametrize("budget", [1, 16])
+def test_tiny_budget_never_exceeds_limit(budget):
+    _, stats = ContextBuilder(budget=budget).build(QUERY, {"search_result": ["巢湖" * 50]})
+    assert stats["tokens"] <= budget
+
+
+def test_synthesis_prompt_is_budgeted(agent, monkeypatch):
+    monkeypatch.setattr(agent, "context_builder", ContextBuilder(budget=50))
+    prompt = agent.build_synthesis_prompt({
+        "query": QUERY,
+        "search_snippets": [],
+        "search_result": "巢湖位于安徽省中部。" * 200,
+        "graph_result": "巢湖 记载于 合肥志",
+        "passage_result": "",
+    })
+    assert "合肥志" in prompt
+    assert prompt.count("巢湖位于安徽省中部") < 10
+    assert "方志原文片段:\n" + EMPTY_SECTION in prompt
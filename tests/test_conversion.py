@@ -0,0 +1,67 @@
+import pytest
+
+from conversion import convert_file, iter_blocks, iter_converted_lines, normalize_lines
+
+opencc = pytest.importorskip("opencc")
+
+LINES = [f"第{i}卷 巢湖 在合肥縣東南六十里。亦名焦湖。  " for i in range(200)] + ["", "  "] + ["漢明帝十一年。"] * 50
+
+
+def expected(lines):
+    converter = opencc.OpenCC("t2s")
+    return "".join(converter.convert(line).strip() + "\n" for line in lines if line.strip())
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+    return path
+
+
+def test_blocks_end_on_line_boundaries(source):
+    blocks = list(iter_blocks(str(source), block_bytes=1000))
+    assert len(blocks) > 5
+    assert all(block.endswith(b"\n") for block in blocks)
+    assert b"".join(blocks) == source.read_bytes()
+
+
+def test_output_matches_line_by_line_conversion(source, tmp_path):
+    dst = tmp_path / "out.txt"
+    stats = convert_file(str(source), str(dst), block_bytes=1000)
+    assert dst.read_text(encoding="utf-8") == expected(LINES)
+    assert stats["converted"] == stats["blocks"] and stats["reused"] == 0
+
+
+def test_rerun_reuses_unchanged_blocks(source, tmp_path):
+    dst = tmp_path / "out.txt"
+    convert_file(str(source), str(dst), block_bytes=1000)
+    stats = convert_file(str(source), str(dst), block_bytes=1000)
+    assert stats["reused"] == stats["blocks"] and stats["converted"] == 0
+
+    lines = list(LINES)
+    lines[-1] = "湖水清澈見底。"
+    source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    stats = convert_file(str(source), str(dst), block_bytes=1000)
+    assert stats["converted"] == 1 and stats["reused"] == stats["blocks"] - 1
+    assert dst.read_text(encoding="utf-8") == expected(lines)
+
+
+def test_config_change_or_corrupt_output_disables_reuse(source, tmp_path):
+    dst = tmp_path / "out.txt"
+    convert_file(str(source), str(dst), block_bytes=1000)
+    assert convert_file(str(source), str(dst), block_bytes=1000, config="t2tw")["reused"] == 0
+
+    convert_file(str(source), str(dst), block_bytes=1000)
+    data = bytearray(dst.read_bytes())
+    data[:3] = "湖".encode("utf-8")  # 旧输出被改动：校验和不符的块重新转换
+    dst.write_bytes(bytes(data))
+    stats = convert_file(str(source), str(dst), block_bytes=1000)
+    assert stats["converted"] == 1
+    assert dst.read_text(encoding="utf-8") == expected(LINES)
+
+
+def test_iter_converted_lines_keeps_input_line_numbers(source):
+    lines = list(iter_converted_lines(str(source), start_line=199, block_bytes=1000))
+    assert lines[0] == (199, normalize_lines(expected([LINES[199]])))
+    assert lines[1][0] == 202  # 空行被跳过，行号仍与输入文件一致
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from cypher_cache import CypherPlanCache
+
+
+def test_plans_are_keyed_by_normalized_question():
+    cache = CypherPlanCache()
+    cache.put("合肥志上记载有哪些湖？", "MATCH (n) RETURN n")
+    assert cache.get(" 合肥志上记载有哪些湖") == "MATCH (n) RETURN n"
+    assert cache.get("巢湖在哪里") is None
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_lru_eviction():
+    cache = CypherPlanCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert cache.get("b") is None and cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_mark_empty_drops_plan():
+    cache = CypherPlanCache()
+    cache.put("a", "A")
+    cache.mark_empty("a")
+    cache.mark_empty("missing")
+    assert cache.get("a") is None
+    assert cache.stats()["empty_plans"] == 1
+
+
+@pytest.fixture
+def agent(agent, monkeypatch):
+    # 图谱问答链持有创建时的 LLM：重新构建，使其使用本测试注入的替身
+    monkeypatch.setattr(agent, "_graph_chain", None)
+    return agent
+
+
+def _llm_and_graph():
+    import adapter
+    return adapter.get_llm(), adapter.get_graph()
+
+
+def test_cached_plan_skips_cypher_generation(agent):
+    llm, graph = _llm_and_graph()
+    first = agent.invoke_graph_chain("合肥志上记载有哪些湖")
+    calls, hits = llm.calls, agent.cypher_cache.stats()["hits"]
+    second = agent.invoke_graph_chain("合肥志上记载有哪些湖？")
+    assert second["cypher"] == first["cypher"]
+    assert llm.calls == calls + 1  # 只剩回答这一次 LLM 调用
+    assert agent.cypher_cache.stats()["hits"] == hits + 1
+
+
+def test_async_path_shares_the_cache(agent):
+    llm, _ = _llm_and_graph()
+    agent.invoke_graph_chain("合肥志上记载有哪些湖")
+    calls = llm.calls
+    asyncio.run(agent.ainvoke_graph_chain("合肥志上记载有哪些湖"))
+    assert llm.calls == calls + 1
+
+
+def test_plan_with_empty_result_is_not_cached_and_stale_plan_is_regenerated(agent):
+    llm, graph = _llm_and_graph()
+    responses, rows = graph.responses, graph.rows
+    graph.responses, graph.rows = {}, []
+    agent.invoke_graph_chain("合肥志上记载有哪些湖")
+    assert agent.cypher_cache.stats()["size"] == 0
+
+    graph.responses, graph.rows = responses, rows
+    agent.invoke_graph_chain("合肥志上记载有哪些湖")
+    graph.responses, graph.rows = {}, []  # 图谱变化后缓存的计划不再有结果
+    calls, empty_plans = llm.calls, agent.cypher_cache.stats()["empty_plans"]
+    agent.invoke_graph_chain("合肥志上记载有哪些湖")
+    assert llm.calls == calls + 2  # 重新生成 Cypher + 回答
+    assert agent.cypher_cache.stats()["empty_plans"] == empty_plans + 1
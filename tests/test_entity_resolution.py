@@ -0,0 +1,48 @@
+from entity_resolution import AliasResolver, edit_distance, normalize_title
+
+
+def test_dictionary_aliases_and_variant_characters():
+    resolver = AliasResolver.from_file()
+    assert resolver.resolve("焦湖") == "巢湖"
+    assert resolver.resolve(" 彭蠡泽 ") == "鄱阳湖"
+    assert AliasResolver(variants={"髙": "高"}).resolve("髙邮湖") == "高邮湖"
+    assert resolver.resolve("《巢湖》") == "巢湖"
+    assert set(resolver.aliases("巢湖")) == {"焦湖", "漅湖", "勦湖"}
+
+
+def test_fuzzy_merge_within_one_edit():
+    resolver = AliasResolver(threshold=0.5)
+    assert resolver.resolve("丹阳湖") == "丹阳湖"
+    assert resolver.resolve("丹杨湖") == "丹阳湖"
+    assert resolver.fuzzy_merges == [("丹杨湖", "丹阳湖", 0.5)]
+    assert resolver.resolve("石臼湖") == "石臼湖"  # 差两个字，不合并
+
+
+def test_direction_words_are_never_merged():
+    resolver = AliasResolver(threshold=0.5)
+    resolver.resolve("大明湖")
+    assert resolver.resolve("小明湖") == "小明湖"
+    assert resolver.stats()["fuzzy"] == 0
+
+
+def test_seeded_graph_names_win():
+    resolver = AliasResolver(threshold=0.5)
+    resolver.seed(["丹杨湖", None])
+    assert resolver.resolve("丹阳湖") == "丹杨湖"
+
+
+def test_resolve_rows_attaches_the_same_aliases_to_every_row():
+    resolver = AliasResolver.from_file()
+    gazetteers, poems = resolver.resolve_rows(
+        [{"lake_name": "巢湖", "gazetteer_source": "《合肥志》"}],
+        [{"lake_name": "焦湖", "poem_name": "《泛巢湖》"}, {"lake_name": None, "poem_name": "无题"}])
+    assert gazetteers[0]["gazetteer_source"] == "合肥志"
+    assert poems[0]["lake_name"] == "巢湖" and poems[0]["poem_name"] == "泛巢湖"
+    assert gazetteers[0]["lake_aliases"] == poems[0]["lake_aliases"] and "焦湖" in poems[0]["lake_aliases"]
+    assert poems[1]["lake_aliases"] == []
+
+
+def test_helpers():
+    assert edit_distance("巢湖", "焦湖") == 1
+    assert edit_distance("巢湖", "洞庭湖") == 2
+    assert normalize_title("《 合肥志 》") == "合肥志"
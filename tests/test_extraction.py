@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from concurrency import AdaptiveLimiter
+from extraction import ExtractionEngine
+from fakes import FakeChatModel
+
+TEXTS = [f"第{i}卷。巢湖在合肥县东南，丹阳湖在当涂县。" for i in range(10)]
+
+
+def engine(mode, latency=0.0, initial=20, **llm_options):
+    llm = FakeChatModel(latency=latency, tokens_per_second=0, **llm_options)
+    return llm, ExtractionEngine(llm, mode=mode, limiter=AdaptiveLimiter(initial=initial, max_limit=40),
+                                 retry_backoff=0.01)
+
+
+def test_interleaved_matches_sequential_rows():
+    _, sequential = engine("sequential")
+    _, interleaved = engine("interleaved")
+    expected = sequential.extract(TEXTS)
+    assert interleaved.extract(TEXTS) == expected
+    assert all(len(gazetteers) == 2 and len(poems) == 2 for gazetteers, poems in expected)
+    sequential.close()
+    interleaved.close()
+
+
+def test_interleaved_chains_overlap():
+    timings = {}
+    for mode in ("sequential", "interleaved"):
+        _, extractor = engine(mode, latency=0.1)
+        start = time.perf_counter()
+        extractor.extract(TEXTS)
+        timings[mode] = time.perf_counter() - start
+        extractor.close()
+    assert timings["interleaved"] < timings["sequential"] * 0.75  # 不再等方志链整批结束才开始诗词链
+
+
+def test_merged_mode_makes_one_call_per_chunk():
+    llm, merged = engine("merged")
+    results = merged.extract(TEXTS)
+    assert llm.calls == len(TEXTS)
+    assert all(len(gazetteers) == 2 and poems == [] for gazetteers, poems in results)
+    merged.close()
+
+
+def test_rate_limited_calls_are_retried():
+    llm, extractor = engine("interleaved", latency=0.02, initial=8, max_parallel=2)
+    results = extractor.extract(TEXTS)
+    assert all(len(gazetteers) == 2 for gazetteers, _ in results)
+    stats = extractor.stats()
+    assert stats["retries"] > 0 and stats["limiter"]["limit"] < 8
+    extractor.close()
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ExtractionEngine(FakeChatModel(), mode="parallel")
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+import bench_load
+from fakes import FakeChatModel, FakeRateLimitError, FakeSearchTool
+
+
+def test_fake_model_is_deterministic():
+    model = FakeChatModel(latency=0, tokens_per_second=0, answer="巢湖位于安徽省中部")
+    first = model.invoke("巢湖在哪里").content
+    assert first == model.invoke("巢湖在哪里").content == "巢湖位于安徽省中部"
+    assert model.calls == 2
+
+
+def test_fake_model_streams_at_configured_rate():
+    model = FakeChatModel(latency=0.05, tokens_per_second=100, chunk_size=2, answer="一二三四五六")
+    start = time.perf_counter()
+    chunks = []
+    first = None
+    for chunk in model.stream("巢湖在哪里"):
+        first = first or time.perf_counter() - start
+        chunks.append(chunk.content)
+    total = time.perf_counter() - start
+    assert chunks == ["一二", "三四", "五六"]
+    assert 0.05 <= first < 0.2
+    assert 0.11 <= total < 0.4  # 首 token 前 0.05s + 3 块 × 0.02s
+
+
+def test_fake_model_rejects_beyond_max_parallel():
+    model = FakeChatModel(latency=0.2, tokens_per_second=0, max_parallel=1)
+    errors = []
+
+    def call():
+        try:
+            model.invoke("巢湖在哪里")
+        except FakeRateLimitError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 2
+    assert model.in_flight == 0
+
+
+def test_fake_search_tool_counts_calls():
+    tool = FakeSearchTool(latency=0)
+    assert tool.run("巢湖") == tool.invoke("巢湖")
+    assert tool.calls == 2
+
+
+def test_percentile_handles_empty_and_tail():
+    assert bench_load.pct([], 0.95) == 0.0
+    samples = [float(i) for i in range(1, 101)]
+    assert bench_load.pct(samples, 0.5) == 51.0
+    assert bench_load.pct(samples, 0.99) == 100.0
+
+
+def _level(**overrides):
+    level = {"mode": "chat", "concurrency": 8, "throughput": 10.0, "p95": 1.0, "ttft_p95": 0.0,
+             "mem_peak_mb": 100.0, "failed": 0}
+    level.update(overrides)
+    return level
+
+
+@pytest.mark.parametrize("overrides", [
+    {"throughput": 7.5},
+    {"p95": 1.3},
+    {"mem_peak_mb": 130.0},
+    {"failed": 1},
+])
+def test_compare_flags_regressions_beyond_tolerance(overrides):
+    assert len(bench_load.compare([_level(**overrides)], [_level()], tolerance=0.2)) == 1
+
+
+def test_compare_ignores_noise_and_unknown_levels():
+    assert bench_load.compare([_level(throughput=9.0, p95=1.1)], [_level()], tolerance=0.2) == []
+    assert bench_load.compare([_level(concurrency=64, p95=9.0)], [_level()], tolerance=0.2) == []
@@ -0,0 +1,71 @@
+import threading
+
+from intent_router import ALIAS_QUERY, ENTITY_QUERY, EntityDictionary, IntentRouter
+
+ENTITIES = [
+    {"label": "Lake", "name": "巢湖"},
+    {"label": "Poem", "name": "《泛巢湖》"},
+    {"label": "Gazetteer", "name": " 庐州府志 "},
+]
+ALIASES = [{"alias": "焦湖", "name": "巢湖"}]
+
+
+class Graph:
+    """按语句返回行，并记录收到的参数"""
+
+    def __init__(self):
+        self.params = []
+
+    def query(self, cypher, params=None):
+        if cypher == ENTITY_QUERY:
+            return ENTITIES
+        if cypher == ALIAS_QUERY:
+            return ALIASES
+        self.params.append(params)
+        if "$poem" in cypher:
+            return [{"lake": "巢湖"}] if params["poem"] == "《泛巢湖》" else []
+        if "$source" in cypher:
+            return [{"lake": "巢湖", "location": "安徽"}] if params["source"] == " 庐州府志 " else []
+        if "$lake" in cypher:
+            return [{"lake": params["lake"], "location": "安徽"}, {"poem": "《泛巢湖》"}][:1]
+        return []
+
+
+def test_dictionary_matches_without_brackets_and_keeps_original_name():
+    dictionary = EntityDictionary()
+    for row in ENTITIES:
+        dictionary.add(row["label"], row["name"])
+    dictionary.add("Lake", "焦湖", "巢湖")
+    assert [name for name, _ in dictionary.find("泛巢湖提到了哪些湖")] == ["泛巢湖"]
+    assert dictionary.canonical("泛巢湖", "Poem") == "《泛巢湖》"
+    assert dictionary.canonical("庐州府志", "Gazetteer") == " 庐州府志 "
+    assert dictionary.canonical("焦湖") == "巢湖"
+
+
+def test_routed_queries_bind_original_graph_names():
+    graph = Graph()
+    router = IntentRouter(graph.query)
+    poem = router.answer("《泛巢湖》里写了哪个湖")
+    assert poem["intent"] == "lakes_in_poem" and graph.params[-1]["poem"] == "《泛巢湖》"
+    assert poem["result"].startswith("《泛巢湖》提到")
+    gazetteer = router.answer("庐州府志记载了哪些湖")
+    assert gazetteer["intent"] == "lakes_in_gazetteer" and graph.params[-1]["source"] == " 庐州府志 "
+    location = router.answer("焦湖在哪里")
+    assert location["intent"] == "lake_location" and graph.params[-1]["lake"] == "巢湖"
+
+
+def test_unmatched_question_falls_back():
+    router = IntentRouter(Graph().query)
+    assert router.answer("今天天气怎么样") is None
+    assert router.stats()["fallback"] == 1
+
+
+def test_stats_are_exact_under_concurrency():
+    router = IntentRouter(Graph().query)
+    router.load()
+    threads = [threading.Thread(target=lambda: [router.answer("焦湖在哪里") for _ in range(200)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert router.stats()["routed"] == 1600
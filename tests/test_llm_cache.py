@@ -0,0 +1,74 @@
+from langchain_core.outputs import Generation
+
+from fakes import FakeChatModel
+from llm_cache import DiskLLMCache, with_cache
+
+
+def test_repeated_prompt_is_served_from_disk_across_restarts(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    llm = with_cache(FakeChatModel(latency=0, tokens_per_second=0), DiskLLMCache(path))
+    first = llm.invoke("巢湖在哪里").content
+    llm.invoke("巢湖在哪里")
+    assert llm.calls == 1
+
+    restarted = with_cache(FakeChatModel(latency=0, tokens_per_second=0), DiskLLMCache(path))
+    assert restarted.invoke("巢湖在哪里").content == first
+    assert restarted.calls == 0
+    assert restarted.cache.stats()["hit_rate"] == 1.0
+
+
+def test_call_parameters_are_part_of_the_key(tmp_path):
+    llm = with_cache(FakeChatModel(latency=0, tokens_per_second=0), DiskLLMCache(str(tmp_path / "llm_cache.db")))
+    llm.invoke("巢湖在哪里")
+    llm.invoke("巢湖在哪里", stop=["。"])
+    llm.invoke("巢湖在哪里？")
+    assert llm.calls == 3
+
+
+def test_structured_output_round_trips(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    llm = with_cache(FakeChatModel(latency=0, tokens_per_second=0), DiskLLMCache(path))
+    message = llm.bind_tools([{"type": "function", "function": {"name": "StructuralChunks", "parameters": {}}}]) \
+        .invoke("把下面的文本切分成结构化片段：巢湖。在合肥县东南。")
+    restarted = with_cache(FakeChatModel(latency=0, tokens_per_second=0), DiskLLMCache(path))
+    cached = restarted.bind_tools([{"type": "function", "function": {"name": "StructuralChunks", "parameters": {}}}]) \
+        .invoke("把下面的文本切分成结构化片段：巢湖。在合肥县东南。")
+    assert restarted.calls == 0
+    assert cached.tool_calls == message.tool_calls
+
+
+def test_lru_eviction_by_entries(tmp_path):
+    cache = DiskLLMCache(str(tmp_path / "llm_cache.db"), max_entries=3, evict_batch=1)
+    for i in range(3):
+        cache.update(f"p{i}", "m", [Generation(text=str(i))])
+    assert cache.lookup("p0", "m")[0].text == "0"  # p0 变为最近访问
+    cache.update("p3", "m", [Generation(text="3")])
+    assert cache.lookup("p1", "m") is None
+    assert cache.lookup("p0", "m") is not None and cache.lookup("p3", "m") is not None
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 2
+
+
+
+def test_byte_limit_eviction_and_running_totals(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = DiskLLMCache(path, max_bytes=300, evict_batch=1)
+    for i in range(5):
+        cache.update(f"p{i}", "m", [Generation(text="湖" * 20)])
+    cache.update("p4", "m", [Generation(text="湖" * 20)])  # 覆盖已有的键不重复计数
+    stats = cache.stats()
+    assert stats["bytes"] <= 300 and stats["evictions"] >= 1
+    assert (cache._count, cache._bytes) == (stats["entries"], stats["bytes"])
+    assert cache.lookup("p4", "m") is not None and cache.lookup("p0", "m") is None
+    reopened = DiskLLMCache(path, max_bytes=300)
+    assert (reopened._count, reopened._bytes) == (stats["entries"], stats["bytes"])
+
+
+def test_writes_do_not_scan_the_table(tmp_path):
+    cache = DiskLLMCache(str(tmp_path / "llm_cache.db"), max_entries=1000)
+    statements = []
+    cache._conn().set_trace_callback(statements.append)
+    for i in range(10):
+        cache.update(f"p{i}", "m", [Generation(text=str(i))])
+    assert not any("count(*)" in statement for statement in statements)
+    cache.clear()
+    assert cache._count == cache._bytes == 0
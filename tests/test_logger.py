@@ -0,0 +1,59 @@
+import io
+import json
+import logging
+
+import logger
+
+
+def _capture(monkeypatch, asynchronous=False, fmt="text"):
+    stream = io.StringIO()
+    writer = logger._Writer(stream, fmt, asynchronous)
+    monkeypatch.setattr(logger, "_writer", writer)
+    return stream, writer
+
+
+def test_disabled_level_writes_nothing(monkeypatch):
+    stream, _ = _capture(monkeypatch)
+    monkeypatch.setattr(logger, "_threshold", logging.WARNING)
+    log = logger.StructuredLogger("kg.test")
+    log.debug("调试", query="巢湖")
+    log.info("信息", query="巢湖")
+    log.warning("警告", query="巢湖")
+    assert stream.getvalue().count("\n") == 1
+    assert "WARNING kg.test 警告 query='巢湖'" in stream.getvalue()
+
+
+def test_json_format_includes_fields_and_clips_long_values(monkeypatch):
+    stream, _ = _capture(monkeypatch, fmt="json")
+    monkeypatch.setattr(logger, "_threshold", logging.INFO)
+    logger.StructuredLogger("kg.test").info("✅ 搜索完成", result="湖" * 500, seconds=0.5)
+    payload = json.loads(stream.getvalue())
+    assert payload["event"] == "✅ 搜索完成" and payload["level"] == "INFO" and payload["seconds"] == 0.5
+    assert len(payload["result"]) == logger.MAX_FIELD_CHARS + 3
+
+
+def test_error_with_exc_info_includes_traceback(monkeypatch):
+    stream, _ = _capture(monkeypatch)
+    monkeypatch.setattr(logger, "_threshold", logging.INFO)
+    try:
+        raise ValueError("坏数据")
+    except ValueError:
+        logger.StructuredLogger("kg.test").error("❌ 出错", exc_info=True)
+    assert "ValueError: 坏数据" in stream.getvalue()
+
+
+def test_async_writer_flushes_everything_on_stop(monkeypatch):
+    stream, writer = _capture(monkeypatch, asynchronous=True)
+    monkeypatch.setattr(logger, "_threshold", logging.INFO)
+    log = logger.StructuredLogger("kg.test")
+    for i in range(1000):
+        log.info("消息", i=i)
+    writer.stop()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1000 and lines[-1].endswith("i=999")
+
+
+def test_set_level(monkeypatch):
+    monkeypatch.setattr(logger, "_threshold", logger._threshold)
+    logger.set_level("error")
+    assert logger._threshold == logging.ERROR
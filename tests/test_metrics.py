@@ -0,0 +1,105 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_counter_renders_each_label_set():
+    counter = Counter("demo_total", "演示计数", ["stage"])
+    counter.inc(stage="graph")
+    counter.inc(2, stage="graph")
+    counter.inc(stage="search")
+    assert counter.value(stage="graph") == 3
+    assert counter.value(stage="missing") == 0
+    assert counter.render() == [
+        "# HELP demo_total 演示计数",
+        "# TYPE demo_total counter",
+        'demo_total{stage="graph"} 3',
+        'demo_total{stage="search"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("demo_seconds", "演示耗时", ["node"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, node="a")
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{node="a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{node="a",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{node="a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_sum{node="a"} 6.05' in lines
+    assert 'demo_seconds_count{node="a"} 4' in lines
+    assert histogram.count(node="a") == 4
+    assert histogram.count(node="b") == 0
+
+
+def test_boundary_value_falls_into_its_own_bucket():
+    histogram = Histogram("edge_seconds", "边界", buckets=(1.0,))
+    histogram.observe(1.0)
+    assert "edge_seconds_bucket{le=\"1\"} 1" in histogram.render()
+
+
+def test_gauge_reads_lazily_and_skips_failures():
+    values = [1]
+    gauge = Gauge("demo_in_flight", "演示仪表", lambda: values[0])
+    values[0] = 7
+    assert gauge.render()[-1] == "demo_in_flight 7"
+    assert Gauge("broken", "取值失败", lambda: 1 / 0).render() == []
+
+
+def test_registry_reuses_metrics_and_replaces_gauges():
+    registry = MetricsRegistry()
+    first = registry.counter("reused_total", "复用")
+    assert registry.counter("reused_total", "复用") is first
+    registry.gauge("value", "仪表", lambda: 1)
+    registry.gauge("value", "仪表", lambda: 2, kind="counter")
+    text = registry.render()
+    assert "# TYPE value counter\nvalue 2\n" in text
+    assert text.endswith("\n")
+
+
+def test_step_timer_records_even_on_exception():
+    before = metrics.STEP_SECONDS.count(step="test_step")
+    try:
+        with metrics.step_timer("test_step"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    with metrics.step_timer("test_step"):
+        pass
+    assert metrics.STEP_SECONDS.count(step="test_step") == before + 2
+
+
+def test_timed_node_labels_status_for_sync_and_async():
+    @metrics.timed_node("test_sync")
+    def sync_node(state):
+        return {"workflow_steps": [{"status": "fallback"}]}
+
+    @metrics.timed_node("test_async")
+    async def async_node(state):
+        raise RuntimeError("boom")
+
+    before = metrics.NODE_SECONDS.count(node="test_sync", status="fallback")
+    assert sync_node({}) == {"workflow_steps": [{"status": "fallback"}]}
+    assert metrics.NODE_SECONDS.count(node="test_sync", status="fallback") == before + 1
+
+    before = metrics.NODE_SECONDS.count(node="test_async", status="exception")
+    try:
+        asyncio.run(async_node({}))
+    except RuntimeError:
+        pass
+    assert metrics.NODE_SECONDS.count(node="test_async", status="exception") == before + 1
+
+
+def test_metrics_endpoint_exposes_request_timings(agent):
+    import app
+    client = TestClient(app.app)
+    assert client.post("/api/chat", json={"query": "巢湖在哪里"}).status_code == 200
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE agent_request_seconds histogram" in response.text
+    assert "agent_node_seconds_bucket{" in response.text
+    assert "answer_cache_misses_total" in response.text
@@ -0,0 +1,60 @@
+from llmsplitter import OverlapStitcher, locate_chunk
+
+A = "巢湖在合肥县东南六十里，亦名焦湖，周围四百里。"
+B = "丹阳湖在当涂县东南七十九里，周三百余里，与石臼湖相连。"
+C = "石臼湖在溧水县西南，周二百余里，与丹阳湖相通。"
+TEXT = A + B + C
+
+
+def coarse(start, end):
+    return TEXT[start:end], start
+
+
+def test_locate_chunk_exact_and_fuzzy():
+    assert locate_chunk(TEXT, B) == (len(A), len(A) + len(B))
+    rendered = B.replace("，", ",")  # LLM 改了标点
+    start, end = locate_chunk(TEXT, rendered)
+    assert abs(start - len(A)) <= 2 and abs(end - (len(A) + len(B))) <= 2
+    assert locate_chunk(TEXT, "西湖在钱塘县西，三面环山，一面临城。") is None
+
+
+def test_overlap_is_emitted_once_even_when_rendered_differently():
+    stitcher = OverlapStitcher()
+    next_start = len(A) + len(B) - 10  # 第二个预分块从 B 的末尾 10 个字符开始
+    out = stitcher.stitch(TEXT[:len(A) + len(B)], 0, next_start, [A, B])
+    out += stitcher.stitch(TEXT[next_start:], next_start, None, [B[-10:].replace("，", ","), C])
+    assert [content for content, _, _ in out] == [A, B, C]
+    assert stitcher.stats()["duplicates"] == 1
+
+
+def test_mostly_covered_chunk_is_trimmed_to_new_text():
+    stitcher = OverlapStitcher()
+    stitcher.stitch(TEXT, 0, None, [A, B[:-9]])
+    out = stitcher.stitch(TEXT, 0, None, [A + B])  # 只有末尾 9 个字符是新的（不足 20%）
+    assert out == [(B[-9:], len(A) + len(B) - 9, len(A) + len(B))]
+    assert stitcher.stats()["trimmed"] == 1
+
+
+def test_truncated_tail_in_overlap_is_deferred_to_next_chunk():
+    stitcher = OverlapStitcher()
+    cut = len(A) + 8
+    first_text, first_start = TEXT[:cut], 0
+    out = stitcher.stitch(first_text, first_start, len(A), [A, B[:8]])
+    assert [content for content, _, _ in out] == [A]
+    assert stitcher.stats()["deferred"] == 1
+    out = stitcher.stitch(TEXT[len(A):], len(A), None, [B, C])
+    assert [content for content, _, _ in out] == [B, C]
+
+
+def test_unlocated_chunks_are_deduplicated_by_content():
+    stitcher = OverlapStitcher()
+    other = "西湖在钱塘县西，三面环山，一面临城。"
+    out = stitcher.stitch(TEXT, 0, None, [other]) + stitcher.stitch(TEXT, 0, None, [other])
+    assert out == [(other, None, None)]
+    assert stitcher.stats()["unlocated"] == 1
+
+
+def test_resumed_stitcher_skips_already_committed_text():
+    stitcher = OverlapStitcher(covered_until=len(A) + len(B))
+    out = stitcher.stitch(TEXT[len(A):], len(A), None, [B, C])
+    assert [content for content, _, _ in out] == [C]
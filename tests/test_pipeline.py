@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import pipeline
+from fakes import FakeChatModel
+from pipeline import run_pipeline
+
+TEXT = "".join(f"第{i}段。巢湖在庐州府东南，周四百余里，港汊大小三百六十。\n" for i in range(60))
+
+
+class Interrupted(Exception):
+    pass
+
+
+def llm():
+    return FakeChatModel(latency=0, tokens_per_second=0)
+
+
+def run(tmp_path, llm, **kwargs):
+    options = dict(chunks_out=str(tmp_path / "chunks.jsonl"), extract_enabled=False, chunk_size=200,
+                   chunk_overlap=40, batch_size=1, max_concurrency=1, commit_every=1, rule_threshold=None)
+    options.update(kwargs)
+    return run_pipeline(str(tmp_path / "data.txt"), llm, **options)
+
+
+def chunk_texts(tmp_path):
+    with open(tmp_path / "chunks.jsonl", encoding="utf-8") as f:
+        return [json.loads(line)["page_content"] for line in f]
+
+
+@pytest.fixture
+def data(tmp_path):
+    (tmp_path / "data.txt").write_text(TEXT, encoding="utf-8")
+    return tmp_path
+
+
+def interrupted_run(monkeypatch, tmp_path, commits=3, **kwargs):
+    """提交 commits 次之后中断，留下未完成的检查点"""
+    original = pipeline.Committer.commit
+    done = []
+
+    def commit(self, items):
+        if len(done) >= commits:
+            raise Interrupted()
+        original(self, items)
+        done.append(items)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pipeline.Committer, "commit", commit)
+        with pytest.raises(Interrupted):
+            run(tmp_path, llm(), **kwargs)
+
+
+def test_resume_from_checkpoint_matches_uninterrupted_run(monkeypatch, data):
+    run(data, llm())
+    expected = chunk_texts(data)
+
+    interrupted_run(monkeypatch, data, restart=True)
+    checkpoint = json.loads((data / "data.txt.checkpoint.json").read_text(encoding="utf-8"))
+    assert checkpoint["committed_coarse_id"] >= 0 and not checkpoint.get("finished")
+
+    final = run(data, llm())
+    assert final["finished"]
+    assert chunk_texts(data) == expected
+
+
+@pytest.mark.parametrize("change", [{"rule_threshold": 0.5}, {"extract_enabled": True, "extract_mode": "merged"},
+                                   {"convert": True}, {"chunk_overlap": 20}])
+def test_changed_output_option_requires_restart(monkeypatch, data, change):
+    interrupted_run(monkeypatch, data, commits=1)
+    with pytest.raises(ValueError, match="--restart"):
+        run(data, llm(), **change)
+
+
+def test_convert_config_is_part_of_the_run_config(monkeypatch, data):
+    interrupted_run(monkeypatch, data, commits=1, convert=True)
+    with pytest.raises(ValueError, match="--restart"):
+        run(data, llm(), convert=True, convert_config="t2tw")
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from bench_query_routing import LABELLED
+from query_classifier import ROUTE_BOTH, ROUTE_GRAPH, ROUTE_SEARCH, QueryClassifier, parse_route
+
+_ENTITIES = [("巢湖", "Lake"), ("丹阳湖", "Lake"), ("西湖", "Lake"), ("合肥志", "Gazetteer"), ("饮湖上初晴后雨", "Poem")]
+
+
+def _find(question):
+    return [(name, label) for name, label in _ENTITIES if name in question]
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("安东县所在的省份", ROUTE_SEARCH),
+    ("巢湖今天的天气怎么样", ROUTE_SEARCH),  # 实时信息即使提到图谱中的湖也只搜索
+    ("合肥志上记载有哪些湖？", ROUTE_GRAPH),
+    ("有哪些诗词提到了巢湖？", ROUTE_GRAPH),
+    ("巢湖在哪里", ROUTE_BOTH),
+    ("饮湖上初晴后雨的作者是谁", ROUTE_BOTH),
+])
+def test_rule_routes(question, expected):
+    assert QueryClassifier(_find).rule(question) == expected
+
+
+def test_rule_accuracy_on_labelled_set():
+    classifier = QueryClassifier(_find)
+    ruled = [(classifier.rule(q), e) for q, e in LABELLED if classifier.rule(q) is not None]
+    assert len(ruled) >= len(LABELLED) * 0.8
+    assert sum(1 for route, expected in ruled if route == expected) == len(ruled)
+
+
+def test_rule_works_without_entity_dictionary():
+    classifier = QueryClassifier(lambda question: [])
+    assert classifier.rule("合肥志上记载有哪些湖？") == ROUTE_GRAPH
+    assert classifier.rule("安东县所在的省份") == ROUTE_SEARCH
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("graph", ROUTE_GRAPH),
+    (" Search\n", ROUTE_SEARCH),
+    ("分类: both", ROUTE_BOTH),
+    ("search 和 graph", ROUTE_BOTH),
+    ("不知道", None),
+    ("", None),
+])
+def test_parse_route(text, expected):
+    assert parse_route(text) == expected
+
+
+def test_llm_fallback_only_when_rules_are_silent():
+    prompts = []
+
+    def llm(prompt):
+        prompts.append(prompt)
+        return "graph"
+
+    classifier = QueryClassifier(_find)
+    assert classifier.classify("安东县所在的省份", llm) == (ROUTE_SEARCH, "rule")
+    assert prompts == []
+    assert classifier.classify("随便聊聊", llm) == (ROUTE_GRAPH, "llm")
+    assert "随便聊聊" in prompts[0]
+
+
+def test_unparseable_or_missing_llm_defaults_to_both():
+    classifier = QueryClassifier(_find)
+    assert classifier.classify("随便聊聊", lambda prompt: "") == (ROUTE_BOTH, "default")
+    assert classifier.classify("随便聊聊") == (ROUTE_BOTH, "default")
+
+
+def test_async_classify_matches_sync():
+    async def allm(prompt):
+        return "search"
+
+    classifier = QueryClassifier(_find)
+    assert asyncio.run(classifier.aclassify("随便聊聊", allm)) == (ROUTE_SEARCH, "llm")
+    assert asyncio.run(classifier.aclassify("巢湖在哪里", allm)) == (ROUTE_BOTH, "rule")
+
+
+def test_llm_failure_falls_back_to_both(agent, monkeypatch):
+    def broken_llm():
+        raise RuntimeError("LLM 不可用")
+
+    monkeypatch.setattr(agent, "get_llm", broken_llm)
+    assert agent.query_classifier.classify("随便聊聊", agent._classify_llm) == (ROUTE_BOTH, "default")
+
+
+def test_search_only_question_skips_graph(agent):
+    tool = agent.get_search_tool()
+    calls = tool.calls
+    result = agent.run_agent("安东县所在的省份", use_cache=False)
+    assert result["route"] == ROUTE_SEARCH
+    assert result["graph_result"] == ""
+    assert tool.calls == calls + 1
+
+
+def test_graph_only_question_skips_search(agent):
+    tool = agent.get_search_tool()
+    calls = tool.calls
+    result = agent.run_agent("合肥志上记载有哪些湖？", use_cache=False)
+    assert result["route"] == ROUTE_GRAPH
+    assert result["search_result"] == ""
+    assert tool.calls == calls
+
+
+def test_routing_disabled_runs_both_branches(agent, monkeypatch):
+    monkeypatch.setattr(agent, "QUERY_ROUTING_ENABLED", False)
+    tool = agent.get_search_tool()
+    calls = tool.calls
+    result = agent.run_agent("合肥志上记载有哪些湖？", use_cache=False)
+    assert result["route"] == ROUTE_BOTH
+    assert result["graph_result"] and tool.calls == calls + 1
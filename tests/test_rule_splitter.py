@@ -0,0 +1,54 @@
+from concurrency import AdaptiveRunner
+from fakes import FakeChatModel
+from llmsplitter import LLMStructuralTextSplitter, split_coarse_chunks
+from rulesplitter import HEADING, POEM, PROSE, TITLE, VOLUME, RuleStructuralTextSplitter, classify_line
+
+STRUCTURED = """永乐大典卷之二千二百六十八【六模】
+巢湖
+《合肥志》
+在合肥县东南六十里。亦名焦湖。周围四百里。
+泛巢湖
+罗隐诗
+借得扁舟弄水光，巢湖风景胜潇湘。
+波摇远岸青山动，浪卷平沙白鸟翔。
+"""
+
+
+def test_classify_line():
+    assert classify_line("永乐大典卷之二千二百六十八")[0] == VOLUME
+    assert classify_line("巢湖")[0] == HEADING
+    assert classify_line("《合肥志》")[0] == TITLE
+    assert classify_line("罗隐诗")[0] == TITLE
+    assert classify_line("借得扁舟弄水光，巢湖风景胜潇湘。") == (POEM, 0.95)
+    assert classify_line("在合肥县东南六十里。亦名焦湖。")[0] == PROSE
+
+
+def test_headings_attach_to_text_and_poems_stay_whole():
+    chunks, confidence = RuleStructuralTextSplitter().split_with_confidence(STRUCTURED)
+    assert chunks == [
+        "永乐大典卷之二千二百六十八【六模】",
+        "巢湖\n《合肥志》\n在合肥县东南六十里。亦名焦湖。周围四百里。",
+        "泛巢湖\n罗隐诗\n借得扁舟弄水光，巢湖风景胜潇湘。\n波摇远岸青山动，浪卷平沙白鸟翔。",
+    ]
+    assert confidence >= 0.85
+    assert all(chunk in STRUCTURED for chunk in chunks)  # 每块都是原文的连续片段
+
+
+def test_ambiguous_text_has_low_confidence():
+    text = "湖之东有山其上多松柏其下多竹林往来者络绎不绝而未尝有记之者也故录于此"
+    assert RuleStructuralTextSplitter().split_with_confidence(text)[1] < 0.5
+    assert RuleStructuralTextSplitter().split_with_confidence("")[0] == []
+
+
+def test_confident_chunks_skip_the_llm():
+    llm = FakeChatModel(latency=0, tokens_per_second=0)
+    runner = AdaptiveRunner(name="split")
+    ambiguous = "湖之东有山其上多松柏其下多竹林往来者络绎不绝而未尝有记之者也故录于此"
+    results, rule_count = split_coarse_chunks([STRUCTURED, ambiguous], LLMStructuralTextSplitter(llm=llm), runner,
+                                              RuleStructuralTextSplitter(), rule_threshold=0.8)
+    assert rule_count == 1 and llm.calls == 1
+    assert len(results[0].chunks) == 3
+    results, rule_count = split_coarse_chunks([STRUCTURED], LLMStructuralTextSplitter(llm=llm), runner,
+                                              RuleStructuralTextSplitter(), rule_threshold=1.01)
+    assert rule_count == 0 and llm.calls == 2
+    runner.close()
@@ -0,0 +1,271 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import types
+
+import pytest
+
+import search_service
+from fakes import FakeSearchTool, serve_fake_search
+from search_service import DuckDuckGoBackend, HttpSearchBackend, SearchCache, SearchError, SearchService, ToolSearchBackend, make_snippet
+
+
+class _Backend:
+    """延迟、结果可配置的后端；release 事件用于让卡住的调用在测试结束时退出"""
+
+    def __init__(self, name, delay=0.0, snippets=None, error=None):
+        self.name = name
+        self.delay = delay
+        self.snippets = [make_snippet(f"{name} 的结果", source=name)] if snippets is None else snippets
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    def search(self, query):
+        self.calls += 1
+        self.release.wait(self.delay)
+        if self.error:
+            raise self.error
+        return self.snippets
+
+
+@pytest.fixture
+def backends():
+    created = []
+
+    def make(*args, **kwargs):
+        backend = _Backend(*args, **kwargs)
+        created.append(backend)
+        return backend
+
+    yield make
+    for backend in created:
+        backend.release.set()
+
+
+def test_fast_primary_is_not_hedged(backends):
+    primary, secondary = backends("primary", delay=0.01), backends("secondary")
+    service = SearchService([primary, secondary], deadline=2, hedge_delay=0.5)
+    assert service.search("巢湖")[0]["source"] == "primary"
+    assert secondary.calls == 0
+    assert service.stats()["hedged"] == 0
+
+
+def test_slow_primary_is_hedged_after_delay(backends):
+    primary, secondary = backends("primary", delay=5), backends("secondary", delay=0.01)
+    service = SearchService([primary, secondary], deadline=2, hedge_delay=0.1)
+    start = time.perf_counter()
+    assert service.search("巢湖")[0]["source"] == "secondary"
+    assert 0.1 <= time.perf_counter() - start < 0.5
+    stats = service.stats()
+    assert stats["hedged"] == 1 and stats["wins"] == {"secondary": 1}
+
+
+def test_failed_primary_launches_next_immediately(backends):
+    primary = backends("primary", error=RuntimeError("boom"))
+    secondary = backends("secondary", delay=0.01)
+    service = SearchService([primary, secondary], deadline=2, hedge_delay=10)
+    start = time.perf_counter()
+    assert service.search("巢湖")[0]["source"] == "secondary"
+    assert time.perf_counter() - start < 0.5
+
+
+def test_zero_hedge_delay_races_all_backends(backends):
+    primary, secondary = backends("primary", delay=0.2), backends("secondary", delay=0.01)
+    service = SearchService([primary, secondary], deadline=2, hedge_delay=0)
+    assert service.search("巢湖")[0]["source"] == "secondary"
+    assert primary.calls == 1
+
+
+def test_deadline_raises_search_error(backends):
+    stuck = backends("stuck", delay=5)
+    service = SearchService([stuck], deadline=0.2)
+    start = time.perf_counter()
+    with pytest.raises(SearchError, match="超时"):
+        service.search("巢湖")
+    assert time.perf_counter() - start < 0.6
+    assert service.stats()["timeouts"] == 1
+
+
+def test_async_deadline_raises_search_error(backends):
+    stuck = backends("stuck", delay=5)
+    service = SearchService([stuck], deadline=0.2)
+    with pytest.raises(SearchError):
+        asyncio.run(service.asearch("巢湖"))
+
+
+def test_all_backends_failing_raises(backends):
+    service = SearchService([backends("a", error=RuntimeError("boom")), backends("b", error=RuntimeError("down"))],
+                            deadline=2, hedge_delay=0)
+    with pytest.raises(SearchError, match="boom"):
+        service.search("巢湖")
+    assert service.stats()["failures"] == 1
+
+
+def test_empty_result_is_not_an_error(backends):
+    service = SearchService([backends("empty", snippets=[])], deadline=2)
+    assert service.search("巢湖") == []
+    assert service.stats()["empty"] == 1
+
+
+def test_busy_backend_is_skipped(backends):
+    slow, other = backends("slow", delay=5), backends("other", delay=0.01)
+    service = SearchService([slow, other], deadline=0.3, hedge_delay=10, max_in_flight=1)
+    with pytest.raises(SearchError):
+        service.search("第一个问题")  # 只发出 slow（对冲延迟很长），截止时间到了仍在途
+    start = time.perf_counter()
+    assert service.search("第二个问题")[0]["source"] == "other"  # slow 已满，直接跳到下一个
+    assert time.perf_counter() - start < 0.2
+    assert slow.calls == 1
+
+
+def test_async_search_matches_sync(backends):
+    primary, secondary = backends("primary", delay=5), backends("secondary", delay=0.01)
+    service = SearchService([primary, secondary], deadline=2, hedge_delay=0.05)
+    assert asyncio.run(service.asearch("巢湖"))[0]["source"] == "secondary"
+
+
+def test_cache_hits_survive_restart_and_skip_empty(backends, tmp_path):
+    path = str(tmp_path / "search.db")
+    backend = backends("primary")
+    SearchService([backend], cache=SearchCache(path), deadline=2).search("巢湖在哪里")
+    restarted = SearchService([backend], cache=SearchCache(path), deadline=2)
+    assert restarted.search("  巢湖在哪里？")[0]["source"] == "primary"
+    assert backend.calls == 1
+    assert restarted.stats()["cache_hits"] == 1
+
+    empty = backends("empty", snippets=[])
+    service = SearchService([empty], cache=SearchCache(path), deadline=2)
+    service.search("没有结果")
+    service.search("没有结果")
+    assert empty.calls == 2
+
+
+def test_async_search_waits_for_locked_cache_off_the_event_loop(backends, tmp_path):
+    path = str(tmp_path / "search.db")
+    service = SearchService([backends("primary")], cache=SearchCache(path), deadline=2)
+    locker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    locker.execute("BEGIN IMMEDIATE")  # 另一个 worker 正持有写锁
+    threading.Timer(0.4, locker.commit).start()
+
+    async def scenario():
+        gaps, done = [], asyncio.Event()
+
+        async def ticker():
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.01)
+                gaps.append(time.perf_counter() - last)
+                last = time.perf_counter()
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        snippets = await service.asearch("巢湖")
+        elapsed = time.perf_counter() - start
+        done.set()
+        await task
+        return snippets, elapsed, max(gaps)
+
+    snippets, elapsed, gap = asyncio.run(scenario())
+    locker.close()
+    assert snippets[0]["source"] == "primary"
+    assert elapsed >= 0.3  # 写入缓存等到了写锁释放
+    assert gap < 0.1
+
+
+def test_cache_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_service, "time", types.SimpleNamespace(time=lambda: now[0], monotonic=time.monotonic))
+    cache = SearchCache(str(tmp_path / "search.db"), ttl_seconds=60)
+    cache.put("巢湖", [make_snippet("巢湖位于安徽省")])
+    now[0] += 59
+    assert cache.get("巢湖") is not None
+    now[0] += 2
+    assert cache.get("巢湖") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_cleanup_evicts_oldest_beyond_max_entries(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_service, "time", types.SimpleNamespace(time=lambda: now[0], monotonic=time.monotonic))
+    cache = SearchCache(str(tmp_path / "search.db"), max_entries=2, cleanup_every=4)
+    for i in range(4):
+        now[0] += 1
+        cache.put(f"问题{i}", [make_snippet("结果")])
+    assert cache.stats()["entries"] == 2
+    assert cache.get("问题0") is None and cache.get("问题3") is not None
+
+
+def test_tool_backend_splits_text_into_snippets():
+    snippets = ToolSearchBackend(lambda: FakeSearchTool(latency=0)).search("巢湖")
+    assert snippets and all(s["source"] == "duckduckgo" for s in snippets)
+
+
+def test_duckduckgo_backend_passes_timeout_to_ddgs(monkeypatch):
+    import ddgs
+    created = []
+
+    class FakeDDGS:
+        def __init__(self, timeout=5):
+            created.append(timeout)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def text(self, query, **kwargs):
+            assert kwargs["max_results"] == 3
+            return [{"title": "巢湖", "body": f"{query} 位于安徽省中部", "href": "https://example.com"}, {"title": "空"}]
+
+    monkeypatch.setattr(ddgs, "DDGS", FakeDDGS)
+    snippets = DuckDuckGoBackend(max_results=3, timeout=2.5).search("巢湖")
+    assert created == [3]
+    assert snippets == [make_snippet("巢湖 位于安徽省中部", "巢湖", "https://example.com", "duckduckgo")]
+
+
+def test_injected_search_tool_replaces_ddgs(agent):
+    backend = agent._make_search_backend("duckduckgo")
+    assert isinstance(backend, ToolSearchBackend)
+    agent.use_search_tool(None)
+    try:
+        assert isinstance(agent._make_search_backend("duckduckgo"), DuckDuckGoBackend)
+    finally:
+        agent.use_search_tool(FakeSearchTool(latency=0))
+
+
+def test_http_backend_parses_results():
+    url, server = serve_fake_search(latency=0)
+    try:
+        snippets = HttpSearchBackend(url, timeout=2).search("巢湖")
+    finally:
+        server.shutdown()
+    assert [s["title"] for s in snippets] == ["巢湖", "巢湖市"]
+    assert snippets[0]["url"] == "https://example.com/chaohu"
+
+
+def test_service_requires_a_backend():
+    with pytest.raises(ValueError):
+        SearchService([])
+
+
+def test_stats_report_unconfigured_backend(agent, monkeypatch):
+    monkeypatch.setattr(agent, "SEARCH_BACKENDS", "http")
+    monkeypatch.setattr(agent, "SEARCH_HTTP_URL", "")
+    agent.use_search_service(None)
+    try:
+        assert agent.search_service_stats()["status"] == "unconfigured"
+    finally:
+        agent.use_search_service(None)
+
+
+def test_empty_search_is_a_completed_step(agent, backends):
+    agent.use_search_service(SearchService([backends("empty", snippets=[])], deadline=2))
+    try:
+        update = agent.search_engine({"query": "巢湖"})
+    finally:
+        agent.use_search_service(None)
+    assert update["workflow_steps"][0]["status"] == "completed"
+    assert update["search_snippets"] == []
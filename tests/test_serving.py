@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import signal
+import sqlite3
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from serving import AdmissionController, SharedGeneration
+from session_store import SQLiteSessionStore
+
+
+@pytest.fixture
+def app_module(agent):
+    import app
+    app.admission.draining = False
+    app.admission.in_flight = 0
+    yield app
+    app.admission.draining = False
+    app.admission.in_flight = 0
+
+
+def test_admission_rejects_when_full():
+    admission = AdmissionController(max_in_flight=2, retry_after=5)
+    assert admission.try_acquire() and admission.try_acquire()
+    assert not admission.try_acquire()
+    admission.release()
+    assert admission.try_acquire()
+    assert admission.rejected == 1
+
+
+def test_wait_idle_returns_when_last_request_releases():
+    admission = AdmissionController(max_in_flight=4, retry_after=5)
+
+    async def scenario():
+        admission.try_acquire()
+        asyncio.get_running_loop().call_later(0.05, admission.release)
+        return await admission.wait_idle(timeout=2)
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_wait_idle_times_out():
+    admission = AdmissionController(max_in_flight=4, retry_after=5)
+    admission.try_acquire()
+    assert asyncio.run(admission.wait_idle(timeout=0.05)) is False
+
+
+def test_busy_worker_returns_429(app_module):
+    app_module.admission.in_flight = app_module.admission.max_in_flight
+    response = TestClient(app_module.app).post("/api/chat", json={"query": "巢湖在哪里"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(app_module.admission.retry_after)
+
+
+def test_request_during_drain_returns_503(app_module):
+    client = TestClient(app_module.app)
+    assert client.post("/api/chat", json={"query": "巢湖在哪里"}).json()["success"]
+    app_module.admission.start_draining()
+    for path in ("/api/chat", "/api/chat/stream"):
+        response = client.post(path, json={"query": "巢湖在哪里"})
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+
+
+def test_sigterm_drains_in_flight_requests_before_shutdown(app_module):
+    admission = app_module.admission
+    forwarded = []
+    original = signal.signal(signal.SIGTERM, lambda signum, frame: forwarded.append(signum))
+
+    async def scenario():
+        app_module.install_drain_handler(asyncio.get_running_loop())
+        assert admission.try_acquire()  # 一个进行中的请求
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.sleep(0.05)
+        assert admission.draining
+        assert not admission.try_acquire()  # 排空期间的新请求被拒绝（503）
+        assert forwarded == []  # 进行中的请求未结束，还没有交给 uvicorn 关闭
+        admission.release()
+        await asyncio.sleep(0.05)
+        assert forwarded == [signal.SIGTERM]
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+
+def test_shared_generation_broadcasts_to_other_workers(tmp_path):
+    path = str(tmp_path / "generation.json")
+    worker_a, worker_b = SharedGeneration(path), SharedGeneration(path)
+    assert worker_b.poll() == []
+    worker_a.bump("cache")
+    assert worker_a.poll() == []  # 自己发起的失效已在本地执行
+    assert worker_b.poll() == ["cache"]
+    assert worker_b.poll() == []
+    worker_b.bump("schema")
+    assert worker_a.poll() == ["schema"]
+
+
+def test_invalidate_in_one_worker_clears_answer_cache_in_others(app_module, tmp_path):
+    app_module.answer_cache.put("巢湖在哪里", {"final_answer": "旧答案", "workflow_steps": []})
+    other_worker = SharedGeneration(app_module.shared_generation.path)
+    other_worker.bump("cache")
+    TestClient(app_module.app).post("/api/chat", json={"query": "安东县所在的省份"})
+    assert app_module.answer_cache.get("巢湖在哪里") is None
+
+
+def test_invalidate_response_reports_worker_pid(app_module):
+    body = TestClient(app_module.app).post("/api/cache/invalidate").json()
+    assert body["success"] and body["pid"] == os.getpid()
+
+
+def test_stream_does_not_block_event_loop(app_module, tmp_path, monkeypatch):
+    """另一个 worker 持有 SQLite 会话库的写锁时，记录会话的请求在线程池中等待，事件循环照常调度"""
+    path = str(tmp_path / "sessions.db")
+    monkeypatch.setattr(app_module, "session_store", SQLiteSessionStore(path))
+    locker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+
+    async def scenario():
+        gaps, done = [], asyncio.Event()
+
+        async def ticker():
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.01)
+                gaps.append(time.perf_counter() - last)
+                last = time.perf_counter()
+
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # 预热：首个请求的懒加载（模块导入、工作流编译）不计入事件循环的停顿
+            await client.post("/api/chat/stream", json={"query": "太湖在哪里", "session_id": "warmup"})
+            locker.execute("BEGIN IMMEDIATE")
+            threading.Timer(0.5, locker.commit).start()
+            task = asyncio.create_task(ticker())
+            start = time.perf_counter()
+            response = await client.post("/api/chat/stream", json={"query": "巢湖在哪里", "session_id": "locked"})
+            elapsed = time.perf_counter() - start
+            history = (await client.get("/api/chat/history/locked")).json()
+        done.set()
+        await task
+        return response, elapsed, max(gaps), history
+
+    response, elapsed, gap, history = asyncio.run(scenario())
+    locker.close()
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1]["type"] == "complete"
+    assert elapsed >= 0.4  # 确实等到了写锁释放
+    assert gap < 0.1
+    assert [m["type"] for m in history["data"]] == ["user", "assistant"]
@@ -0,0 +1,89 @@
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+import session_store
+from session_store import MemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store, "time", types.SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path, clock):
+    if request.param == "memory":
+        return MemorySessionStore(max_sessions=3, max_messages=5, idle_ttl=100)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), max_messages=5, idle_ttl=100, cleanup_interval=0)
+
+
+def fill(store, session_id, count):
+    for i in range(count):
+        store.append(session_id, {"role": "user", "content": str(i)})
+
+
+def contents(messages):
+    return [m["content"] for m in messages]
+
+
+def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_history_pagination(store):
+    fill(store, "s", 4)
+    messages, total = store.history("s", offset=1, limit=2)
+    assert contents(messages) == ["1", "2"] and total == 4
+    assert contents(store.history("s", offset=3)[0]) == ["3"]
+    assert store.history("missing") == ([], 0)
+
+
+def test_negative_offset_and_limit_are_clamped(store):
+    fill(store, "s", 4)
+    assert contents(store.history("s", offset=-2, limit=2)[0]) == ["0", "1"]
+    assert store.history("s", offset=0, limit=-1)[0] == []
+
+
+def test_max_messages_keeps_latest(store):
+    fill(store, "s", 8)
+    messages, total = store.history("s")
+    assert contents(messages) == ["3", "4", "5", "6", "7"] and total == 5
+
+
+def test_idle_sessions_expire(store, clock):
+    fill(store, "s", 2)
+    clock[0] += 101
+    assert store.history("s") == ([], 0)
+
+
+def test_memory_store_evicts_least_recently_used(clock):
+    store = MemorySessionStore(max_sessions=2)
+    fill(store, "a", 1)
+    fill(store, "b", 1)
+    store.history("a")  # a 变为最近访问
+    fill(store, "c", 1)
+    assert store.history("b") == ([], 0)
+    assert store.history("a")[1] == 1 and store.history("c")[1] == 1
+    assert store.stats()["evictions"] == 1
+
+
+def test_sqlite_store_survives_restart(tmp_path, clock):
+    path = str(tmp_path / "sessions.db")
+    fill(SQLiteSessionStore(path), "s", 3)
+    assert contents(SQLiteSessionStore(path).history("s")[0]) == ["0", "1", "2"]
+
+
+def test_history_endpoint_validates_and_echoes_page(agent):
+    import app
+    app.session_store.clear("page")
+    fill(app.session_store, "page", 3)
+    client = TestClient(app.app)
+    body = client.get("/api/chat/history/page", params={"offset": 1, "limit": 1}).json()
+    assert contents(body["data"]) == ["1"] and (body["offset"], body["limit"], body["total"]) == (1, 1, 3)
+    assert client.get("/api/chat/history/page", params={"offset": -1}).status_code == 422
+    assert client.get("/api/chat/history/page", params={"limit": -5}).status_code == 422
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, StreamFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"answer": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("q", work))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "shared": 4}
+
+
+def test_errors_are_shared_and_key_is_released():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("q", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert flight.do("q", lambda: "ok") == "ok"  # 失败后相同 key 重新执行
+    assert flight.stats()["executions"] == 2
+
+
+async def _events(flight, key, source, delay=0.0, take=None):
+    await asyncio.sleep(delay)
+    received = []
+    async for event in flight.subscribe(key, source):
+        received.append(event)
+        if take is not None and len(received) >= take:
+            break
+    return received
+
+
+def _source(count, interval, produced):
+    async def source():
+        for i in range(count):
+            await asyncio.sleep(interval)
+            produced.append(i)
+            yield i
+    return source
+
+
+def test_late_joiner_replays_all_events():
+    async def scenario():
+        flight = StreamFlight()
+        produced = []
+        source = _source(5, 0.02, produced)
+        first, late = await asyncio.gather(_events(flight, "q", source), _events(flight, "q", source, delay=0.05))
+        return flight, produced, first, late
+
+    flight, produced, first, late = asyncio.run(scenario())
+    assert first == late == [0, 1, 2, 3, 4]
+    assert produced == [0, 1, 2, 3, 4]  # 只执行一次
+    assert flight.stats()["executions"] == 1 and flight.stats()["shared"] == 1
+
+
+def test_finished_flight_is_not_reused():
+    async def scenario():
+        flight = StreamFlight()
+        produced = []
+        source = _source(2, 0, produced)
+        await _events(flight, "q", source)
+        await _events(flight, "q", source)
+        return flight, produced
+
+    flight, produced = asyncio.run(scenario())
+    assert produced == [0, 1, 0, 1]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_producer_is_cancelled_when_all_subscribers_leave():
+    async def scenario():
+        flight = StreamFlight()
+        produced = []
+        received = await _events(flight, "q", _source(50, 0.01, produced), take=2)
+        await asyncio.sleep(0.05)
+        return flight, produced, received
+
+    flight, produced, received = asyncio.run(scenario())
+    assert received == [0, 1]
+    assert len(produced) < 10
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_producer_error_reaches_every_subscriber():
+    async def failing():
+        yield 1
+        await asyncio.sleep(0.02)
+        raise RuntimeError("llm down")
+
+    async def scenario():
+        flight = StreamFlight()
+        return await asyncio.gather(_events(flight, "q", failing), _events(flight, "q", failing, delay=0.01),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_identical_questions_run_agent_once(agent):
+    from fakes import install_fakes
+    agent = install_fakes(llm_latency=0.05, tokens_per_second=100000.0, graph_latency=0.05, search_latency=0.05)
+    before = agent.inflight_agent.stats()["executions"]
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(agent.run_agent("巢湖在哪里", use_cache=False)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert agent.inflight_agent.stats()["executions"] == before + 1
+    assert len({result["final_answer"] for result in results}) == 1
+    assert len({id(result) for result in results}) == 4  # 每个调用方拿到自己的浅拷贝
+
+
+def test_identical_streams_share_one_execution(agent):
+    from fakes import install_fakes
+    agent = install_fakes(llm_latency=0.05, tokens_per_second=2000.0, graph_latency=0.05, search_latency=0.05)
+    before = agent.inflight_streams.stats()["executions"]
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        return [event async for event in agent.run_agent_stream("巢湖在哪里", use_cache=False)]
+
+    async def scenario():
+        return await asyncio.gather(consume(0), consume(0.03))
+
+    first, late = asyncio.run(scenario())
+    assert agent.inflight_streams.stats()["executions"] == before + 1
+    assert first[1:] == late[1:]  # 开始信号之后的事件来自同一次执行，后加入者完整回放
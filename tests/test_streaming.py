@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.fixture
+def slow_agent(agent):
+    from fakes import install_fakes
+    return install_fakes(llm_latency=0.2, tokens_per_second=200.0, graph_latency=0.2, search_latency=0.2)
+
+
+async def _max_loop_gap(coro, interval=0.01):
+    """执行 coro 期间事件循环两次调度之间的最大间隔"""
+    gaps = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    try:
+        result = await coro
+    finally:
+        done.set()
+        await task
+    return result, max(gaps)
+
+
+def test_stream_does_not_block_event_loop(slow_agent):
+    async def consume():
+        return [event async for event in slow_agent.run_agent_stream("巢湖在哪里", use_cache=False)]
+
+    events, gap = asyncio.run(_max_loop_gap(consume()))
+    assert events[-1]["type"] == "complete"
+    assert events[-1]["final_answer"]
+    assert gap < 0.1  # 搜索、图谱与 LLM 的阻塞调用各 0.2s，都不在事件循环线程中执行
+
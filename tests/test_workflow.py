@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def registry(agent):
+    """测试中注册的变体在结束后移除，默认工作流恢复为 active"""
+    names = set(agent._workflow_builders)
+    yield agent
+    for name in set(agent._workflow_builders) - names:
+        agent._workflow_builders.pop(name, None)
+        agent._compiled_workflows.pop(name, None)
+    agent.set_active_workflow(agent.DEFAULT_WORKFLOW)
+
+
+def test_workflow_is_compiled_once(registry):
+    assert registry.get_workflow() is registry.get_workflow(registry.DEFAULT_WORKFLOW)
+
+
+def test_concurrent_first_access_compiles_once(registry):
+    builds = []
+
+    def builder():
+        builds.append(1)
+        return registry.build_workflow()
+
+    registry._workflow_builders["lazy"] = builder
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_workflow("lazy"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_register_workflow_hot_swaps_active_variant(registry):
+    old = registry.get_workflow()
+    compiled = registry.register_workflow("variant", registry.build_workflow, activate=True)
+    assert registry.get_workflow() is compiled is not old
+    registry.set_active_workflow(registry.DEFAULT_WORKFLOW)
+    assert registry.get_workflow() is old
+
+
+def test_unknown_workflow_raises(registry):
+    with pytest.raises(KeyError):
+        registry.get_workflow("missing")
+    with pytest.raises(KeyError):
+        registry.set_active_workflow("missing")
+
+
+def test_run_agent_uses_compiled_workflow(registry):
+    result = registry.run_agent("巢湖在哪里", use_cache=False)
+    assert result["final_answer"]
+    assert registry.get_workflow() is registry.get_workflow()
+
+
+@pytest.fixture
+def slow_branches(agent):
+    """搜索与图谱查询各有 0.3s 延迟；串行执行时总耗时至少 0.6s"""
+    from fakes import install_fakes
+    return install_fakes(llm_latency=0.0, tokens_per_second=100000.0, graph_latency=0.3, search_latency=0.3)
+
+
+def test_sync_branches_run_in_parallel(slow_branches):
+    import time
+    start = time.perf_counter()
+    result = slow_branches.run_agent("巢湖在哪里", use_cache=False)
+    elapsed = time.perf_counter() - start
+    assert result["route"] == "both" and result["search_result"] and result["graph_result"]
+    assert elapsed < 0.55
+
+
+def test_stream_branches_run_in_parallel(slow_branches):
+    import asyncio
+    import time
+
+    async def consume():
+        return [event async for event in slow_branches.run_agent_stream("巢湖在哪里", use_cache=False)]
+
+    start = time.perf_counter()
+    events = asyncio.run(consume())
+    elapsed = time.perf_counter() - start
+    assert events[-1]["type"] == "complete"
+    assert elapsed < 0.55